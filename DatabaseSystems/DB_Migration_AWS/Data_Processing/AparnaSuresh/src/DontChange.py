@@ -1,10 +1,10 @@
 import pandas as pd
-import ast
+import literal_parser
 #import seaborn as sns
 
 df = pd.read_csv("C:/Users/aparn/OneDrive/Documents/SJSU/DATA_225/Lab/Lab_1/DATA225-Lab1-main/DATA225-Lab1/res/keywords.csv")
 
-df['keywords'] = df['keywords'].apply(ast.literal_eval)
+df['keywords'] = df['keywords'].apply(literal_parser.parse_literal)
 index = 0
 
 for dictionary in df['keywords']:
@@ -0,0 +1,68 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import csv_shards
+import json_columns
+
+# pyarrow is only needed to send the parsed shards back, without it credits.csv is parsed in one process
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# credits.csv is split into byte ranges that end on row boundaries, the cast and crew lists of every range
+# are parsed on a process pool and sent back as Arrow record batches.
+# More shards than workers, so a shard with long cast lists does not hold up the others
+SHARDS_PER_WORKER = 4
+CREDITS_COLUMNS = ['cast', 'crew']
+# Columns of the credits_cast and credits_crew tables
+CAST_HEADERS = ['cast_id', 'character', 'credit_id', 'gender', 'id', 'name', 'order', 'profile_path', 'movie_id']
+CREW_HEADERS = ['credit_id', 'department', 'gender', 'crew_id', 'job', 'name', 'profile_path', 'movie_id']
+
+def get_credits_tables(cast, crew):
+    cast = cast.reindex(columns=CAST_HEADERS)
+    cast = cast.drop_duplicates(subset=['cast_id'], keep='first')
+
+    crew = crew.rename(columns={'id': 'crew_id'}).reindex(columns=CREW_HEADERS)
+    crew = crew.drop_duplicates(subset=['crew_id'], keep='first')
+    return {'credits_cast': cast, 'credits_crew': crew}
+
+def parse_credits_df(df):
+    # Single-process parse of the whole of credits.csv
+    return get_credits_tables(json_columns.explode_json_column(df, 'cast'), json_columns.explode_json_column(df, 'crew'))
+
+def to_record_batch(df):
+    # A column mixing types Arrow cannot hold sends the DataFrame instead
+    try:
+        return pa.RecordBatch.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return df
+
+def from_record_batch(batch):
+    if isinstance(batch, pd.DataFrame):
+        return batch
+    return batch.to_pandas()
+
+def parse_shard(file, header_names, start, end):
+    # Runs in a worker process, returns the flattened cast and crew json objects of the shard
+    with open(file, 'rb') as source:
+        source.seek(start)
+        data = source.read(end - start)
+    df = pd.read_csv(io.BytesIO(data), header=None, names=header_names)
+    return {column_name: to_record_batch(json_columns.explode_json_column(df, column_name)) for column_name in CREDITS_COLUMNS}
+
+def parse_credits(file, workers):
+    if pa == None:
+        print("pyarrow is not installed, credits.csv is parsed in a single process.")
+        return parse_credits_df(pd.read_csv(file))
+
+    header_names, shards = csv_shards.get_shards(file, workers * SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(parse_shard, [file] * len(shards), [header_names] * len(shards),
+                                [start for start, _ in shards], [end for _, end in shards]))
+    print(f"Parsed credits.csv in {len(shards)} shards on {workers} processes.")
+
+    # Shards are merged in file order, so the first credit of a repeated id is kept as in a single-process parse
+    cast = csv_shards.concat_frames([from_record_batch(result['cast']) for result in results])
+    crew = csv_shards.concat_frames([from_record_batch(result['crew']) for result in results])
+    return get_credits_tables(cast, crew)
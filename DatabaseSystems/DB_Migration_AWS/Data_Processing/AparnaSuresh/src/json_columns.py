@@ -0,0 +1,28 @@
+import pandas as pd
+import literal_parser
+
+# Parsing of the stringified json columns of the TMDB csv files, used by tmdb_pipeline.py and by the
+# credits_parser.py workers. Kept apart from both so neither imports the other
+
+def parse_json_list(value):
+    try:
+        json_object = literal_parser.parse_literal(value)
+    except Exception:
+        return []
+    if type(json_object) == dict:
+        return [json_object]
+    if type(json_object) == list:
+        return json_object
+    return []
+
+def explode_json_column(df, column_name):
+    # One row per json object of the nested column, with the id of the movie it belongs to
+    entries = pd.DataFrame({
+        'movie_id': df['id'].to_numpy(),
+        column_name: df[column_name].map(parse_json_list).to_numpy()
+    }).explode(column_name, ignore_index=True)
+    entries = entries[entries[column_name].map(lambda entry: type(entry) == dict).astype(bool)]
+
+    json_objects = pd.json_normalize(entries[column_name].tolist(), max_level=0)
+    json_objects['movie_id'] = entries['movie_id'].to_numpy()
+    return json_objects
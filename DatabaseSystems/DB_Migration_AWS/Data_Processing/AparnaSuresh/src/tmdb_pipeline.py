@@ -0,0 +1,160 @@
+import argparse
+import time
+import mysql.connector
+import pandas as pd
+import credits_parser
+import json_columns
+
+# Every csv file is read and parsed once, all the tables derived from it are built from that single parse
+# and loaded with executemany batches. The one-table scripts (Keywords.py, credits_cast.py...) call run()
+# with their table
+DATA_SET_PATH = "C:/Users/aparn/OneDrive/Documents/SJSU/DATA_225/Lab/Lab_1/DATA225-Lab1-main/DATA225-Lab1/res"
+
+# Connection and load settings, overridden from the command line arguments when the module is run directly
+db_settings = {'host': 'localhost', 'user': 'root', 'password': 'Aparna@9', 'database': 'TMDB', 'batch_size': 1000, 'data_path': DATA_SET_PATH,
+               'credits_workers': None}
+
+TABLES = {
+    'keywords': {
+        'source': 'keywords',
+        'create_table_queries': ["CREATE TABLE keywords(keyword_id INT PRIMARY KEY,keyword_name VARCHAR(200))"],
+        'insert_table_query': "INSERT INTO keywords(keyword_id,keyword_name) VALUES (%s,%s)",
+        'headers': ['id', 'name']
+    },
+    'movie_keywords': {
+        'source': 'keywords',
+        'create_table_queries': ["CREATE TABLE movie_keywords(keyword_id INT,tmdb_id INT, FOREIGN KEY (keyword_id) REFERENCES keywords(keyword_id))"],
+        'insert_table_query': "INSERT INTO movie_keywords(keyword_id,tmdb_id) VALUES (%s,%s)",
+        'headers': ['id', 'movie_id']
+    },
+    'credits_cast': {
+        'source': 'credits',
+        'create_table_queries': ["CREATE TABLE credits_cast(cast_id INT PRIMARY KEY,`character` VARCHAR(200),credit_id VARCHAR(200),gender INT,id INT,`name` VARCHAR(200),`order` INT,profile_path VARCHAR(200),movie_id INT)"],
+        'insert_table_query': "INSERT INTO credits_cast (cast_id, `character`, credit_id, gender, id, `name`, `order`, profile_path,movie_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s,%s)",
+        'headers': credits_parser.CAST_HEADERS
+    },
+    'credits_crew': {
+        'source': 'credits',
+        'create_table_queries': ["CREATE TABLE credits_crew(credit_id VARCHAR(200),department VARCHAR(200),gender INT,crew_id INT PRIMARY KEY,job VARCHAR(200),`name` VARCHAR(200),profile_path VARCHAR(200),movie_id INT)"],
+        'insert_table_query': "INSERT INTO credits_crew (credit_id,department,gender,crew_id,job,name,profile_path,movie_id) VALUES (%s, %s, %s, %s, %s, %s, %s,%s)",
+        'headers': credits_parser.CREW_HEADERS
+    },
+    'ratings': {
+        'source': 'ratings_small',
+        'create_table_queries': ["CREATE TABLE ratings(user_id INT,movie_id INT, rating FLOAT, timestamp INT, PRIMARY KEY(user_id,movie_id))"],
+        'insert_table_query': "INSERT INTO ratings (user_id, movie_id, rating, timestamp) VALUES (%s, %s, %s, %s)",
+        'headers': ['userId', 'movieId', 'rating', 'timestamp']
+    },
+    'links': {
+        'source': 'links',
+        # The index on ratings is created with links, ratings is loaded first
+        'create_table_queries': ["CREATE INDEX movie_id_index ON ratings (movie_id)", "CREATE TABLE links(movie_id INT,imdb_id INT,tmdb_id INT)"],
+        'insert_table_query': "INSERT INTO links (movie_id, imdb_id, tmdb_id) VALUES (%s, %s, %s)",
+        'headers': ['movieId', 'imdbId', 'tmdbId']
+    }
+}
+
+# Load order, referenced tables come first
+TABLE_ORDER = ['keywords', 'movie_keywords', 'credits_cast', 'credits_crew', 'ratings', 'links']
+
+def get_dataset(file_name):
+    return pd.read_csv(f"{db_settings['data_path']}/{file_name}.csv")
+
+def parse_keywords(df):
+    keywords = json_columns.explode_json_column(df, 'keywords').reindex(columns=['id', 'name', 'movie_id'])
+    keywords = keywords.dropna(subset=['id'])
+    keywords['id'] = keywords['id'].astype(int)
+
+    keyword_names = keywords[['id', 'name']].drop_duplicates(subset=['id'], keep='first')
+    keyword_names['name'] = keyword_names['name'].astype(str)
+    return {'keywords': keyword_names, 'movie_keywords': keywords[['id', 'movie_id']]}
+
+def parse_links(df):
+    df = df.dropna().reset_index(drop=True)
+    df['tmdbId'] = df['tmdbId'].astype(int)
+    return {'links': df}
+
+def parse_ratings(df):
+    return {'ratings': df}
+
+SOURCE_PARSERS = {'keywords': parse_keywords, 'credits': credits_parser.parse_credits_df, 'links': parse_links, 'ratings_small': parse_ratings}
+
+def parse_tables(table_names):
+    # Each csv file the tables come from is read and parsed once
+    tables = {}
+    for source in dict.fromkeys(TABLES[table_name]['source'] for table_name in table_names):
+        start_time = time.perf_counter()
+        if source == 'credits' and db_settings['credits_workers'] != None and db_settings['credits_workers'] > 1:
+            tables.update(credits_parser.parse_credits(f"{db_settings['data_path']}/{source}.csv", db_settings['credits_workers']))
+        else:
+            tables.update(SOURCE_PARSERS[source](get_dataset(source)))
+        print(f"Parsed {source}.csv in {time.perf_counter() - start_time:.2f}s.")
+    return tables
+
+def get_rows(df, headers):
+    # Python values with None for the missing ones, numpy types are not accepted by mysql.connector
+    df = df[headers].astype(object)
+    return df.where(df.notna(), None).to_numpy().tolist()
+
+def write_table(connection, table_name, df):
+    table = TABLES[table_name]
+    start_time = time.perf_counter()
+    cursor = connection.cursor()
+    for create_table_query in table['create_table_queries']:
+        cursor.execute(create_table_query)
+    print(f"Created table {table_name}")
+
+    rows = get_rows(df, table['headers'])
+    batch_size = db_settings['batch_size']
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(table['insert_table_query'], rows[start:start + batch_size])
+    connection.commit()
+    cursor.close()
+    print(f"Inserted {len(rows)} rows into {table_name} in {time.perf_counter() - start_time:.2f}s.")
+
+def run(table_names=None):
+    if table_names == None:
+        table_names = TABLE_ORDER
+    table_names = [table_name for table_name in TABLE_ORDER if table_name in table_names]
+    tables = parse_tables(table_names)
+
+    connection = mysql.connector.connect(
+        host=db_settings['host'],
+        user=db_settings['user'],
+        password=db_settings['password'],
+        database=db_settings['database']
+    )
+    print("Sucessfully connected to MySQL")
+
+    if connection.is_connected():
+        cursor = connection.cursor()
+        # Tables referencing the others are dropped first
+        for table_name in reversed(table_names):
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+        print(f"Dropped tables {', '.join(table_names)}")
+        cursor.close()
+
+        for table_name in table_names:
+            write_table(connection, table_name, tables[table_name])
+
+    if connection.is_connected():
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse the TMDB csv files once and load every table derived from them')
+    parser.add_argument('host', type=str, help='host address of databse')
+    parser.add_argument('user', type=str, help='database user')
+    parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--database', type=str, default='TMDB', help='database the tables are created in')
+    parser.add_argument('--data-path', type=str, default=DATA_SET_PATH, help='folder of the csv files')
+    parser.add_argument('--batch-size', type=int, default=1000, help='number of rows sent to MySQL per batch')
+    parser.add_argument('--credits-workers', type=int, default=None, help='parse credits.csv in byte-range shards on this many processes')
+    parser.add_argument('--tables', nargs='+', choices=TABLE_ORDER, default=None, help='only load these tables (default: all of them)')
+    args = parser.parse_args()
+
+    db_settings.update({'host': args.host, 'user': args.user, 'password': args.password, 'database': args.database,
+                        'batch_size': args.batch_size, 'data_path': args.data_path, 'credits_workers': args.credits_workers})
+    run(args.tables)
+
+if __name__ == "__main__":
+    main()
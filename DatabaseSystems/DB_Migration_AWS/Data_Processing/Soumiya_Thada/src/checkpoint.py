@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import constants
+
+# Journal of the current migration, configured from the command line arguments in main.py.
+# Every table has a status (loading or done) and the number of its rows committed so far
+checkpoint_settings = {'path': constants.CHECKPOINT_FILE, 'resume': False}
+journal = {'chunk_size': None, 'tables': {}}
+journal_lock = threading.Lock()
+
+# Tables left unfinished by the interrupted run, their rows are upserted when resuming
+resumed_tables = set()
+
+# Number of rows of every table passed to insert_data in this run, i.e. the position of its next chunk
+table_positions = {}
+
+def configure_checkpoint(resume, chunk_size, path=constants.CHECKPOINT_FILE):
+    checkpoint_settings['path'] = path
+    checkpoint_settings['resume'] = resume
+
+    if resume and os.path.exists(path):
+        with open(path, 'r') as file:
+            journal.update(json.load(file))
+        # Rows are skipped by position, which only matches when the csv files are chunked the same way
+        if journal['chunk_size'] != chunk_size:
+            print(f"Warning: checkpoint was written with --chunk-size {journal['chunk_size']}, resuming with {chunk_size}.")
+        resumed_tables.update([table_name for table_name, table in journal['tables'].items() if table['status'] != 'done'])
+        done_tables = [table_name for table_name, table in journal['tables'].items() if table['status'] == 'done']
+        print(f"Resuming migration from {path}: {len(done_tables)} tables done, {len(resumed_tables)} tables partially loaded.")
+    else:
+        if resume:
+            print(f"No checkpoint found at {path}, starting a new migration.")
+            checkpoint_settings['resume'] = False
+        journal['chunk_size'] = chunk_size
+        journal['tables'] = {}
+        with journal_lock:
+            write_journal()
+
+def write_journal():
+    # Write to a temporary file first so an interrupted write never corrupts the journal
+    temp_path = checkpoint_settings['path'] + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(journal, file, indent=4)
+    os.replace(temp_path, checkpoint_settings['path'])
+
+def is_resuming():
+    return checkpoint_settings['resume']
+
+def is_table_done(table_name):
+    with journal_lock:
+        return table_name in journal['tables'] and journal['tables'][table_name]['status'] == 'done'
+
+def is_table_started(table_name):
+    with journal_lock:
+        return table_name in journal['tables']
+
+def is_table_resumed(table_name):
+    return table_name in resumed_tables
+
+def get_table_offset(table_name):
+    with journal_lock:
+        if table_name not in journal['tables']:
+            return 0
+        return journal['tables'][table_name]['offset']
+
+def next_position(table_name, rows):
+    # Returns the position of the first of these rows in the table and moves past them
+    with journal_lock:
+        position = table_positions.get(table_name, 0)
+        table_positions[table_name] = position + rows
+    return position
+
+def mark_table_started(table_name):
+    with journal_lock:
+        journal['tables'][table_name] = {'status': 'loading', 'offset': 0}
+        write_journal()
+
+def record_offset(table_name, offset):
+    with journal_lock:
+        journal['tables'][table_name]['offset'] = offset
+        write_journal()
+
+def mark_table_done(table_name):
+    with journal_lock:
+        if table_name in journal['tables']:
+            journal['tables'][table_name]['status'] = 'done'
+            write_journal()
@@ -0,0 +1,163 @@
+import threading
+import time
+import mysql.connector
+from mysql.connector import Error
+
+# Shared by the TMDB loader, Migration_Validation and the NYT author loader, every project has a copy of this
+# file and DatabaseSystems/tests/test_shared_copies.py fails when the copies differ
+
+# Pool settings, overridden from the command line arguments in main.py
+pool_settings = {'size': 5, 'health_check_interval': 30}
+
+# One pool per host, user and database
+pools = {}
+pools_lock = threading.Lock()
+
+# Pool of every checked out connection, used to return it to the right pool
+checked_out_connections = {}
+
+class ConnectionPool:
+    def __init__(self, size, health_check_interval, **connection_args):
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.connection_args = connection_args
+        # Idle connections with the time they were released, the last one released is handed out first
+        self.idle_connections = []
+        self.open_connections = 0
+        self.lock = threading.Lock()
+        # Waiters are woken when a connection is released or dropped, a dropped one frees a slot to open a new one
+        self.connection_released = threading.Condition(self.lock)
+        self.stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'health_check_failures': 0
+        }
+
+    def get_connection(self):
+        start_time = time.perf_counter()
+        waited = False
+        with self.connection_released:
+            while True:
+                if self.idle_connections:
+                    connection, last_used = self.idle_connections.pop()
+                    hit = True
+                    break
+                if self.open_connections < self.size:
+                    self.open_connections += 1
+                    connection = None
+                    hit = False
+                    break
+                # Pool is exhausted, wait for another caller to release or drop a connection
+                waited = True
+                self.connection_released.wait()
+        if waited:
+            self.record_wait(time.perf_counter() - start_time)
+
+        if connection == None:
+            connection = self.open_connection()
+            last_used = time.time()
+
+        # Check connections that sat idle for a while before handing them out again
+        if time.time() - last_used > self.health_check_interval and not connection.is_connected():
+            with self.lock:
+                self.stats['health_check_failures'] += 1
+            try:
+                connection.reconnect(attempts=3, delay=1)
+            except Error:
+                self.drop_connection()
+                raise
+
+        with self.lock:
+            self.stats['checkouts'] += 1
+            if hit:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+        return connection
+
+    def open_connection(self):
+        try:
+            return mysql.connector.connect(**self.connection_args)
+        except Error:
+            self.drop_connection()
+            raise
+
+    def drop_connection(self):
+        # Frees the slot of a connection that is gone, a waiting caller opens a new one in its place
+        with self.connection_released:
+            self.open_connections -= 1
+            self.connection_released.notify()
+
+    def record_wait(self, wait_seconds):
+        with self.lock:
+            self.stats['waits'] += 1
+            self.stats['wait_seconds'] += wait_seconds
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], wait_seconds)
+
+    def release_connection(self, connection):
+        try:
+            # Discard anything the caller left uncommitted before the next caller gets the connection
+            connection.rollback()
+        except Error:
+            # Broken connections are closed and dropped, the next checkout opens a new one
+            try:
+                connection.close()
+            except Error:
+                pass
+            self.drop_connection()
+            return
+        with self.connection_released:
+            self.idle_connections.append((connection, time.time()))
+            self.connection_released.notify()
+
+    def close(self):
+        with self.lock:
+            idle_connections = self.idle_connections
+            self.idle_connections = []
+            self.open_connections -= len(idle_connections)
+        for connection, _ in idle_connections:
+            connection.close()
+
+def configure_pool(size):
+    pool_settings['size'] = size
+
+def get_connection(host, user, password, database=None, **connection_args):
+    key = (host, user, database)
+    with pools_lock:
+        if key not in pools:
+            if database != None:
+                connection_args['database'] = database
+            pools[key] = ConnectionPool(pool_settings['size'], pool_settings['health_check_interval'], host=host, user=user, password=password, **connection_args)
+        pool = pools[key]
+
+    connection = pool.get_connection()
+    with pools_lock:
+        checked_out_connections[id(connection)] = pool
+    return connection
+
+def release_connection(connection):
+    with pools_lock:
+        pool = checked_out_connections.pop(id(connection), None)
+    if pool == None:
+        connection.close()
+    else:
+        pool.release_connection(connection)
+
+def close_pools():
+    with pools_lock:
+        for pool in pools.values():
+            pool.close()
+        pools.clear()
+
+def print_pool_stats():
+    for (host, user, database), pool in pools.items():
+        stats = pool.stats
+        average_wait_ms = 1000 * stats['wait_seconds'] / stats['waits'] if stats['waits'] > 0 else 0
+        print(f"Connection pool {user}@{host}/{database}: {stats['checkouts']} checkouts, "
+              f"{stats['hits']} hits, {stats['misses']} misses, {pool.open_connections} open connections, "
+              f"{stats['waits']} waits (avg {average_wait_ms:.1f} ms, max {1000 * stats['max_wait_seconds']:.1f} ms), "
+              f"{stats['health_check_failures']} failed health checks.")
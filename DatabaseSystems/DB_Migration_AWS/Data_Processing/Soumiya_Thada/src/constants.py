@@ -6,6 +6,18 @@ CREDITS = 'credits'
 LINKS = 'links'
 RATINGS = 'ratings_small'
 
+# Column types read_csv uses instead of inferring them, columns with dirty values in the dataset are read as text
+# (video is left out so pandas still reads its True/False values as booleans)
+MOVIES_METADATA_DTYPES = {'adult': str, 'belongs_to_collection': str, 'budget': str, 'genres': str, 'homepage': str, 'id': str, 'imdb_id': str,
+                          'original_language': str, 'original_title': str, 'overview': str, 'popularity': str, 'poster_path': str,
+                          'production_companies': str, 'production_countries': str, 'release_date': str, 'revenue': 'float64', 'runtime': 'float64',
+                          'spoken_languages': str, 'status': str, 'tagline': str, 'title': str, 'vote_average': 'float64', 'vote_count': 'float64'}
+KEYWORDS_DTYPES = {'id': 'int64', 'keywords': str}
+CREDITS_DTYPES = {'cast': str, 'crew': str, 'id': 'int64'}
+LINKS_DTYPES = {'movieId': 'int64', 'imdbId': 'int64', 'tmdbId': 'float64'}
+RATINGS_DTYPES = {'userId': 'int32', 'movieId': 'int32', 'rating': 'float64', 'timestamp': 'int64'}
+dataset_dtypes = {MOVIES_METADATA: MOVIES_METADATA_DTYPES, KEYWORDS: KEYWORDS_DTYPES, CREDITS: CREDITS_DTYPES, LINKS: LINKS_DTYPES, RATINGS: RATINGS_DTYPES}
+
 # Movies_Metadata csv file headers
 HEADER_ID = 'id'
 HEADER_TITLE = 'title'
@@ -30,9 +42,23 @@ keywords_table_headers = [HEADER_KEYWORDS]
 
 
 DATABASE_NAME = 'tmdb'
+CHECKPOINT_FILE = 'Data_Processing/Soumiya_Thada/tmdb_checkpoint.json'
+DELTA_MANIFEST_PATH = 'Data_Processing/Soumiya_Thada/delta_manifest'
+STAGING_CACHE_PATH = 'Data_Processing/Soumiya_Thada/staging_cache'
+# Part of every staging cache key, bump it when the parsing changes so older entries are not reused
+STAGING_CACHE_VERSION = 1
 MOVIES_METADATA_TABLE = 'movie_metadata'
 LINKS_TABLE = 'links'
 RATINGS_TABLE = 'ratings'
+CASTS_TABLE = 'casts'
+CREWS_TABLE = 'crews'
 HEADER_TMDB_ID = 'tmdb_id'
 
+# Summary tables built after the load and read by the Migration_Validation reports
+SUMMARY_VOTE_STATS_TABLE = 'summary_vote_stats'
+SUMMARY_GENRE_TOP_POPULAR_TABLE = 'summary_genre_top_popular'
+SUMMARY_KEYWORD_FREQUENCY_TABLE = 'summary_keyword_frequency'
+# Movies kept per genre, more than the report shows so an incremental refresh has candidates to rank
+SUMMARY_TOP_POPULAR_MOVIES = 10
+
 
@@ -0,0 +1,124 @@
+from mysql.connector import Error
+import db_manager
+
+# Number of violating keys printed for every constraint
+SAMPLE_SIZE = 5
+
+def get_constraint_order(deferred_constraints):
+    # Referenced tables come first so orphans deleted from a parent are found in its children as well
+    ordered_tables = []
+    remaining_tables = list(deferred_constraints)
+    while remaining_tables:
+        ready_tables = [table_name for table_name in remaining_tables
+                        if all(referenced_table not in remaining_tables or referenced_table == table_name
+                               for _, referenced_table, _ in deferred_constraints[table_name]['foreign_keys'])]
+        # Circular foreign keys are validated in load order
+        if not ready_tables:
+            ready_tables = remaining_tables[:1]
+        for table_name in ready_tables:
+            ordered_tables.append(table_name)
+            remaining_tables.remove(table_name)
+    return ordered_tables
+
+def print_violations(table_name, constraint, violating_rows, sample_keys):
+    print(f"Constraint violation in {table_name}: {violating_rows} rows violate {constraint} and were deleted. "
+          f"Sample keys: {sample_keys[:SAMPLE_SIZE]}")
+
+def delete_null_keys(cursor, table_name, key_columns):
+    null_condition = ' OR '.join([f'{column_name} IS NULL' for column_name in key_columns])
+    cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {null_condition}")
+    null_rows = cursor.fetchone()[0]
+    if null_rows > 0:
+        cursor.execute(f"DELETE FROM {table_name} WHERE {null_condition}")
+        print_violations(table_name, f"PRIMARY KEY({', '.join(key_columns)})", null_rows, ['NULL'])
+    return null_rows
+
+def delete_duplicate_keys(cursor, table_name, key_columns, constraint):
+    columns = ', '.join(key_columns)
+    not_null_condition = ' AND '.join([f'{column_name} IS NOT NULL' for column_name in key_columns])
+    cursor.execute(f"SELECT {columns}, COUNT(*) FROM {table_name} WHERE {not_null_condition} GROUP BY {columns} HAVING COUNT(*) > 1")
+    duplicates = cursor.fetchall()
+    if not duplicates:
+        return 0
+
+    # The tables have no key yet, a temporary row id numbers the rows in load order so the first one is kept
+    cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN load_row_id BIGINT NOT NULL AUTO_INCREMENT UNIQUE")
+    join_condition = ' AND '.join([f'later.{column_name} = earlier.{column_name}' for column_name in key_columns])
+    cursor.execute(f"DELETE later FROM {table_name} later JOIN {table_name} earlier ON {join_condition} AND later.load_row_id > earlier.load_row_id")
+    cursor.execute(f"ALTER TABLE {table_name} DROP COLUMN load_row_id")
+
+    duplicate_rows = sum([duplicate[-1] - 1 for duplicate in duplicates])
+    print_violations(table_name, f"{constraint}({columns})", duplicate_rows, [duplicate[:-1] for duplicate in duplicates])
+    return duplicate_rows
+
+def delete_orphans(cursor, table_name, key_columns, referenced_table, referenced_columns):
+    join_condition = ' AND '.join([f'child.{column_name} = parent.{referenced_column}' for column_name, referenced_column in zip(key_columns, referenced_columns)])
+    orphan_condition = ' AND '.join([f'parent.{referenced_columns[0]} IS NULL'] + [f'child.{column_name} IS NOT NULL' for column_name in key_columns])
+    from_clause = f"FROM {table_name} child LEFT JOIN {referenced_table} parent ON {join_condition} WHERE {orphan_condition}"
+
+    cursor.execute(f"SELECT {', '.join([f'child.{column_name}' for column_name in key_columns])} {from_clause} LIMIT {SAMPLE_SIZE}")
+    sample_keys = cursor.fetchall()
+    if not sample_keys:
+        return 0
+    cursor.execute(f"SELECT COUNT(*) {from_clause}")
+    orphan_rows = cursor.fetchone()[0]
+    cursor.execute(f"DELETE child {from_clause}")
+    print_violations(table_name, f"FOREIGN KEY({', '.join(key_columns)}) REFERENCES {referenced_table}({', '.join(referenced_columns)})", orphan_rows, sample_keys)
+    return orphan_rows
+
+def add_constraint(cursor, table_name, constraint):
+    try:
+        cursor.execute(f"ALTER TABLE {table_name} ADD {constraint}")
+        print(f"Added {constraint} to {table_name}.")
+    except Error as e:
+        # e.g. the constraint was already added before the migration was resumed
+        print(f"Error while adding {constraint} to {table_name}.", e)
+
+def add_deferred_constraints(host, user, password, database):
+    # Validate the loaded rows against the keys and foreign keys left out of the CREATE TABLE statements,
+    # report and delete the violating rows, then add the constraints
+    deferred_constraints = db_manager.deferred_constraints
+    ordered_tables = get_constraint_order(deferred_constraints)
+    violating_rows = {}
+
+    try:
+        connection = db_manager.get_db_connection(host, user, password, database)
+        if connection.is_connected():
+            cursor = connection.cursor()
+            # Rows were already validated, MySQL does not need to check them again while adding the foreign keys
+            db_manager.set_bulk_load_checks(connection, False)
+
+            # Keys first, the foreign keys need an index on the referenced columns
+            for table_name in ordered_tables:
+                constraints = deferred_constraints[table_name]
+                violating_rows[table_name] = 0
+                if constraints['primary_key'] != None:
+                    violating_rows[table_name] += delete_null_keys(cursor, table_name, constraints['primary_key'])
+                    violating_rows[table_name] += delete_duplicate_keys(cursor, table_name, constraints['primary_key'], 'PRIMARY KEY')
+                    connection.commit()
+                    add_constraint(cursor, table_name, f"PRIMARY KEY({', '.join(constraints['primary_key'])})")
+                for unique_columns in constraints['unique']:
+                    violating_rows[table_name] += delete_duplicate_keys(cursor, table_name, unique_columns, 'UNIQUE')
+                    connection.commit()
+                    add_constraint(cursor, table_name, f"UNIQUE({', '.join(unique_columns)})")
+
+            for table_name in ordered_tables:
+                for key_columns, referenced_table, referenced_columns in deferred_constraints[table_name]['foreign_keys']:
+                    violating_rows[table_name] += delete_orphans(cursor, table_name, key_columns, referenced_table, referenced_columns)
+                    connection.commit()
+                    add_constraint(cursor, table_name, f"FOREIGN KEY({', '.join(key_columns)}) REFERENCES {referenced_table}({', '.join(referenced_columns)})")
+
+            cursor.close()
+
+    except Error as e:
+        print(f"Error while adding the deferred constraints in {database}.", e)
+        quit()
+
+    finally:
+        db_manager.release_db_connection(connection)
+
+    total_violating_rows = sum(violating_rows.values())
+    print(f"Added the constraints of {len(ordered_tables)} tables, {total_violating_rows} rows violated them and were deleted.")
+    for table_name, rows in violating_rows.items():
+        if rows > 0:
+            print(f"    {table_name}: {rows} rows")
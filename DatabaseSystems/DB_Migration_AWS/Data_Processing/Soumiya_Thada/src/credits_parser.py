@@ -0,0 +1,85 @@
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import constants
+import csv_shards
+import data_processing
+import staging_cache
+
+# Sharding settings, overridden from the command line arguments in main.py.
+# credits.csv is split into byte ranges that end on row boundaries, the cast and crew lists of every range
+# are parsed on a process pool and sent back as Arrow record batches
+credits_settings = {'workers': None}
+
+# More shards than workers, so a shard with long cast lists does not hold up the others
+SHARDS_PER_WORKER = 4
+CREDITS_COLUMNS = [('cast', constants.HEADER_CAST, constants.CASTS_TABLE), ('crew', constants.HEADER_CREW, constants.CREWS_TABLE)]
+
+def configure_credits_parser(workers):
+    if workers != None and workers > 1 and staging_cache.pa == None:
+        print("pyarrow is not installed, credits.csv is parsed in a single process.")
+        workers = None
+    credits_settings['workers'] = workers
+
+def is_enabled():
+    return credits_settings['workers'] != None and credits_settings['workers'] > 1
+
+def to_record_batch(df):
+    # Returns the batch and the pandas dtypes to restore, a column mixing types Arrow cannot hold sends the DataFrame instead
+    try:
+        return staging_cache.pa.RecordBatch.from_pandas(df, preserve_index=False), staging_cache.get_column_dtypes(df)
+    except (staging_cache.pa.ArrowInvalid, staging_cache.pa.ArrowTypeError):
+        return df, None
+
+def from_record_batch(batch, dtypes):
+    if dtypes == None:
+        return batch
+    return staging_cache.restore_dtypes(batch.to_pandas(), dtypes)
+
+def parse_shard(file, header_names, start, end):
+    # Runs in a worker process. Returns the movie id of every row of the shard and, for cast and crew,
+    # the row each json object came from with the flattened json objects
+    with open(file, 'rb') as source:
+        source.seek(start)
+        data = source.read(end - start)
+    df = pd.read_csv(io.BytesIO(data), header=None, names=header_names, low_memory=False,
+                     dtype=constants.dataset_dtypes.get(constants.CREDITS))
+    df['shard_row'] = np.arange(len(df))
+
+    parsed_columns = {}
+    for column_name, _, _ in CREDITS_COLUMNS:
+        json_entries = data_processing.get_json_entries(df, column_name, 'shard_row')
+        json_objects = pd.json_normalize(json_entries[column_name].tolist(), max_level=0)
+        parsed_columns[column_name] = (json_entries[constants.HEADER_TMDB_ID].to_numpy(dtype=np.int64), to_record_batch(json_objects))
+    return df[constants.HEADER_ID].to_numpy(), parsed_columns
+
+def parse_credits_tables():
+    # Same tables as parsing the whole of credits.csv in one process
+    start_time = time.perf_counter()
+    file = data_processing.get_dataset_file(constants.CREDITS)
+    workers = credits_settings['workers']
+    header_names, shards = csv_shards.get_shards(file, workers * SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(parse_shard, [file] * len(shards), [header_names] * len(shards),
+                                [start for start, _ in shards], [end for _, end in shards]))
+
+    # Rows with a null or repeated movie id are dropped before their json objects are used, as clean_df does
+    movie_ids = np.concatenate([shard_movie_ids for shard_movie_ids, _ in results])
+    shard_offsets = np.cumsum([0] + [len(shard_movie_ids) for shard_movie_ids, _ in results])
+    profile_name = data_processing.get_file_profile_name(constants.CREDITS, [constants.HEADER_ID])
+    df_movie_ids = data_processing.clean_df(pd.DataFrame({constants.HEADER_ID: movie_ids}), [constants.HEADER_ID], profile_name)
+    kept_rows = np.zeros(len(movie_ids), dtype=bool)
+    kept_rows[df_movie_ids.index.to_numpy()] = True
+
+    tables = []
+    for column_name, header, table_name in CREDITS_COLUMNS:
+        rows = np.concatenate([parsed_columns[column_name][0] + shard_offset for (_, parsed_columns), shard_offset in zip(results, shard_offsets)])
+        json_objects = csv_shards.concat_frames([from_record_batch(*parsed_columns[column_name][1]) for _, parsed_columns in results])
+        kept = kept_rows[rows]
+        parent_table_data, connecting_table_data = data_processing.split_parent_and_connecting_data(
+            movie_ids[rows[kept]], json_objects[kept].reset_index(drop=True), header[0], header[5])
+        tables += data_processing.build_parent_and_connecting_tables(parent_table_data, connecting_table_data, header, table_name)
+    print(f"Parsed credits.csv in {len(shards)} shards on {workers} processes in {time.perf_counter() - start_time:.2f}s.")
+    return tables
@@ -0,0 +1,42 @@
+import io
+import mmap
+import pandas as pd
+
+# Byte-range sharding of a csv file whose quoted values may span lines. Shared by the credits parsers of
+# Soumiya_Thada/src and AparnaSuresh/src, every project has a copy of this file and
+# DatabaseSystems/tests/test_shared_copies.py fails when the copies differ
+
+def find_row_end(data, position, quotes):
+    # A newline ends a row when an even number of quotes come before it, quoted values may span lines.
+    # Escaped quotes are doubled, so they never change the parity
+    while True:
+        newline = data.find(b'\n', position)
+        if newline == -1:
+            return len(data), quotes
+        quotes += data[position:newline].count(b'"')
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position, quotes
+
+def get_shards(file, shard_count):
+    # Byte ranges of about the same size, every one starting on a new row. The quotes are counted
+    # once from the start of the file, memory mapping keeps the file out of memory
+    with open(file, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header_end, quotes = find_row_end(data, 0, 0)
+        header_names = list(pd.read_csv(io.BytesIO(data[:header_end]), nrows=0).columns)
+
+        boundaries = [header_end]
+        for shard in range(1, shard_count):
+            target = len(data) * shard // shard_count
+            if target <= boundaries[-1]:
+                continue
+            quotes += data[boundaries[-1]:target].count(b'"')
+            row_end, quotes = find_row_end(data, target, quotes)
+            boundaries.append(row_end)
+        boundaries.append(len(data))
+    shards = [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+    return header_names, shards
+
+def concat_frames(dfs):
+    # Empty shards are left out, their missing columns would change the dtypes
+    return pd.concat([df for df in dfs if len(df) > 0] or dfs[:1], ignore_index=True)
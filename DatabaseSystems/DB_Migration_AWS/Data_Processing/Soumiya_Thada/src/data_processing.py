@@ -1,26 +1,66 @@
 import pandas as pd
 import constants
 import db_manager
-import ast
+import checkpoint
+import literal_parser
+import profiler
+import delta
+import staging_cache
+import credits_parser
 import numpy as np
     
 
-def get_dataset(file_name, nrows=None, low_memory=False):
+# Streaming settings, overridden from the command line arguments in main.py
+chunk_settings = {'chunk_size': None}
+
+# tmdb ids of the movie_metadata rows loaded by this run
+loaded_movie_ids = set()
+
+def configure_chunking(chunk_size):
+    chunk_settings['chunk_size'] = chunk_size
+
+def get_dataset_file(file_name):
     file = f'{constants.DATA_SET_PATH}/{file_name}.{constants.DATA_SET_EXTENSION}'
     # For windows use \\ as filepath delimeter
     #file = f'{constants.DATA_SET_PATH}\\{file_name}.{constants.DATA_SET_EXTENSION}'
-    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory)
+    return file
+
+def get_dataset(file_name, nrows=None, low_memory=False, usecols=None, chunksize=None):
+    file = get_dataset_file(file_name)
+    dtype = constants.dataset_dtypes.get(file_name)
+    # With a chunksize read_csv returns an iterator of DataFrames instead of the whole file
+    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory, usecols=usecols, dtype=dtype, chunksize=chunksize)
     return df
 
-def remove_duplicates(df, headers=None):
-    df_processed = None
-    if headers == None:
-        df_processed = df.drop_duplicates()
-        return df_processed
-    
-    for header in headers:
-        df_processed = df.drop_duplicates(subset=[header])
-    return df_processed
+def get_dataset_chunks(file_name, usecols=None):
+    # Without a chunk size the whole file is read as a single chunk
+    chunk_size = chunk_settings['chunk_size']
+    if chunk_size == None:
+        yield get_dataset(file_name=file_name, usecols=usecols)
+        return
+    for df in get_dataset(file_name=file_name, usecols=usecols, chunksize=chunk_size):
+        yield df
+
+def drop_seen_keys(df, key_column, seen_keys, profile_name=None):
+    # Drop the rows whose key was already loaded from an earlier chunk of the same file
+    seen_mask = df[key_column].isin(seen_keys).to_numpy()
+    if profile_name != None:
+        profiler.record_rejected(profile_name, df, seen_mask, 'duplicate key in an earlier chunk')
+    df = df[~seen_mask]
+    seen_keys.update(df[key_column].tolist())
+    return df
+
+def get_file_profile_name(file_name, usecols=None):
+    # Files read partially by the parse jobs of the scheduler get one profile per set of columns
+    if not profiler.is_enabled():
+        return None
+    profile_name = f'{file_name}.{constants.DATA_SET_EXTENSION}'
+    if usecols != None:
+        profile_name += f"[{', '.join(usecols)}]"
+    return profile_name
+
+def get_table_profile_name(table_name):
+    return table_name if profiler.is_enabled() else None
 
 def map_adult_value(value):
     if value == 'TRUE' or value == True:
@@ -30,169 +70,306 @@ def map_adult_value(value):
     else:
         return np.nan 
     
-def remove_nullrows(df, headers=None):
-    df_processed = None
-    if headers == None:
-        df_processed = df.dropna()
-        return df_processed
-    
-    for header in headers:
-        df_processed = df.dropna(subset=[header])
-    return df_processed
-
 def replace_non_integer(value):
     try:
         return int(value)
     except (ValueError, TypeError):
         return np.nan
 
-def clean_df(df, headers=None):
-    df_processed = None
-    df_processed = remove_duplicates(df, headers)
-    df_processed = remove_nullrows(df_processed, headers)
-    return df_processed
+def clean_df(df, headers=None, profile_name=None):
+    # Drop the rows with a null in any of the key columns and the rows repeating a value of one of them,
+    # the masks are combined and the DataFrame is filtered once. Without headers the whole row is the key
+    if headers == None:
+        headers = list(df.columns)
+        key_column_sets = [headers]
+    else:
+        key_column_sets = [[header] for header in headers]
+    
+    # Nulls of every column are counted for the profile, otherwise only the key columns are checked
+    is_null = df.isna() if profile_name != None else df[headers].isna()
+    null_mask = is_null[headers].any(axis=1).to_numpy()
+    
+    # Rows with a null key are left out before deduplicating, so they never hide a valid row
+    duplicate_mask = np.zeros(len(df), dtype=bool)
+    for key_columns in key_column_sets:
+        duplicate_mask[~null_mask] |= df.loc[~null_mask, key_columns].duplicated().to_numpy()
+    
+    keep_mask = ~(null_mask | duplicate_mask)
+    if profile_name != None:
+        profiler.profile_chunk(profile_name, df, is_null, null_mask, duplicate_mask)
+    return df[keep_mask]
+
+
+def get_movies_metadata_chunks(usecols=None):
+    seen_ids = set()
+    profile_name = get_file_profile_name(constants.MOVIES_METADATA, usecols)
+    for df_movie_metadata in get_dataset_chunks(file_name=constants.MOVIES_METADATA, usecols=usecols):
+        df_movie_metadata['adult'] = df_movie_metadata['adult'].map(map_adult_value)
+        df_movie_metadata = df_movie_metadata.dropna(subset=['adult'])
+        df_movie_metadata['adult'] = df_movie_metadata['adult'].astype(int)
+        df_movie_metadata['id'] = df_movie_metadata['id'].apply(replace_non_integer)
+        df_movie_metadata = clean_df(df_movie_metadata, headers=constants.movies_meta_data_headers, profile_name=profile_name)
+        df_movie_metadata['id'] = df_movie_metadata['id'].astype(int)
+        df_movie_metadata = drop_seen_keys(df_movie_metadata, 'id', seen_ids, profile_name)
+        df_movie_metadata = df_movie_metadata.replace(np.nan, None)
+        yield df_movie_metadata
+
+def get_keywords_chunks():
+    seen_ids = set()
+    profile_name = get_file_profile_name(constants.KEYWORDS)
+    for df_keywords in get_dataset_chunks(file_name=constants.KEYWORDS):
+        df_keywords = clean_df(df_keywords, ['id'], profile_name)
+        yield drop_seen_keys(df_keywords, 'id', seen_ids, profile_name)
+
+def get_links_chunks():
+    seen_ids = set()
+    profile_name = get_file_profile_name(constants.LINKS)
+    for df_links in get_dataset_chunks(file_name=constants.LINKS):
+        df_links = clean_df(df_links, ['movieId','tmdbId'], profile_name)
+        df_links = drop_seen_keys(df_links, 'tmdbId', seen_ids, profile_name)
+        df_links = df_links.replace(np.nan, None)
+        yield df_links
+
+def get_ratings_chunks():
+    for df_ratings in get_dataset_chunks(file_name=constants.RATINGS):
+        df_ratings = df_ratings.replace(np.nan, None)
+        yield df_ratings
+
+def get_credits_chunks(credits_column, usecols=None):
+    seen_ids = set()
+    profile_name = get_file_profile_name(constants.CREDITS, usecols)
+    for df_credits in get_dataset_chunks(file_name=constants.CREDITS, usecols=usecols):
+        df_credits = clean_df(df_credits, ['id'], profile_name)
+        df_credits = drop_seen_keys(df_credits, 'id', seen_ids, profile_name)
+        df_credits = df_credits.replace(np.nan, None)
+        
+        # cast and crew share the credit headers, the nested column is renamed to match
+        df_credits = df_credits.rename(columns={credits_column: 'credit'})
+        yield df_credits
+
+# Stream functions yield the tables built from every chunk of one source file. Keys seen in earlier
+# chunks are passed along so parent tables never get the same row twice
+def stream_movie_metadata_tables():
+    for df_movie_metadata in get_movies_metadata_chunks():
+        yield [get_movie_metadata_parent_table(df_movie_metadata)]
+
+def stream_movie_metadata_header_tables(header):
+    seen_keys = set()
+    for df_movie_metadata in get_movies_metadata_chunks(usecols=['id', 'adult', header[0]]):
+        yield get_parent_and_connecting_tables(df_movie_metadata, header, seen_keys=seen_keys)
+
+def stream_keywords_tables(header):
+    seen_keys = set()
+    for df_keywords in get_keywords_chunks():
+        yield get_parent_and_connecting_tables(df_keywords, header, seen_keys=seen_keys)
+
+def stream_links_tables():
+    for df_links in get_links_chunks():
+        yield [get_links_table(df_links)]
+
+def stream_ratings_tables():
+    for df_ratings in get_ratings_chunks():
+        yield [get_ratings_table(df_ratings)]
+
+def stream_credits_tables(header, credits_column, table_name):
+    seen_keys = set()
+    for df_credits in get_credits_chunks(credits_column, usecols=['id', credits_column]):
+        yield get_parent_and_connecting_tables(df_credits, header, table_name, seen_keys)
+
+def stream_all_movie_metadata_tables():
+    # movie_metadata and the tables of its nested columns from a single read of the file
+    header_seen_keys = [set() for _ in constants.primary_table_headers]
+    for df_movie_metadata in get_movies_metadata_chunks():
+        tables = [get_movie_metadata_parent_table(df_movie_metadata)]
+        for header, seen_keys in zip(constants.primary_table_headers, header_seen_keys):
+            tables += get_parent_and_connecting_tables(df_movie_metadata, header, seen_keys=seen_keys)
+        yield tables
+
+def stream_all_credits_tables():
+    cast_seen_keys = set()
+    crew_seen_keys = set()
+    for df_credits in get_credits_chunks('cast'):
+        tables = get_parent_and_connecting_tables(df_credits, constants.HEADER_CAST, constants.CASTS_TABLE, cast_seen_keys)
+        
+        df_credits = df_credits.rename(columns={'credit': 'cast'})
+        df_credits = df_credits.rename(columns={'crew': 'credit'})
+        tables += get_parent_and_connecting_tables(df_credits, constants.HEADER_CREW, constants.CREWS_TABLE, crew_seen_keys)
+        yield tables
+
+def stream_sharded_credits_tables():
+    # credits.csv parsed in byte-range shards on a process pool, the whole file is a single chunk
+    yield credits_parser.parse_credits_tables()
 
+# Csv files read by every stream function
+STREAM_SOURCE_FILES = {
+    stream_movie_metadata_tables: [constants.MOVIES_METADATA],
+    stream_movie_metadata_header_tables: [constants.MOVIES_METADATA],
+    stream_all_movie_metadata_tables: [constants.MOVIES_METADATA],
+    stream_keywords_tables: [constants.KEYWORDS],
+    stream_links_tables: [constants.LINKS],
+    stream_ratings_tables: [constants.RATINGS],
+    stream_credits_tables: [constants.CREDITS],
+    stream_all_credits_tables: [constants.CREDITS],
+    stream_sharded_credits_tables: [constants.CREDITS]
+}
+
+def get_table_chunks(stream_function, *args):
+    # Tables of every chunk of the stream, read from the staging cache when its csv files were parsed before.
+    # Profiling needs the files parsed, with --profile the cache is only written
+    files = [get_dataset_file(file_name) for file_name in STREAM_SOURCE_FILES[stream_function]]
+    key_args = (args, chunk_settings['chunk_size'])
+    return staging_cache.cached_stream(stream_function.__name__, files, key_args, stream_function(*args), read=not profiler.is_enabled())
+
+def concat_table_chunks(table_chunks):
+    # Concatenate the tables of every chunk into one table per table name
+    tables = {}
+    table_dfs = {}
+    for chunk_tables in table_chunks:
+        for table in chunk_tables:
+            if table['table_name'] not in tables:
+                tables[table['table_name']] = table
+                table_dfs[table['table_name']] = []
+            table_dfs[table['table_name']].append(table['df'])
+    for table_name, table in tables.items():
+        # Empty chunks are left out, their all NULL columns would turn integer keys into floats
+        dfs = [df for df in table_dfs[table_name] if len(df) > 0] or table_dfs[table_name][:1]
+        table['df'] = pd.concat(dfs, ignore_index=True)
+    return list(tables.values())
+
+# Parse functions return the tables built from one source file without touching the database,
+# so they can run on the scheduler's process pool as well as in the sequential loaders below
+def parse_movie_metadata_tables():
+    return concat_table_chunks(get_table_chunks(stream_movie_metadata_tables))
+
+def parse_movie_metadata_header_tables(header):
+    return concat_table_chunks(get_table_chunks(stream_movie_metadata_header_tables, header))
+
+def parse_keywords_tables(header):
+    return concat_table_chunks(get_table_chunks(stream_keywords_tables, header))
+
+def parse_links_tables():
+    return concat_table_chunks(get_table_chunks(stream_links_tables))
+
+def parse_ratings_tables():
+    return concat_table_chunks(get_table_chunks(stream_ratings_tables))
+
+def parse_credits_tables(header, credits_column, table_name):
+    return concat_table_chunks(get_table_chunks(stream_credits_tables, header, credits_column, table_name))
+
+def load_tables(tables, host, user, password, created_tables=None):
+    for table in tables:
+        if not checkpoint.is_table_done(table['table_name']):
+            # In delta mode only the new and changed rows are left
+            table = delta.filter_table(table)
+            if table['table_name'] == constants.MOVIES_METADATA_TABLE:
+                record_loaded_movies(table['df'])
+        # Tables created for an earlier chunk only get the new rows appended
+        if created_tables != None and table['table_name'] in created_tables:
+            skipped_positions = db_manager.append_table(table['df'], host, user, password, constants.DATABASE_NAME, table['table_name'], table['headers'], table['insert_table_query'])
+            delta.discard_rows(table['table_name'], skipped_positions)
+            continue
+        skipped_positions = db_manager.create_insert_table(table['df'], host, user, password, constants.DATABASE_NAME, table['table_name'], table['create_table_query'], table['headers'], table['insert_table_query'])
+        # Rows MySQL rejected are not recorded as loaded in the delta manifest
+        delta.discard_rows(table['table_name'], skipped_positions)
+        if created_tables != None:
+            created_tables.add(table['table_name'])
+        else:
+            mark_table_done(table['table_name'])
+
+def record_loaded_movies(df):
+    # Movies loaded by this run, the summary tables are refreshed for them after the load
+    tmdb_ids = pd.to_numeric(df[constants.HEADER_ID], errors='coerce').dropna()
+    loaded_movie_ids.update(tmdb_ids.astype(int).tolist())
+
+def mark_table_done(table_name):
+    checkpoint.mark_table_done(table_name)
+    delta.save_manifest(table_name)
+
+def mark_tables_done(created_tables):
+    # Chunked tables are only complete once the last chunk of their file is loaded
+    for table_name in created_tables:
+        mark_table_done(table_name)
+
+def load_table_chunks(table_chunks, host, user, password):
+    # Every chunk is parsed and inserted before the next one is read, so memory stays flat
+    created_tables = set()
+    for tables in table_chunks:
+        load_tables(tables, host, user, password, created_tables)
+    mark_tables_done(created_tables)
 
 def load_movies_metadata(host, user,password):
-    df_movie_metadata = get_dataset(file_name=constants.MOVIES_METADATA)#, nrows=30)
-    df_movie_metadata['adult'] = df_movie_metadata['adult'].map(map_adult_value)
-    df_movie_metadata = df_movie_metadata.dropna(subset=['adult'])
-    df_movie_metadata['adult'] = df_movie_metadata['adult'].astype(int)
-    df_movie_metadata['id'] = df_movie_metadata['id'].apply(replace_non_integer)
-    df_movie_metadata = clean_df(df_movie_metadata, headers=constants.movies_meta_data_headers)
-    df_movie_metadata['id'] = df_movie_metadata['id'].astype(int)
-    df_movie_metadata = df_movie_metadata.replace(np.nan, None)
-    
-    prepare_movie_metadata_parent_table(df_movie_metadata, host, user, password, constants.DATABASE_NAME)
-    for header in constants.primary_table_headers:
-        prepare_parent_and_connecting_tables(df_movie_metadata, header, host, user, password, constants.DATABASE_NAME)
+    load_table_chunks(get_table_chunks(stream_all_movie_metadata_tables), host, user, password)
  
 def load_keywords(host, user,password):
-    df_keywords = get_dataset(file_name=constants.KEYWORDS) #, nrows=30)
-    df_keywords = clean_df(df_keywords, ['id'])
-    
     for header in constants.keywords_table_headers:
-        prepare_parent_and_connecting_tables(df_keywords, header, host, user, password, constants.DATABASE_NAME) 
-    
+        load_table_chunks(get_table_chunks(stream_keywords_tables, header), host, user, password)
     
 def load_links(host, user,password):   
-    df_links = get_dataset(file_name=constants.LINKS)#, nrows=30)
-    df_links = clean_df(df_links, ['movieId','tmdbId'])
-    df_links = df_links.replace(np.nan, None)
-    prepare_links_table(df_links, host, user, password, constants.DATABASE_NAME) 
+    load_table_chunks(get_table_chunks(stream_links_tables), host, user, password)
     
 def load_ratings(host, user,password):  
-    df_ratings = get_dataset(file_name=constants.RATINGS)#, nrows=30)
-    df_ratings = df_ratings.replace(np.nan, None)  
-    
-    prepare_ratings_table(df_ratings, host, user, password, constants.DATABASE_NAME) 
+    load_table_chunks(get_table_chunks(stream_ratings_tables), host, user, password)
     
 def load_credits(host, user,password):
-    df_credits = get_dataset(file_name=constants.CREDITS)#, nrows=1)
-    df_credits = clean_df(df_credits, ['id'])
-    df_credits = df_credits.replace(np.nan, None) 
-    
-    df_credits = df_credits.rename(columns={'cast': 'credit'})
-    prepare_parent_and_connecting_tables(df_credits, constants.HEADER_CAST, host, user, password, constants.DATABASE_NAME)
-    db_manager.rename_table(host, user, password,constants.DATABASE_NAME,'credit','casts')
-    db_manager.rename_table(host, user, password,constants.DATABASE_NAME,'movie_credit','movie_casts') 
-    df_credits = df_credits.rename(columns={'credit': 'cast'})
-    df_credits = df_credits.rename(columns={'crew': 'credit'})
-    prepare_parent_and_connecting_tables(df_credits, constants.HEADER_CREW, host, user, password, constants.DATABASE_NAME)
-    db_manager.rename_table(host, user, password,constants.DATABASE_NAME,'credit','crews')
-    db_manager.rename_table(host, user, password,constants.DATABASE_NAME,'movie_credit','movie_crews') 
-    
+    if credits_parser.is_enabled():
+        load_table_chunks(get_table_chunks(stream_sharded_credits_tables), host, user, password)
+        return
+    load_table_chunks(get_table_chunks(stream_all_credits_tables), host, user, password)
     
+def parse_json_column_value(value, column_name):
+    # Load JSON data from a stringified column value as a list of json objects
+    try:
+        json_object = literal_parser.parse_literal(value)
+    except Exception:
+        return []
+    
+    if type(json_object) == dict:
+        return [json_object]
+    elif type(json_object) == list:
+        return json_object
+    print(f'Unsupported json object found: {type(json_object)} in column {column_name}')
+    return []
+
+def drop_duplicate_rows(df, headers=None):
+    # Hash the key columns of every row once and keep the first row of each hash
+    if headers == None:
+        headers = list(df.columns)
+    row_hashes = pd.util.hash_pandas_object(df[headers], index=False)
+    return df[~row_hashes.duplicated().to_numpy()]
+
+def get_json_entries(df, column_name, corr_column1):
+    # Parse every value of the nested column once and explode to one json object per row
+    json_entries = pd.DataFrame({
+        constants.HEADER_TMDB_ID: df[corr_column1].to_numpy(),
+        column_name: df[column_name].map(lambda value: parse_json_column_value(value, column_name)).to_numpy()
+    }).explode(column_name, ignore_index=True)
+    return json_entries[json_entries[column_name].map(lambda json_entry: type(json_entry) == dict).astype(bool)]
+
 def prepare_parent_and_connecting_data(df, column_name, corr_column1, corr_column2):
+    json_entries = get_json_entries(df, column_name, corr_column1)
+    
+    # Flatten the json objects into the parent table columns
+    parent_table_data = pd.json_normalize(json_entries[column_name].tolist(), max_level=0)
+    return split_parent_and_connecting_data(json_entries[constants.HEADER_TMDB_ID].to_numpy(), parent_table_data, column_name, corr_column2)
+
+def split_parent_and_connecting_data(tmdb_ids, parent_table_data, column_name, corr_column2):
+    # tmdb_ids holds the movie of every flattened json object
     column1 = constants.HEADER_TMDB_ID
     column2 = f'{column_name}_id'
-    #corr_column1 = constants.HEADER_ID
-    #corr_column2 = constants.HEADER_ID
-     
-    # Initialize a dictionary to store unique values for each key
-    connecting_table_data = {}
-    connecting_table_data[column1] = []
-    connecting_table_data[column2] = []
-    
-    parent_table_data = {}
-    
-    # Iterate over each row in the DataFrame
-    for _, row in df.iterrows():
-        json_array = []
-        try:
-            # Load JSON data from the specified column
-            json_object = ast.literal_eval(row[column_name])
-            if type(json_object) == dict:
-                json_array = [json_object]
-            elif type(json_object) == list:
-                json_array = json_object
-            else:
-                print(f'Unsupported json object found: {type(json_object)} in column {column_name}')
-        except SyntaxError as e:
-            # Handle syntax errors
-            # print(f"Ubale to extract json data from {column_name}")
-            # print("SyntaxError:", e)
-            pass
-        except ValueError as e:
-            # Handle value errors
-            # print(f"Ubale to extract json data from {column_name}")
-            # print("ValueError:", e)
-            pass
-        except Exception as e:
-            # Handle other types of exceptions
-            # print(f"Ubale to extract json data from {column_name}")
-            # print("An error occurred:", e)
-            pass
-       
-        primary_key = 1
-        # Iterate over each JSON object in the array
-        for json_entry in json_array:
-            """ values = [str(value) for value in json_entry.values()]
-            concatenated_string = ''.join(values)
-            primary_key = hash(concatenated_string) """
-            
-            try:
-                connecting_table_data[column1].append(row[corr_column1])
-                # Check if the specified key exists in the JSON object
-                #if corr_column2 in json_entry:
-                    # If the key exists, append its value to the list
-                connecting_table_data[column2].append(json_entry[corr_column2])
-               # else:
-                    # If the key does not exists, append a default primary key to the list
-                    # Concatenate values into a single string
-                    #connecting_table_data[column2].append(primary_key)
-                    
-            except Exception as e:
-                print("Error adding entries in connecting_table_data", e)
-             
-            """ if constants.HEADER_ID not in json_entry.keys():
-                if constants.HEADER_ID in parent_table_data:
-                    parent_table_data[constants.HEADER_ID].append(primary_key)
-                # If the key does not exist in the dictionary, create a new list for the key and append the value
-                else:    
-                    parent_table_data[constants.HEADER_ID] = [primary_key] """
-
-            #parent_table_data[constants.HEADER_ID] = primary_key
-            for key, value in json_entry.items():
-                # If the key already exists in the dictionary and the value is not already present in the list,
-                # append the value to its corresponding list
-                if key in parent_table_data:
-                    parent_table_data[key].append(value)
-                # If the key does not exist in the dictionary, create a new list for the key and append the value
-                else:    
-                    parent_table_data[key] = [value]
-                    
-        
-    """ if constants.HEADER_ID not in parent_table_data:
-        # If primary key does not exist in parent_table_data add the primary key and its values
-        length_of_parent_table = len(parent_table_data[next(iter(parent_table_data))])
-        parent_table_data[constants.HEADER_ID] = [primary_key_value for primary_key_value in range(1, length_of_parent_table+1)] """
-
-    #print(f'parent_table_data: \n {parent_table_data}')
-    #print(f'\nconnecting_table_data: \n {connecting_table_data}')
+    if corr_column2 not in parent_table_data.columns:
+        return parent_table_data, pd.DataFrame(columns=[column1, column2])
+    
+    # Connecting table links every movie to the key of each of its json objects
+    connecting_table_data = pd.DataFrame({
+        column1: tmdb_ids,
+        column2: parent_table_data[corr_column2].to_numpy()
+    })
+    connecting_table_data = drop_duplicate_rows(connecting_table_data.dropna(subset=[column2]))
+    
+    parent_table_data = drop_duplicate_rows(parent_table_data.dropna(subset=[corr_column2]), [corr_column2])
     return parent_table_data, connecting_table_data
     
-def prepare_movie_metadata_parent_table(df, host, user, password, database):
+def get_movie_metadata_parent_table(df):
     table_name = constants.MOVIES_METADATA_TABLE
     headers = ['id','title','adult','budget', 'homepage', 'imdb_id', 'original_language', 'original_title', 'overview', 'popularity', 'poster_path', 'release_date', 'revenue', 'runtime', 'status', 'tagline', 'video', 'vote_average', 'vote_count']
     
@@ -226,9 +403,9 @@ def prepare_movie_metadata_parent_table(df, host, user, password, database):
             VALUES (%s, %s, %s, %s, %s, SUBSTRING(%s, 3), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
 
-    db_manager.create_insert_table(df, host, user, password, database, table_name, create_table_query, headers, insert_table_query)
+    return get_table(table_name, df, create_table_query, headers, insert_table_query)
 
-def prepare_links_table(df, host, user, password, database):
+def get_links_table(df):
     table_name = constants.LINKS_TABLE
     headers = ['movieId','imdbId','tmdbId']
     
@@ -247,9 +424,9 @@ def prepare_links_table(df, host, user, password, database):
             VALUES (%s, %s, %s)
         """
 
-    db_manager.create_insert_table(df, host, user, password, database, table_name, create_table_query, headers, insert_table_query)
+    return get_table(table_name, df, create_table_query, headers, insert_table_query)
 
-def prepare_ratings_table(df, host, user, password, database):
+def get_ratings_table(df):
     table_name = constants.RATINGS_TABLE
     headers = ['userId','movieId','rating','timestamp']
     
@@ -270,34 +447,46 @@ def prepare_ratings_table(df, host, user, password, database):
             VALUES (%s, %s, %s, FROM_UNIXTIME(%s))
         """
 
-    db_manager.create_insert_table(df, host, user, password, database, table_name, create_table_query, headers, insert_table_query)
+    return get_table(table_name, df, create_table_query, headers, insert_table_query)
        
               
-def prepare_parent_and_connecting_tables(df, header, host, user, password, database):
+def get_table(table_name, df, create_table_query, headers, insert_table_query):
+    return {
+        'table_name': table_name,
+        'df': df,
+        'create_table_query': create_table_query,
+        'headers': headers,
+        'insert_table_query': insert_table_query
+    }
+              
+def get_parent_and_connecting_tables(df, header, table_name=None, seen_keys=None):
+    parent_table_data, connecting_table_data = prepare_parent_and_connecting_data(df, header[0], header[4], header[5])
+    return build_parent_and_connecting_tables(parent_table_data, connecting_table_data, header, table_name, seen_keys)
+
+def build_parent_and_connecting_tables(parent_table_data, connecting_table_data, header, table_name=None, seen_keys=None):
     column_name = header[0]
     table_column_names_list = header[1]
     data_types_list = header[2] 
     header_list = header[3]
-    corr_column1 = header[4]
     corr_column2 = header[5]
 
-    parent_table_data, connecting_table_data = prepare_parent_and_connecting_data(df, column_name, corr_column1, corr_column2)
-    
+    # A chunk may not contain every key of the json objects, the missing columns are inserted as NULL
+    parent_table_data = parent_table_data.reindex(columns=header_list)
     
-    parent_table_data = pd.DataFrame(parent_table_data)
+    parent_table_name = column_name if table_name == None else table_name
+    profile_name = get_table_profile_name(parent_table_name)
     
-    parent_table_data = clean_df(parent_table_data, [corr_column2])
-    connecting_table_data = pd.DataFrame(connecting_table_data)
-    
-    parent_table_name = column_name
+    parent_table_data = clean_df(parent_table_data, [corr_column2], profile_name)
+    if seen_keys != None:
+        parent_table_data = drop_seen_keys(parent_table_data, corr_column2, seen_keys, profile_name)
     
     create_table_query = get_create_table_query(parent_table_name, table_column_names_list, data_types_list)
     insert_table_query = get_insert_query(parent_table_name, table_column_names_list)
     
 
-    db_manager.create_insert_table(parent_table_data, host, user, password, database, parent_table_name, create_table_query, header_list, insert_table_query)
+    parent_table = get_table(parent_table_name, parent_table_data, create_table_query, header_list, insert_table_query)
     
-    connecting_table_name = f'movie_{column_name}'
+    connecting_table_name = f'movie_{parent_table_name}'
     header_list = [constants.HEADER_TMDB_ID,f'{column_name}_id']
          
     create_table_query = f"""
@@ -316,9 +505,9 @@ def prepare_parent_and_connecting_tables(df, header, host, user, password, datab
         VALUES (%s, %s)
     """
     
-    db_manager.create_insert_table(connecting_table_data, host, user, password, database, connecting_table_name, create_table_query, header_list, insert_table_query)
-    
+    connecting_table = get_table(connecting_table_name, connecting_table_data, create_table_query, header_list, insert_table_query)
     
+    return [parent_table, connecting_table]
     
 def get_create_table_query(table_name, column_names, data_types):
     create_table_query = f"CREATE TABLE {table_name} ("
@@ -1,7 +1,24 @@
 import argparse
+import os
+import re
+import tempfile
+import time
 import mysql.connector
 from mysql.connector import Error
 import numpy as np
+import constants
+import connection_pool
+import checkpoint
+import delta
+
+# Bulk insert settings, overridden from the command line arguments in main.py
+bulk_load_settings = {'batch_size': 1000, 'mode': 'executemany', 'defer_constraints': False}
+
+# Rows per second and batch latency collected for every loaded table
+load_stats = {}
+
+# Keys and foreign keys left out of the CREATE TABLE statements in the deferred constraints mode
+deferred_constraints = {}
 
 def get_db_credentials():
     # Create an ArgumentParser object
@@ -11,6 +28,20 @@ def get_db_credentials():
     parser.add_argument('host', type=str, help='host address of databse')
     parser.add_argument('user', type=str, help='database user')
     parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--batch-size', type=int, default=1000, help='number of rows sent to MySQL per batch')
+    parser.add_argument('--load-mode', type=str, default='executemany', choices=['executemany', 'infile'], help='bulk insert with executemany batches or LOAD DATA LOCAL INFILE')
+    parser.add_argument('--parallel', action='store_true', help='parse and load independent tables at the same time')
+    parser.add_argument('--parse-workers', type=int, default=None, help='number of processes parsing the csv files (default: number of cpus)')
+    parser.add_argument('--write-workers', type=int, default=4, help='number of threads loading tables into MySQL')
+    parser.add_argument('--pool-size', type=int, default=5, help='maximum number of pooled MySQL connections')
+    parser.add_argument('--chunk-size', type=int, default=None, help='stream the csv files in chunks of this many rows instead of reading them whole')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted migration from its checkpoint instead of starting over')
+    parser.add_argument('--defer-constraints', action='store_true', help='load into tables without keys and add the keys and foreign keys after the load')
+    parser.add_argument('--delta', action='store_true', help='keep the database and only upsert the rows that are new or changed since the last run')
+    parser.add_argument('--profile', action='store_true', help='print null counts, distinct counts and rejected rows of every cleaned file and table')
+    parser.add_argument('--staging-cache', action='store_true', help='keep the parsed tables as Parquet files and reuse them while the csv files are unchanged')
+    parser.add_argument('--staging-cache-dir', type=str, default=constants.STAGING_CACHE_PATH, help='directory of the staging cache')
+    parser.add_argument('--credits-workers', type=int, default=None, help='parse credits.csv in byte-range shards on this many processes')
 
     try:
         # Parse the command-line arguments
@@ -19,36 +50,241 @@ def get_db_credentials():
         print('Error: Required arguments not provided')
         quit()
     
-    return { 'host': args.host, 'user': args.user, 'password': args.password }
+    return { 'host': args.host, 'user': args.user, 'password': args.password, 'batch_size': args.batch_size, 'load_mode': args.load_mode,
+             'parallel': args.parallel, 'parse_workers': args.parse_workers, 'write_workers': args.write_workers,
+             'pool_size': args.pool_size, 'chunk_size': args.chunk_size,
+             'resume': args.resume, 'defer_constraints': args.defer_constraints, 'delta': args.delta, 'profile': args.profile,
+             'staging_cache': args.staging_cache, 'staging_cache_dir': args.staging_cache_dir, 'credits_workers': args.credits_workers }
+
+def configure_bulk_load(batch_size, mode, defer_constraints=False):
+    bulk_load_settings['batch_size'] = batch_size
+    bulk_load_settings['mode'] = mode
+    bulk_load_settings['defer_constraints'] = defer_constraints
 
 def get_db_connection(host, user, password, database=None):
     try:    
-        if (database == None):
-            connection = mysql.connector.connect(host=host, user=user, password=password)
-        else:
-            connection = mysql.connector.connect(host=host, user=user, password=password, database=database)
+        # LOAD DATA LOCAL INFILE has to be enabled on the client side as well
+        allow_local_infile = bulk_load_settings['mode'] == 'infile'
+        connection = connection_pool.get_connection(host, user, password, database, allow_local_infile=allow_local_infile)
         print(f"Sucessfully connected to MySQL as {user} user.")
     except Error as e:
         print(f"Error while connecting to MySQL as {user} user.", e)
         quit()
     return connection
 
-def insert_data(cursor, df, headers, table_name, insert_table_query):
-     # Insert data into table
-    for _, row in df.iterrows():
-        data = []
-        for header in headers:
-            if type(row[header]) is np.int64:  
-                data.append(int(row[header]))
-            else:
-                data.append(row[header])
-        try:
-            cursor.execute(insert_table_query,  data)
-        except Exception as e:
-            pass
-            #print("Exception:", e)          
+def release_db_connection(connection):
+    # Session settings changed for the bulk load must not leak to the next user of the pooled connection
+    if bulk_load_settings['defer_constraints']:
+        set_bulk_load_checks(connection, True)
+    # Return the connection to the pool instead of closing it
+    connection_pool.release_connection(connection)
+
+def set_bulk_load_checks(connection, enabled):
+    value = 1 if enabled else 0
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SET SESSION foreign_key_checks = {value}, unique_checks = {value}")
+        cursor.close()
+    except Error as e:
+        print("Error while changing the session checks.", e)
+
+def get_key_columns(key_columns):
+    return [column_name.strip() for column_name in key_columns.split(',')]
+
+def split_create_table_query(create_table_query):
+    # Split a CREATE TABLE statement into a table without keys and the keys and foreign keys it declares
+    match = re.search(r'CREATE\s+TABLE\s+(\w+)\s*\((.*)\)', create_table_query, re.I | re.S)
+    table_name = match.group(1)
+    column_definitions = []
+    constraints = {'primary_key': None, 'unique': [], 'foreign_keys': []}
+    
+    for definition in split_values_clause(match.group(2)):
+        primary_key = re.match(r'PRIMARY\s+KEY\s*\((.*)\)$', definition, re.I | re.S)
+        foreign_key = re.match(r'FOREIGN\s+KEY\s*\((.*?)\)\s*REFERENCES\s+(\w+)\s*\((.*?)\)$', definition, re.I | re.S)
+        unique_key = re.match(r'UNIQUE(?:\s+(?:KEY|INDEX))?\s*\((.*)\)$', definition, re.I | re.S)
+        if primary_key:
+            constraints['primary_key'] = get_key_columns(primary_key.group(1))
+        elif unique_key:
+            constraints['unique'].append(get_key_columns(unique_key.group(1)))
+        elif foreign_key:
+            constraints['foreign_keys'].append((get_key_columns(foreign_key.group(1)), foreign_key.group(2), get_key_columns(foreign_key.group(3))))
+        else:
+            # Column level keys, e.g. "tmdb_id int PRIMARY KEY" or "imdb_id int UNIQUE"
+            column_name = definition.split()[0]
+            if re.search(r'\bPRIMARY\s+KEY\b', definition, re.I):
+                constraints['primary_key'] = [column_name]
+                definition = re.sub(r'\s*\bPRIMARY\s+KEY\b', '', definition, flags=re.I)
+            if re.search(r'\bUNIQUE\b', definition, re.I):
+                constraints['unique'].append([column_name])
+                definition = re.sub(r'\s*\bUNIQUE\b', '', definition, flags=re.I)
+            column_definitions.append(definition)
+    
+    bare_create_table_query = f"CREATE TABLE {table_name} (\n\t" + ',\n\t'.join(column_definitions) + "\n)"
+    return bare_create_table_query, constraints
+
+def get_row_tuples(df, headers):
+    # Convert each column once into native python values (np.int64 -> int, NaN -> None)
+    columns = []
+    for header in headers:
+        column = df[header]
+        columns.append(column.astype(object).where(column.notna(), None).tolist())
+    return list(zip(*columns))
+
+def insert_batch(connection, cursor, batch, table_name, insert_table_query):
+    # Returns the number of rows MySQL rejected, their positions in the batch and the first error
+    try:
+        cursor.executemany(insert_table_query, batch)
+        return 0, [], None
+    except Error as e:
+        # One bad row fails the whole multi-row insert, so retry the batch row by row
+        # and skip only the rows rejected by MySQL
+        connection.rollback()
+        skipped_positions = []
+        first_error = None
+        for position, row in enumerate(batch):
+            try:
+                cursor.execute(insert_table_query, row)
+            except Error as row_error:
+                skipped_positions.append(position)
+                if first_error == None:
+                    first_error = row_error
+        return len(skipped_positions), skipped_positions, first_error
+
+def get_upsert_query(insert_table_query):
+    # Rows committed by an interrupted run are updated instead of failing on their key
+    match = re.search(r'INSERT\s+INTO\s+\S+\s*\((.*?)\)', insert_table_query, re.I | re.S)
+    column_names = [column_name.strip() for column_name in match.group(1).split(',')]
+    update_clause = ', '.join([f'{column_name} = VALUES({column_name})' for column_name in column_names])
+    return insert_table_query.strip().rstrip(';') + f' ON DUPLICATE KEY UPDATE {update_clause}'
+
+def get_create_if_not_exists_query(create_table_query):
+    return re.sub(r'CREATE\s+TABLE\s+(?!IF\s+NOT\s+EXISTS)', 'CREATE TABLE IF NOT EXISTS ', create_table_query, count=1, flags=re.I)
+
+def split_values_clause(values_clause):
+    # Split the VALUES (...) expressions on commas that are not nested inside function calls
+    expressions = []
+    depth = 0
+    current = ''
+    for char in values_clause:
+        if char == ',' and depth == 0:
+            expressions.append(current.strip())
+            current = ''
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        current += char
+    expressions.append(current.strip())
+    return expressions
+
+def get_load_data_query(file_path, table_name, insert_table_query):
+    match = re.search(r'INSERT\s+INTO\s+\S+\s*\((.*?)\)\s*VALUES\s*\((.*)\)', insert_table_query, re.I | re.S)
+    column_names = [column_name.strip() for column_name in match.group(1).split(',')]
+    expressions = split_values_clause(match.group(2))
+    
+    # Every %s placeholder is read into a user variable so expressions like
+    # SUBSTRING(%s, 3) or FROM_UNIXTIME(%s) are applied while loading
+    variables = [f'@v{index}' for index in range(len(expressions))]
+    set_clause = ', '.join([f"{column_name} = {expression.replace('%s', variable, 1)}" for column_name, expression, variable in zip(column_names, expressions, variables)])
+    
+    return f"""
+        LOAD DATA LOCAL INFILE '{file_path}' INTO TABLE {table_name}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+        LINES TERMINATED BY '\\n'
+        ({', '.join(variables)})
+        SET {set_clause}
+    """
+
+def format_infile_value(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+def load_batch_infile(connection, cursor, batch, table_name, insert_table_query):
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.csv', delete=False) as file:
+        for row in batch:
+            file.write(','.join([format_infile_value(value) for value in row]) + '\n')
+        file_path = file.name
+    try:
+        cursor.execute(get_load_data_query(file_path.replace('\\', '/'), table_name, insert_table_query))
+        # With LOCAL, rows rejected by MySQL are skipped with a warning instead of failing the load.
+        # The warnings do not say which rows, every row of the batch is returned as possibly skipped
+        skipped_rows = len(batch) - cursor.rowcount
+        if skipped_rows > 0:
+            cursor.execute("SHOW WARNINGS LIMIT 1")
+            return skipped_rows, list(range(len(batch))), cursor.fetchone()
+        return 0, [], None
+    finally:
+        os.remove(file_path)
+
+def print_load_stats(table_name):
+    stats = load_stats[table_name]
+    print(f"Loaded {stats['rows']} rows into {table_name} in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:.0f} rows/s, {stats['batches']} batches of {stats['batch_size']}, "
+          f"batch latency avg {stats['avg_batch_ms']:.1f} ms, max {stats['max_batch_ms']:.1f} ms).")
+    
+def insert_data(connection, cursor, df, headers, table_name, insert_table_query):
+    batch_size = bulk_load_settings['batch_size']
+    load_batch = load_batch_infile if bulk_load_settings['mode'] == 'infile' else insert_batch
+    
+    rows = get_row_tuples(df, headers)
+    batch_latencies = []
+    skipped_rows = 0
+    skipped_positions = []
+    first_error = None
+    start_time = time.perf_counter()
+    
+    # Rows up to the checkpoint offset were committed by an earlier run
+    position = checkpoint.next_position(table_name, len(rows))
+    committed_rows = min(max(checkpoint.get_table_offset(table_name) - position, 0), len(rows))
+    if committed_rows > 0:
+        print(f"Skipping {committed_rows} rows of {table_name} committed by an earlier run.")
+    # The batch after the offset may have been committed without being recorded, so resumed tables are upserted.
+    # LOAD DATA LOCAL already skips rows with a duplicate key
+    if checkpoint.is_table_resumed(table_name) and load_batch == insert_batch:
+        insert_table_query = get_upsert_query(insert_table_query)
+    # Changed rows of a delta run update the loaded ones, which LOAD DATA LOCAL cannot do
+    if delta.is_enabled():
+        load_batch = insert_batch
+        insert_table_query = get_upsert_query(insert_table_query)
+    
+    # Insert data into table in batches and commit after every batch
+    for start in range(committed_rows, len(rows), batch_size):
+        batch_start_time = time.perf_counter()
+        batch = rows[start:start + batch_size]
+        batch_skipped_rows, batch_skipped_positions, batch_error = load_batch(connection, cursor, batch, table_name, insert_table_query)
+        connection.commit()
+        checkpoint.record_offset(table_name, position + start + len(batch))
+        batch_latencies.append(time.perf_counter() - batch_start_time)
+        skipped_rows += batch_skipped_rows
+        skipped_positions += [start + batch_position for batch_position in batch_skipped_positions]
+        if first_error == None:
+            first_error = batch_error
+    
+    seconds = time.perf_counter() - start_time
+    inserted_rows = len(rows) - committed_rows - skipped_rows
+    load_stats[table_name] = {
+        'rows': inserted_rows,
+        'seconds': seconds,
+        'rows_per_second': inserted_rows / seconds if seconds > 0 else 0,
+        'batches': len(batch_latencies),
+        'batch_size': batch_size,
+        'avg_batch_ms': 1000 * np.mean(batch_latencies) if batch_latencies else 0,
+        'max_batch_ms': 1000 * np.max(batch_latencies) if batch_latencies else 0
+    }
     
     print(f"Dataframe inserted into table - {table_name}.")
+    print_load_stats(table_name)
+    if skipped_rows > 0:
+        print(f"Skipped {skipped_rows} rows rejected by MySQL in {table_name}. First error: {first_error}")
+    # Positions of the skipped rows in df, delta leaves them out of the manifest
+    return skipped_positions
       
 def create_database(host, user, password, database):
     try:
@@ -57,9 +293,11 @@ def create_database(host, user, password, database):
         if connection.is_connected():
             cursor = connection.cursor()
             
-            drop_db_query = f"DROP DATABASE IF EXISTS {database}"
-            cursor.execute(drop_db_query)
-            print(f"Dropped {database} successfully.")
+            # A resumed migration keeps the tables loaded by the interrupted run, a delta run the tables of the last run
+            if not checkpoint.is_resuming() and not delta.is_enabled():
+                drop_db_query = f"DROP DATABASE IF EXISTS {database}"
+                cursor.execute(drop_db_query)
+                print(f"Dropped {database} successfully.")
 
             # Create database if it does not exist
             create_db_query = f"CREATE DATABASE IF NOT EXISTS {database}"
@@ -74,27 +312,48 @@ def create_database(host, user, password, database):
         print("Error while creating database in MySQL.", e)
 
     finally:
-        if connection.is_connected():
-            connection.close()
+        release_db_connection(connection)
            
 def create_insert_table(df, host, user, password, database, table_name, create_table_query, headers, insert_table_query):
+    if bulk_load_settings['defer_constraints']:
+        # Keys are added once all tables are loaded, see constraints.add_deferred_constraints
+        create_table_query, deferred_constraints[table_name] = split_create_table_query(create_table_query)
+    
+    if checkpoint.is_table_done(table_name):
+        print(f"Skipped table {table_name}, it was loaded by an earlier run.")
+        return []
+    
+    skipped_positions = []
     try:
         # Connect to MySQL server
         connection = get_db_connection(host, user, password, database)
         
         if connection.is_connected():
             cursor = connection.cursor()
+            if bulk_load_settings['defer_constraints']:
+                set_bulk_load_checks(connection, False)
 
-            # Drop table if it exists
-            drop_table_query = f"DROP TABLE IF EXISTS {table_name}"
-            cursor.execute(drop_table_query)
-            print(f"Dropped table {table_name} if it exists.")
+            if checkpoint.is_table_started(table_name):
+                # Continue with the rows the interrupted run already committed
+                cursor.execute(get_create_if_not_exists_query(create_table_query))
+                print(f"Resuming table {table_name} after row {checkpoint.get_table_offset(table_name)}.")
+            elif delta.is_enabled():
+                # Upsert the new and changed rows into the table of the last run
+                cursor.execute(get_create_if_not_exists_query(create_table_query))
+                print(f"Updating table {table_name} with {len(df)} new or changed rows.")
+                checkpoint.mark_table_started(table_name)
+            else:
+                # Drop table if it exists
+                drop_table_query = f"DROP TABLE IF EXISTS {table_name}"
+                cursor.execute(drop_table_query)
+                print(f"Dropped table {table_name} if it exists.")
 
-            # Create new table
-            cursor.execute(create_table_query)
-            print(f"Created new table {table_name}.")
+                # Create new table
+                cursor.execute(create_table_query)
+                print(f"Created new table {table_name}.")
+                checkpoint.mark_table_started(table_name)
 
-            insert_data(cursor, df, headers, table_name, insert_table_query)
+            skipped_positions = insert_data(connection, cursor, df, headers, table_name, insert_table_query)
             
             # Commit changes and close cursor
             connection.commit()
@@ -105,8 +364,37 @@ def create_insert_table(df, host, user, password, database, table_name, create_t
         quit()
         
     finally:
+        release_db_connection(connection)
+    return skipped_positions
+
+def append_table(df, host, user, password, database, table_name, headers, insert_table_query):
+    if checkpoint.is_table_done(table_name):
+        return []
+    
+    skipped_positions = []
+    try:
+        # Connect to MySQL server
+        connection = get_db_connection(host, user, password, database)
+        
         if connection.is_connected():
-            connection.close()
+            cursor = connection.cursor()
+            if bulk_load_settings['defer_constraints']:
+                set_bulk_load_checks(connection, False)
+
+            # Insert into the table created for an earlier chunk
+            skipped_positions = insert_data(connection, cursor, df, headers, table_name, insert_table_query)
+            
+            # Commit changes and close cursor
+            connection.commit()
+            cursor.close()
+
+    except Error as e:
+        print(f"Error while appending to {table_name} in {database}.", e)
+        quit()
+        
+    finally:
+        release_db_connection(connection)
+    return skipped_positions
 
 def rename_table(host, user, password, database, old_table_name, new_table_name):
     try:
@@ -118,10 +406,8 @@ def rename_table(host, user, password, database, old_table_name, new_table_name)
             print(f"Renamed table {old_table_name} to {new_table_name}.")
             connection.commit()
             cursor.close()
-            connection.close()
     except Error as e:
         print("Error while renaming table in MySQL.", e)
 
     finally:
-        if connection.is_connected():
-            connection.close()
\ No newline at end of file
+        release_db_connection(connection)
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+import constants
+import db_manager
+
+# Delta settings, overridden from the command line arguments in main.py.
+# Every run writes a manifest per table with the hash of the key and of the whole row of every loaded row,
+# a delta run compares the source rows against it and only upserts the new and changed ones
+delta_settings = {'enabled': False, 'path': constants.DELTA_MANIFEST_PATH}
+delta_lock = threading.Lock()
+
+# Manifests read by this run and, for every chunk passed to MySQL, the hashes of its rows and which of them
+# go into the manifest. Written out once their table is done
+manifests = {}
+loaded_hashes = {}
+delta_stats = {}
+# Key hashes of every table seen in earlier chunks of this run
+seen_key_hashes = {}
+
+# tmdb ids of the new rows of every table and the tables with changed rows, used to refresh the summary tables
+new_tmdb_ids = {}
+changed_tables = set()
+SUMMARY_SOURCE_TABLES = [constants.MOVIES_METADATA_TABLE, constants.HEADER_GENRES[0], f'movie_{constants.HEADER_GENRES[0]}',
+                         constants.HEADER_KEYWORDS[0], f'movie_{constants.HEADER_KEYWORDS[0]}']
+
+def configure_delta(enabled, path=constants.DELTA_MANIFEST_PATH):
+    delta_settings['enabled'] = enabled
+    delta_settings['path'] = path
+
+def is_enabled():
+    return delta_settings['enabled']
+
+def get_manifest_file(table_name):
+    return os.path.join(delta_settings['path'], f'{table_name}.npy')
+
+def get_manifest(table_name):
+    # Sorted key hashes and the row hash of each key, empty for a full load
+    with delta_lock:
+        if table_name not in manifests:
+            manifest = np.zeros((0, 2), dtype=np.uint64)
+            manifest_file = get_manifest_file(table_name)
+            if delta_settings['enabled'] and os.path.exists(manifest_file):
+                manifest = np.load(manifest_file)
+            manifests[table_name] = manifest
+        return manifests[table_name]
+
+def get_column_headers(table):
+    # The insert query lists the table columns in the order of the DataFrame headers
+    match = re.search(r'INSERT\s+INTO\s+\S+\s*\((.*?)\)', table['insert_table_query'], re.I | re.S)
+    column_names = [column_name.strip() for column_name in match.group(1).split(',')]
+    return dict(zip(column_names, table['headers']))
+
+def get_key_headers(table, column_headers):
+    _, constraints = db_manager.split_create_table_query(table['create_table_query'])
+    if constraints['primary_key'] == None:
+        # Without a primary key the whole row is the key
+        return table['headers']
+    return [column_headers[column_name] for column_name in constraints['primary_key']]
+
+# Hash of a missing value in every column, whatever the dtype of the column
+NULL_HASH = np.uint64(0)
+
+def get_value_text(value):
+    if isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+def hash_numbers(values):
+    # Numbers are hashed as float64, so 1, 1.0 and True hash the same (adding 0.0 turns -0.0 into 0.0)
+    return pd.util.hash_array(values.astype(np.float64) + 0.0)
+
+def hash_column(column):
+    # Hash of every value as MySQL receives it. A value hashes the same whatever dtype pandas gave its column in
+    # this chunk, e.g. 1 in an int64 column, 1.0 in a float64 column and 1.0 in an object column after replace(np.nan, None)
+    null = column.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        hashes = hash_numbers(column.to_numpy(dtype=np.float64, na_value=np.nan))
+    else:
+        values = column.astype(object).where(~null, None)
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if kind in ['integer', 'floating', 'mixed-integer-float', 'boolean']:
+            hashes = hash_numbers(values.to_numpy(dtype=np.float64, na_value=np.nan))
+        elif kind in ['string', 'empty']:
+            hashes = pd.util.hash_array(values.fillna('').to_numpy(dtype=object))
+        else:
+            # Mixed values are hashed by their text
+            hashes = pd.util.hash_array(np.array([get_value_text(value) if value is not None else '' for value in values.tolist()], dtype=object))
+    hashes[null] = NULL_HASH
+    return hashes
+
+def hash_rows(df, headers):
+    # Rows are hashed from the hashes of their values, so the hashes do not change with the chunking or the dtypes of a chunk
+    column_hashes = pd.DataFrame({index: hash_column(df[header]) for index, header in enumerate(headers)})
+    return pd.util.hash_pandas_object(column_hashes, index=False).to_numpy()
+
+def filter_table(table):
+    # Returns the table with only its new and changed rows in delta mode, and records the hashes of the rows to load
+    table_name = table['table_name']
+    df = table['df']
+    column_headers = get_column_headers(table)
+    key_hashes = hash_rows(df, get_key_headers(table, column_headers))
+    row_hashes = hash_rows(df, table['headers'])
+
+    manifest = get_manifest(table_name)
+    found = np.zeros(len(df), dtype=bool)
+    unchanged = np.zeros(len(df), dtype=bool)
+    if len(manifest) > 0:
+        positions = np.minimum(np.searchsorted(manifest[:, 0], key_hashes), len(manifest) - 1)
+        found = manifest[positions, 0] == key_hashes
+        unchanged = found & (manifest[positions, 1] == row_hashes)
+    with delta_lock:
+        # A full load keeps the first row of a repeated key (MySQL rejects the others), so does the delta
+        seen_keys = seen_key_hashes.setdefault(table_name, set())
+        seen_before = np.fromiter((key_hash in seen_keys for key_hash in key_hashes.tolist()), dtype=bool, count=len(key_hashes))
+        duplicate = pd.Series(key_hashes).duplicated().to_numpy() | seen_before
+        seen_keys.update(key_hashes.tolist())
+        load = ~unchanged & ~duplicate
+        changed = found & load
+
+        # Rows in the order they are passed to MySQL, the ones it rejects are left out by discard_rows
+        passed = load if delta_settings['enabled'] else np.ones(len(df), dtype=bool)
+        loaded_hashes.setdefault(table_name, []).append({'hashes': np.column_stack([key_hashes[passed], row_hashes[passed]]), 'loaded': load[passed]})
+        stats = delta_stats.setdefault(table_name, {'new': 0, 'changed': 0, 'unchanged': 0, 'duplicate': 0})
+        stats['new'] += int(np.count_nonzero(~found & load))
+        stats['changed'] += int(np.count_nonzero(changed))
+        stats['unchanged'] += int(np.count_nonzero(unchanged))
+        stats['duplicate'] += int(np.count_nonzero(duplicate & ~unchanged))
+        if np.any(changed):
+            changed_tables.add(table_name)
+        if constants.HEADER_TMDB_ID in column_headers:
+            tmdb_ids = pd.to_numeric(df.loc[~found & load, column_headers[constants.HEADER_TMDB_ID]], errors='coerce').dropna()
+            new_tmdb_ids.setdefault(table_name, set()).update(tmdb_ids.astype(int).tolist())
+
+    if not delta_settings['enabled']:
+        return table
+    return dict(table, df=df[load])
+
+def discard_rows(table_name, positions):
+    # Rows of the last chunk of the table that MySQL rejected (e.g. a missing parent row) are not recorded as loaded,
+    # so the next delta run sends them again. positions are rows of the DataFrame filter_table returned
+    if len(positions) == 0:
+        return
+    with delta_lock:
+        loaded_hashes[table_name][-1]['loaded'][positions] = False
+
+def save_manifest(table_name):
+    # Called once every row of the table is committed, the hashes of this run replace the older ones of the same key
+    with delta_lock:
+        if table_name not in loaded_hashes:
+            return
+        chunks = loaded_hashes.pop(table_name)
+        manifest = np.concatenate([chunk['hashes'][chunk['loaded']] for chunk in chunks] + [manifests.get(table_name, np.zeros((0, 2), dtype=np.uint64))])
+        _, first_positions = np.unique(manifest[:, 0], return_index=True)
+        manifest = manifest[first_positions]
+        manifests[table_name] = manifest
+
+        os.makedirs(delta_settings['path'], exist_ok=True)
+        manifest_file = get_manifest_file(table_name)
+        # Write to a temporary file first so an interrupted run never corrupts the manifest
+        with open(manifest_file + '.tmp', 'wb') as file:
+            np.save(file, manifest)
+        os.replace(manifest_file + '.tmp', manifest_file)
+
+def needs_summary_rebuild():
+    # The summary tables can only add new movies, changed rows or new rows of existing movies need a rebuild
+    if changed_tables & set(SUMMARY_SOURCE_TABLES):
+        return True
+    new_movie_ids = new_tmdb_ids.get(constants.MOVIES_METADATA_TABLE, set())
+    return any(new_tmdb_ids.get(table_name, set()) - new_movie_ids for table_name in SUMMARY_SOURCE_TABLES)
+
+def print_delta_stats():
+    for table_name, stats in delta_stats.items():
+        print(f"Delta of {table_name}: {stats['new']} new, {stats['changed']} changed, {stats['unchanged']} unchanged rows "
+              f"({stats['duplicate']} rows repeating a key skipped).")
@@ -1,6 +1,15 @@
 import constants
 import db_manager
+import connection_pool
+import checkpoint
 import data_processing
+import scheduler
+import constraints
+import summary_tables
+import profiler
+import delta
+import staging_cache
+import credits_parser
 
 # main function
 def main():
@@ -9,17 +18,47 @@ def main():
     host=db_credentilas['host']
     user=db_credentilas['user']
     password=db_credentilas['password']
+    # The tables of a delta run already have their keys
+    if db_credentilas['delta'] and db_credentilas['defer_constraints']:
+        print("Ignoring --defer-constraints, a delta run upserts into the existing tables.")
+    db_manager.configure_bulk_load(db_credentilas['batch_size'], db_credentilas['load_mode'], db_credentilas['defer_constraints'] and not db_credentilas['delta'])
+    connection_pool.configure_pool(db_credentilas['pool_size'])
+    data_processing.configure_chunking(db_credentilas['chunk_size'])
+    checkpoint.configure_checkpoint(db_credentilas['resume'], db_credentilas['chunk_size'])
+    profiler.configure_profiler(db_credentilas['profile'])
+    delta.configure_delta(db_credentilas['delta'])
+    staging_cache.configure_cache(db_credentilas['staging_cache'], db_credentilas['staging_cache_dir'])
+    if db_credentilas['profile'] and staging_cache.is_enabled():
+        print("The csv files are parsed to profile them, the staging cache is only written.")
+    # The parse jobs of --parallel already run on a process pool, their cast and crew jobs are not sharded
+    if db_credentilas['parallel'] and db_credentilas['credits_workers'] != None:
+        print("Ignoring --credits-workers, --parallel parses cast and crew in their own processes.")
+    else:
+        credits_parser.configure_credits_parser(db_credentilas['credits_workers'])
 
     db_manager.create_database(host, user,password, constants.DATABASE_NAME)
     
-    #LOAD CSV DATASETS
-    data_processing.load_movies_metadata(host, user, password)
-    data_processing.load_keywords(host, user, password)
-    data_processing.load_links(host, user, password)
-    data_processing.load_ratings(host, user,password)
-    data_processing.load_credits(host, user, password)  
+    if db_credentilas['parallel']:
+        scheduler.run_migration(host, user, password, db_credentilas['parse_workers'], db_credentilas['write_workers'])
+    else:
+        #LOAD CSV DATASETS
+        data_processing.load_movies_metadata(host, user, password)
+        data_processing.load_keywords(host, user, password)
+        data_processing.load_links(host, user, password)
+        data_processing.load_ratings(host, user,password)
+        data_processing.load_credits(host, user, password)  
     
+    if db_manager.bulk_load_settings['defer_constraints']:
+        constraints.add_deferred_constraints(host, user, password, constants.DATABASE_NAME)
     
+    if db_credentilas['delta']:
+        delta.print_delta_stats()
+    summary_tables.update_summary_tables(host, user, password, constants.DATABASE_NAME, data_processing.loaded_movie_ids, delta.needs_summary_rebuild())
+    
+    if db_credentilas['profile']:
+        profiler.print_profiles()
+    connection_pool.print_pool_stats()
+    connection_pool.close_pools()
     
 # call main function
 if __name__=="__main__": 
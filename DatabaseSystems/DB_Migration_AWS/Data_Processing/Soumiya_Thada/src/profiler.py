@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Profiling settings, overridden from the command line arguments in main.py
+profile_settings = {'enabled': False}
+
+# Profile of every source file and parent table cleaned by clean_df, built up chunk by chunk
+profiles = {}
+
+# HyperLogLog with 2^12 registers, about 1.6% standard error on the distinct counts
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+REJECTED_SAMPLE_SIZE = 5
+MAX_SAMPLE_VALUE_LENGTH = 80
+
+def configure_profiler(enabled):
+    profile_settings['enabled'] = enabled
+
+def is_enabled():
+    return profile_settings['enabled']
+
+def get_profile(profile_name):
+    if profile_name not in profiles:
+        profiles[profile_name] = {'rows': 0, 'null_counts': {}, 'registers': {}, 'rejected_counts': {}, 'rejected_samples': {}}
+    return profiles[profile_name]
+
+def hash_values(column):
+    try:
+        return pd.util.hash_pandas_object(column, index=False).to_numpy()
+    except TypeError:
+        # Unhashable values (lists or dicts left in a column) are hashed by their text
+        return pd.util.hash_pandas_object(column.astype(str), index=False).to_numpy()
+
+def get_hll_registers(column):
+    registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+    hashes = hash_values(column.dropna())
+    if len(hashes) == 0:
+        return registers
+
+    # The first bits of the hash pick the register, the rank is the position of the first 1 bit in the rest.
+    # The sentinel bit caps the rank when the remaining bits are all 0
+    register_index = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+    remaining_bits = (hashes << np.uint64(HLL_PRECISION)) | np.uint64(1 << (HLL_PRECISION - 1))
+    # log2 of the float value can round up to the next power of two, the shift test corrects it
+    highest_bit = np.minimum(np.floor(np.log2(remaining_bits.astype(np.float64))).astype(np.int64), 63)
+    highest_bit -= ((remaining_bits >> highest_bit.astype(np.uint64)) == 0).astype(np.int64)
+    ranks = (64 - highest_bit).astype(np.uint8)
+    np.maximum.at(registers, register_index, ranks)
+    return registers
+
+def estimate_distinct(registers):
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    estimate = alpha * HLL_REGISTERS ** 2 / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    empty_registers = np.count_nonzero(registers == 0)
+    # Linear counting is more accurate while many registers are still empty
+    if estimate <= 2.5 * HLL_REGISTERS and empty_registers > 0:
+        estimate = HLL_REGISTERS * np.log(HLL_REGISTERS / empty_registers)
+    return int(round(estimate))
+
+def get_sample_row(row):
+    return {column_name: value if not isinstance(value, str) or len(value) <= MAX_SAMPLE_VALUE_LENGTH else value[:MAX_SAMPLE_VALUE_LENGTH] + '...'
+            for column_name, value in row.items()}
+
+def record_rejected(profile_name, df, rejected_mask, reason):
+    profile = get_profile(profile_name)
+    rejected_rows = int(np.count_nonzero(rejected_mask))
+    if rejected_rows == 0:
+        return
+    profile['rejected_counts'][reason] = profile['rejected_counts'].get(reason, 0) + rejected_rows
+    samples = profile['rejected_samples'].setdefault(reason, [])
+    if len(samples) < REJECTED_SAMPLE_SIZE:
+        sample_df = df[rejected_mask].head(REJECTED_SAMPLE_SIZE - len(samples))
+        samples.extend([get_sample_row(row) for row in sample_df.to_dict('records')])
+
+def profile_chunk(profile_name, df, is_null, null_mask, duplicate_mask):
+    # Uses the null flags clean_df already computed, the data is only read again to hash each column once
+    profile = get_profile(profile_name)
+    profile['rows'] += len(df)
+    for column_name, null_count in is_null.sum().items():
+        profile['null_counts'][column_name] = profile['null_counts'].get(column_name, 0) + int(null_count)
+        registers = get_hll_registers(df[column_name])
+        if column_name in profile['registers']:
+            registers = np.maximum(profile['registers'][column_name], registers)
+        profile['registers'][column_name] = registers
+    record_rejected(profile_name, df, null_mask, 'null key')
+    record_rejected(profile_name, df, duplicate_mask, 'duplicate key')
+
+def merge_profiles(other_profiles):
+    # Profiles collected by the parse processes of the scheduler, HyperLogLog registers merge by maximum
+    for profile_name, other in other_profiles.items():
+        profile = get_profile(profile_name)
+        profile['rows'] += other['rows']
+        for column_name, null_count in other['null_counts'].items():
+            profile['null_counts'][column_name] = profile['null_counts'].get(column_name, 0) + null_count
+        for column_name, registers in other['registers'].items():
+            if column_name in profile['registers']:
+                registers = np.maximum(profile['registers'][column_name], registers)
+            profile['registers'][column_name] = registers
+        for reason, rejected_rows in other['rejected_counts'].items():
+            profile['rejected_counts'][reason] = profile['rejected_counts'].get(reason, 0) + rejected_rows
+            samples = profile['rejected_samples'].setdefault(reason, [])
+            samples.extend(other['rejected_samples'][reason][:REJECTED_SAMPLE_SIZE - len(samples)])
+
+def print_profiles():
+    for profile_name, profile in profiles.items():
+        kept_rows = profile['rows'] - sum(profile['rejected_counts'].values())
+        print(f"Data profile of {profile_name}: {profile['rows']} rows, {kept_rows} kept.")
+        for column_name, null_count in profile['null_counts'].items():
+            distinct_values = estimate_distinct(profile['registers'][column_name])
+            print(f"    {column_name}: {null_count} nulls, ~{distinct_values} distinct values")
+        for reason, rejected_rows in profile['rejected_counts'].items():
+            print(f"    rejected for {reason}: {rejected_rows} rows, e.g.")
+            for sample in profile['rejected_samples'][reason]:
+                print(f"        {sample}")
@@ -0,0 +1,105 @@
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import constants
+import data_processing
+import db_manager
+import profiler
+import staging_cache
+
+def get_table_dependencies(table_name, create_table_query):
+    # Tables referenced by the FOREIGN KEY declarations of the CREATE TABLE statement
+    referenced_tables = re.findall(r'references\s+(\w+)\s*\(', create_table_query, re.I)
+    return set(referenced_tables) - {table_name}
+
+def get_parse_jobs():
+    # Every job parses one source file (or one nested column of it) and returns its tables
+    parse_jobs = [(data_processing.parse_movie_metadata_tables, ())]
+    for header in constants.primary_table_headers:
+        parse_jobs.append((data_processing.parse_movie_metadata_header_tables, (header,)))
+    for header in constants.keywords_table_headers:
+        parse_jobs.append((data_processing.parse_keywords_tables, (header,)))
+    parse_jobs.append((data_processing.parse_links_tables, ()))
+    parse_jobs.append((data_processing.parse_ratings_tables, ()))
+    parse_jobs.append((data_processing.parse_credits_tables, (constants.HEADER_CAST, 'cast', constants.CASTS_TABLE)))
+    parse_jobs.append((data_processing.parse_credits_tables, (constants.HEADER_CREW, 'crew', constants.CREWS_TABLE)))
+    return parse_jobs
+
+def init_parse_worker(chunk_size, profile, cache_settings):
+    # Parse processes get the settings of the main process, they do not inherit them on every platform
+    data_processing.configure_chunking(chunk_size)
+    profiler.configure_profiler(profile)
+    staging_cache.configure_cache(cache_settings['enabled'], cache_settings['path'])
+
+def run_parse_job(function, args):
+    # Runs in a parse process, the profiles of the job are sent back with its tables
+    profiler.profiles.clear()
+    return function(*args), profiler.profiles
+
+def load_table(table, host, user, password):
+    start_time = time.perf_counter()
+    data_processing.load_tables([table], host, user, password)
+    return time.perf_counter() - start_time
+
+def get_ready_tables(tables, dependencies, submitted_tables, loaded_tables, parsing_done):
+    ready_tables = []
+    for table_name in tables:
+        if table_name in submitted_tables:
+            continue
+        # A referenced table that is not parsed yet may still come from a running parse job
+        waiting_for = {dependency for dependency in dependencies[table_name] - loaded_tables if dependency in tables or not parsing_done}
+        if not waiting_for:
+            ready_tables.append(table_name)
+    return ready_tables
+
+def run_migration(host, user, password, parse_workers=None, write_workers=4):
+    start_time = time.perf_counter()
+    tables = {}
+    dependencies = {}
+    submitted_tables = set()
+    loaded_tables = set()
+    load_times = {}
+    
+    # Parsing is CPU bound and runs on a process pool, loading waits on MySQL and runs on a thread pool
+    with ProcessPoolExecutor(max_workers=parse_workers, initializer=init_parse_worker, initargs=(data_processing.chunk_settings['chunk_size'], profiler.is_enabled(), staging_cache.cache_settings)) as parse_pool, ThreadPoolExecutor(max_workers=write_workers) as write_pool:
+        parse_futures = [parse_pool.submit(run_parse_job, function, args) for function, args in get_parse_jobs()]
+        write_futures = {}
+        pending = set(parse_futures)
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in write_futures:
+                    table_name = write_futures[future]
+                    load_times[table_name] = future.result()
+                    loaded_tables.add(table_name)
+                else:
+                    parsed_tables, parse_profiles = future.result()
+                    profiler.merge_profiles(parse_profiles)
+                    for table in parsed_tables:
+                        tables[table['table_name']] = table
+                        # Without foreign keys during the load every table can be loaded as soon as it is parsed
+                        if db_manager.bulk_load_settings['defer_constraints']:
+                            dependencies[table['table_name']] = set()
+                        else:
+                            dependencies[table['table_name']] = get_table_dependencies(table['table_name'], table['create_table_query'])
+                        print(f"Parsed table {table['table_name']}.")
+            
+            # Start loading every parsed table whose referenced tables are already loaded
+            parsing_done = all(parse_future.done() for parse_future in parse_futures)
+            for table_name in get_ready_tables(tables, dependencies, submitted_tables, loaded_tables, parsing_done):
+                write_future = write_pool.submit(load_table, tables[table_name], host, user, password)
+                write_futures[write_future] = table_name
+                submitted_tables.add(table_name)
+                pending.add(write_future)
+                # Drop the reference so the DataFrame is freed once it is loaded
+                tables[table_name] = None
+    
+    not_loaded_tables = set(tables) - loaded_tables
+    if not_loaded_tables:
+        print(f"Tables not loaded because of circular foreign keys: {not_loaded_tables}")
+    
+    print(f"Loaded {len(loaded_tables)} tables in {time.perf_counter() - start_time:.2f}s wall-clock, "
+          f"{sum(load_times.values()):.2f}s of table loads.")
+    for table_name in sorted(load_times, key=load_times.get, reverse=True):
+        print(f"    {table_name}: {load_times[table_name]:.2f}s")
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import shutil
+import constants
+
+# Table cache of the TMDB loader and the NYT author loader, every project has a copy of this file and
+# DatabaseSystems/tests/test_shared_copies.py fails when the copies differ
+
+# pyarrow is only needed for the staging cache, the loader runs without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Staging cache settings, overridden from the command line arguments in main.py.
+# The tables parsed from a csv file are written to Parquet, a later run on the same file
+# reads them back with memory mapping instead of parsing the file again
+cache_settings = {'enabled': False, 'path': constants.STAGING_CACHE_PATH}
+
+# Part of every cache key, bumped in constants.py when the parsing of the project changes so older entries are not reused
+CACHE_VERSION = constants.STAGING_CACHE_VERSION
+ENTRY_FILE = 'entry.json'
+
+# sha256 of every source file hashed by this process
+file_digests = {}
+
+def configure_cache(enabled, path=constants.STAGING_CACHE_PATH):
+    if enabled and pa == None:
+        print("pyarrow is not installed, the staging cache is disabled.")
+        enabled = False
+    cache_settings['enabled'] = enabled
+    cache_settings['path'] = path
+
+def is_enabled():
+    return cache_settings['enabled']
+
+def get_file_digest(file):
+    # Read in blocks so a large csv file is never held in memory
+    if file not in file_digests:
+        digest = hashlib.sha256()
+        with open(file, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+        file_digests[file] = digest.hexdigest()
+    return file_digests[file]
+
+def get_cache_key(stream_name, files, key_args):
+    # The key changes with the content of the source files and with the arguments of the stream
+    key = hashlib.sha256(repr((CACHE_VERSION, stream_name, key_args)).encode())
+    for file in files:
+        key.update(get_file_digest(file).encode())
+    return key.hexdigest()
+
+def get_column_dtypes(df):
+    return {column_name: str(dtype) for column_name, dtype in df.dtypes.items()}
+
+def restore_dtypes(df, dtypes):
+    # Columns read back from Arrow get the pandas dtype they were written with
+    for column_name, dtype in dtypes.items():
+        if dtype == 'object':
+            # Missing values of object columns are None, as after replace(np.nan, None)
+            column = df[column_name].astype(object)
+            df[column_name] = column.where(column.notna(), None)
+        elif str(df[column_name].dtype) != dtype:
+            df[column_name] = df[column_name].astype(dtype)
+    return df
+
+def read_table_df(file, dtypes):
+    return restore_dtypes(pq.read_table(file, memory_map=True).to_pandas(), dtypes)
+
+def read_entry(entry_path):
+    with open(os.path.join(entry_path, ENTRY_FILE), 'r') as file:
+        entry = json.load(file)
+    for chunk_tables in entry:
+        tables = []
+        for table in chunk_tables:
+            df = read_table_df(os.path.join(entry_path, table.pop('file')), table.pop('dtypes'))
+            tables.append(dict(table, df=df))
+        yield tables
+
+def write_chunk(temp_path, chunk_index, tables):
+    # Only the columns inserted into MySQL are written
+    chunk_tables = []
+    for table in tables:
+        df = table['df'][table['headers']]
+        file_name = f"{chunk_index:05d}_{table['table_name']}.parquet"
+        try:
+            arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Not caching {table['table_name']}, it has values Parquet cannot store.", e)
+            return None
+        pq.write_table(arrow_table, os.path.join(temp_path, file_name))
+        chunk_tables.append({'table_name': table['table_name'], 'file': file_name, 'dtypes': get_column_dtypes(df), 'headers': table['headers'],
+                             'create_table_query': table['create_table_query'], 'insert_table_query': table['insert_table_query']})
+    return chunk_tables
+
+def write_entry(entry_path, table_chunks):
+    # The entry is written to a temporary directory and renamed once the last chunk is written,
+    # so a run stopped halfway never leaves an incomplete entry behind
+    temp_path = f'{entry_path}.{os.getpid()}.tmp'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    entry = []
+    try:
+        for chunk_index, tables in enumerate(table_chunks):
+            if entry != None:
+                chunk_tables = write_chunk(temp_path, chunk_index, tables)
+                entry = entry + [chunk_tables] if chunk_tables != None else None
+            yield tables
+        if entry != None:
+            with open(os.path.join(temp_path, ENTRY_FILE), 'w') as file:
+                json.dump(entry, file)
+            try:
+                os.replace(temp_path, entry_path)
+            except OSError:
+                # Another process wrote the same entry first
+                pass
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+def cached_stream(stream_name, files, key_args, table_chunks, read=True):
+    # Yields the tables of every chunk of table_chunks, from the cache entry of the source files when there is one
+    if not cache_settings['enabled']:
+        for tables in table_chunks:
+            yield tables
+        return
+
+    entry_path = os.path.join(cache_settings['path'], get_cache_key(stream_name, files, key_args))
+    if read and os.path.exists(os.path.join(entry_path, ENTRY_FILE)):
+        print(f"Reading the tables of {stream_name} from the staging cache {entry_path}.")
+        for tables in read_entry(entry_path):
+            yield tables
+        return
+    os.makedirs(cache_settings['path'], exist_ok=True)
+    for tables in write_entry(entry_path, table_chunks):
+        yield tables
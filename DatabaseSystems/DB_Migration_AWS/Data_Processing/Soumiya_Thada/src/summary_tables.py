@@ -0,0 +1,174 @@
+import time
+from mysql.connector import Error
+import constants
+import db_manager
+
+GENRES_TABLE = constants.HEADER_GENRES[0]
+KEYWORDS_TABLE = constants.HEADER_KEYWORDS[0]
+SUMMARY_TABLES = [constants.SUMMARY_VOTE_STATS_TABLE, constants.SUMMARY_GENRE_TOP_POPULAR_TABLE, constants.SUMMARY_KEYWORD_FREQUENCY_TABLE]
+
+# Temporary tables of an incremental refresh
+REFRESH_IDS_TABLE = 'summary_refresh_ids'
+REFRESH_GENRES_TABLE = 'summary_refresh_genres'
+GENRE_CANDIDATES_TABLE = 'summary_genre_candidates'
+
+def create_summary_tables(cursor):
+    for table_name in SUMMARY_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+    # Sums are kept next to the average so new movies can be added without rescanning movie_metadata
+    cursor.execute(f"""
+        CREATE TABLE {constants.SUMMARY_VOTE_STATS_TABLE} (
+        stats_id tinyint PRIMARY KEY,
+        movie_count int,
+        rated_movie_count int,
+        vote_count_sum bigint,
+        vote_average_sum double,
+        vote_average_mean double
+    )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE {constants.SUMMARY_GENRE_TOP_POPULAR_TABLE} (
+        genres_id varchar(255),
+        genre_rank int,
+        genre_name varchar(255),
+        {constants.HEADER_TMDB_ID} int,
+        title varchar(255),
+        popularity float,
+        PRIMARY KEY(genres_id, genre_rank)
+    )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE {constants.SUMMARY_KEYWORD_FREQUENCY_TABLE} (
+        keywords_id varchar(255) PRIMARY KEY,
+        name varchar(255),
+        movie_count int,
+        INDEX(movie_count)
+    )
+    """)
+
+def get_ranked_genre_movies_query(source_query):
+    # Top movies of every genre in the rows of source_query (genres_id, genre_name, tmdb_id, title, popularity)
+    return f"""
+        INSERT INTO {constants.SUMMARY_GENRE_TOP_POPULAR_TABLE}
+        (genres_id, genre_rank, genre_name, {constants.HEADER_TMDB_ID}, title, popularity)
+        SELECT genres_id, genre_rank, genre_name, {constants.HEADER_TMDB_ID}, title, popularity
+        FROM (
+            SELECT
+                genres_id, genre_name, {constants.HEADER_TMDB_ID}, title, popularity,
+                ROW_NUMBER() OVER(PARTITION BY genres_id ORDER BY popularity DESC) AS genre_rank
+            FROM ({source_query}) AS genre_movies
+        ) AS ranked_movies
+        WHERE genre_rank <= {constants.SUMMARY_TOP_POPULAR_MOVIES}
+    """
+
+def get_genre_movies_query(id_filter=''):
+    return f"""
+        SELECT movie_genres.genres_id, {GENRES_TABLE}.name AS genre_name, {constants.MOVIES_METADATA_TABLE}.{constants.HEADER_TMDB_ID},
+               {constants.MOVIES_METADATA_TABLE}.title, {constants.MOVIES_METADATA_TABLE}.popularity
+        FROM movie_{GENRES_TABLE} AS movie_genres
+        JOIN {constants.MOVIES_METADATA_TABLE} ON {constants.MOVIES_METADATA_TABLE}.{constants.HEADER_TMDB_ID} = movie_genres.{constants.HEADER_TMDB_ID}
+        JOIN {GENRES_TABLE} ON {GENRES_TABLE}.genres_id = movie_genres.genres_id
+        {id_filter}
+    """
+
+def get_keyword_counts_query(id_filter=''):
+    return f"""
+        SELECT movie_keywords.keywords_id, {KEYWORDS_TABLE}.name, COUNT(*) AS movie_count
+        FROM movie_{KEYWORDS_TABLE} AS movie_keywords
+        JOIN {KEYWORDS_TABLE} ON {KEYWORDS_TABLE}.keywords_id = movie_keywords.keywords_id
+        {id_filter}
+        GROUP BY movie_keywords.keywords_id, {KEYWORDS_TABLE}.name
+    """
+
+def get_vote_stats_query(id_filter=''):
+    return f"""
+        SELECT 1, COUNT(*), COUNT(vote_average), COALESCE(SUM(vote_count), 0), COALESCE(SUM(vote_average), 0), AVG(vote_average)
+        FROM {constants.MOVIES_METADATA_TABLE}
+        {id_filter}
+    """
+
+def build_summary_tables(cursor):
+    create_summary_tables(cursor)
+    cursor.execute(f"INSERT INTO {constants.SUMMARY_VOTE_STATS_TABLE} {get_vote_stats_query()}")
+    cursor.execute(get_ranked_genre_movies_query(get_genre_movies_query()))
+    cursor.execute(f"INSERT INTO {constants.SUMMARY_KEYWORD_FREQUENCY_TABLE} (keywords_id, name, movie_count) {get_keyword_counts_query()}")
+
+def refresh_summary_tables(cursor, tmdb_ids):
+    # Add the given (newly loaded) movies to the summary tables without rebuilding them
+    for table_name in [REFRESH_IDS_TABLE, REFRESH_GENRES_TABLE, GENRE_CANDIDATES_TABLE]:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table_name}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {REFRESH_IDS_TABLE} ({constants.HEADER_TMDB_ID} int PRIMARY KEY)")
+    cursor.executemany(f"INSERT INTO {REFRESH_IDS_TABLE} ({constants.HEADER_TMDB_ID}) VALUES (%s)", [(tmdb_id,) for tmdb_id in tmdb_ids])
+
+    id_condition = f"{constants.HEADER_TMDB_ID} IN (SELECT {constants.HEADER_TMDB_ID} FROM {REFRESH_IDS_TABLE})"
+    # MySQL assigns left to right, the mean comes first so it is computed from the sums before they are updated
+    cursor.execute(f"""
+        INSERT INTO {constants.SUMMARY_VOTE_STATS_TABLE} {get_vote_stats_query(f"WHERE {id_condition}")}
+        ON DUPLICATE KEY UPDATE
+            vote_average_mean = (vote_average_sum + VALUES(vote_average_sum)) / NULLIF(rated_movie_count + VALUES(rated_movie_count), 0),
+            movie_count = movie_count + VALUES(movie_count),
+            rated_movie_count = rated_movie_count + VALUES(rated_movie_count),
+            vote_count_sum = vote_count_sum + VALUES(vote_count_sum),
+            vote_average_sum = vote_average_sum + VALUES(vote_average_sum)
+    """)
+
+    cursor.execute(f"""
+        INSERT INTO {constants.SUMMARY_KEYWORD_FREQUENCY_TABLE} (keywords_id, name, movie_count)
+        {get_keyword_counts_query(f"WHERE movie_keywords.{id_condition}")}
+        ON DUPLICATE KEY UPDATE movie_count = movie_count + VALUES(movie_count)
+    """)
+
+    # The new top movies of a genre are among its current top movies and its new movies,
+    # only the genres of the new movies are ranked again.
+    # A temporary table can only be opened once per statement, the refreshed genres get their own
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {REFRESH_GENRES_TABLE} AS
+        SELECT DISTINCT genres_id FROM movie_{GENRES_TABLE} WHERE {id_condition}
+    """)
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {GENRE_CANDIDATES_TABLE} AS
+        {get_genre_movies_query(f"WHERE movie_genres.{id_condition}")}
+    """)
+    cursor.execute(f"""
+        INSERT INTO {GENRE_CANDIDATES_TABLE}
+        SELECT genres_id, genre_name, {constants.HEADER_TMDB_ID}, title, popularity
+        FROM {constants.SUMMARY_GENRE_TOP_POPULAR_TABLE}
+        WHERE genres_id IN (SELECT genres_id FROM {REFRESH_GENRES_TABLE})
+        AND {constants.HEADER_TMDB_ID} NOT IN (SELECT {constants.HEADER_TMDB_ID} FROM {REFRESH_IDS_TABLE})
+    """)
+    cursor.execute(f"DELETE FROM {constants.SUMMARY_GENRE_TOP_POPULAR_TABLE} WHERE genres_id IN (SELECT genres_id FROM {REFRESH_GENRES_TABLE})")
+    cursor.execute(get_ranked_genre_movies_query(f"SELECT * FROM {GENRE_CANDIDATES_TABLE}"))
+
+    for table_name in [GENRE_CANDIDATES_TABLE, REFRESH_GENRES_TABLE, REFRESH_IDS_TABLE]:
+        cursor.execute(f"DROP TEMPORARY TABLE {table_name}")
+
+def summary_tables_exist(cursor, database):
+    cursor.execute(f"SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name IN ({', '.join(['%s'] * len(SUMMARY_TABLES))})",
+                   (database, *SUMMARY_TABLES))
+    return cursor.fetchone()[0] == len(SUMMARY_TABLES)
+
+def update_summary_tables(host, user, password, database, loaded_movie_ids, rebuild=False):
+    # Summary tables are built once after the first load, later loads only add their new movies
+    start_time = time.perf_counter()
+    try:
+        connection = db_manager.get_db_connection(host, user, password, database)
+        if connection.is_connected():
+            cursor = connection.cursor()
+            if not rebuild and summary_tables_exist(cursor, database):
+                if loaded_movie_ids:
+                    refresh_summary_tables(cursor, sorted(loaded_movie_ids))
+                action = f"Refreshed summary tables for {len(loaded_movie_ids)} movies"
+            else:
+                build_summary_tables(cursor)
+                action = "Built summary tables"
+            connection.commit()
+            cursor.close()
+            print(f"{action} in {time.perf_counter() - start_time:.2f}s.")
+
+    except Error as e:
+        print(f"Error while updating the summary tables in {database}.", e)
+        quit()
+
+    finally:
+        db_manager.release_db_connection(connection)
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+import checkpoint
+import db_manager
+
+INSERT_QUERY = "INSERT INTO links (movieId, imdbId) VALUES (%s, %s)"
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakeCursor:
+    def __init__(self, fail_at_batch=None):
+        self.batches = []
+        self.queries = []
+        self.fail_at_batch = fail_at_batch
+
+    def executemany(self, query, batch):
+        if len(self.batches) == self.fail_at_batch:
+            raise RuntimeError('worker killed')
+        self.batches.append(list(batch))
+        self.queries.append(query)
+
+def start_process(path, resume, chunk_size=None):
+    # A new run only keeps what is in the journal file
+    checkpoint.journal.update({'chunk_size': None, 'tables': {}})
+    checkpoint.resumed_tables.clear()
+    checkpoint.table_positions.clear()
+    checkpoint.configure_checkpoint(resume, chunk_size, path)
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    monkeypatch.setitem(db_manager.bulk_load_settings, 'batch_size', 2)
+    monkeypatch.setitem(db_manager.bulk_load_settings, 'mode', 'executemany')
+    yield str(tmp_path / 'checkpoint.json')
+    start_process(str(tmp_path / 'reset.json'), False)
+
+def get_links(first, last):
+    return pd.DataFrame({'movieId': range(first, last), 'imdbId': range(100 + first, 100 + last)})
+
+def test_resume_continues_after_the_last_committed_batch(journal_path):
+    start_process(journal_path, False)
+    checkpoint.mark_table_started('links')
+    with pytest.raises(RuntimeError):
+        db_manager.insert_data(FakeConnection(), FakeCursor(fail_at_batch=1), get_links(0, 5), ['movieId', 'imdbId'], 'links', INSERT_QUERY)
+    assert checkpoint.get_table_offset('links') == 2
+
+    start_process(journal_path, True)
+    assert checkpoint.is_table_resumed('links') and not checkpoint.is_table_done('links')
+    cursor = FakeCursor()
+    skipped_positions = db_manager.insert_data(FakeConnection(), cursor, get_links(0, 5), ['movieId', 'imdbId'], 'links', INSERT_QUERY)
+    assert skipped_positions == [] and db_manager.load_stats['links']['rows'] == 3
+    assert cursor.batches == [[(2, 102), (3, 103)], [(4, 104)]]
+    # The batch after the offset may have been committed without being recorded, resumed rows are upserted
+    assert all('ON DUPLICATE KEY UPDATE' in query for query in cursor.queries)
+
+    checkpoint.mark_table_done('links')
+    start_process(journal_path, True)
+    assert checkpoint.is_table_done('links') and not checkpoint.is_table_resumed('links')
+
+def test_offset_is_counted_across_chunks(journal_path):
+    start_process(journal_path, False, chunk_size=3)
+    checkpoint.mark_table_started('links')
+    checkpoint.record_offset('links', 4)
+
+    start_process(journal_path, True, chunk_size=3)
+    cursor = FakeCursor()
+    db_manager.insert_data(FakeConnection(), cursor, get_links(0, 3), ['movieId', 'imdbId'], 'links', INSERT_QUERY)
+    db_manager.insert_data(FakeConnection(), cursor, get_links(3, 6), ['movieId', 'imdbId'], 'links', INSERT_QUERY)
+    assert cursor.batches == [[(4, 104), (5, 105)]]
+    assert checkpoint.get_table_offset('links') == 6
+
+def test_new_run_clears_the_journal(journal_path):
+    start_process(journal_path, False)
+    checkpoint.mark_table_started('links')
+    checkpoint.mark_table_done('links')
+    start_process(journal_path, False)
+    assert not checkpoint.is_table_started('links')
+
+def test_resume_warns_about_a_different_chunk_size(journal_path, capsys):
+    start_process(journal_path, False, chunk_size=1000)
+    start_process(journal_path, True, chunk_size=500)
+    assert '--chunk-size 1000, resuming with 500' in capsys.readouterr().out
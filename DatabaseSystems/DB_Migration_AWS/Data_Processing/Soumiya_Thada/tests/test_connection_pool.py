@@ -0,0 +1,91 @@
+import threading
+import pytest
+from mysql.connector import Error
+import connection_pool
+
+class FakeConnection:
+    def __init__(self):
+        self.connected = True
+        self.broken = False
+        self.closed = False
+
+    def rollback(self):
+        if self.broken:
+            raise Error('connection lost')
+
+    def is_connected(self):
+        return self.connected
+
+    def reconnect(self, attempts, delay):
+        raise Error('server gone')
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def opened_connections(monkeypatch):
+    opened = []
+    def connect(**connection_args):
+        opened.append(FakeConnection())
+        return opened[-1]
+    monkeypatch.setattr(connection_pool.mysql.connector, 'connect', connect)
+    return opened
+
+def test_released_connection_is_reused(opened_connections):
+    pool = connection_pool.ConnectionPool(2, 30)
+    connection = pool.get_connection()
+    pool.release_connection(connection)
+    assert pool.get_connection() is connection
+    assert len(opened_connections) == 1
+    assert pool.stats['hits'] == 1 and pool.stats['misses'] == 1
+
+def test_waiter_opens_a_connection_when_a_broken_one_is_dropped(opened_connections):
+    pool = connection_pool.ConnectionPool(1, 30)
+    connection = pool.get_connection()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.get_connection()), daemon=True)
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    connection.broken = True
+    pool.release_connection(connection)
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert result[0] is opened_connections[1]
+    assert pool.open_connections == 1 and pool.stats['waits'] == 1
+
+def test_failed_reconnect_frees_the_slot(opened_connections):
+    pool = connection_pool.ConnectionPool(1, 0)
+    connection = pool.get_connection()
+    pool.release_connection(connection)
+    connection.connected = False
+    with pytest.raises(Error):
+        pool.get_connection()
+    assert pool.open_connections == 0
+    assert pool.get_connection() is opened_connections[1]
+
+def test_failed_open_frees_the_slot(monkeypatch):
+    def connect(**connection_args):
+        raise Error('access denied')
+    monkeypatch.setattr(connection_pool.mysql.connector, 'connect', connect)
+    pool = connection_pool.ConnectionPool(1, 30)
+    with pytest.raises(Error):
+        pool.get_connection()
+    assert pool.open_connections == 0
+
+def test_close_closes_the_idle_connections(opened_connections):
+    pool = connection_pool.ConnectionPool(2, 30)
+    first, second = pool.get_connection(), pool.get_connection()
+    pool.release_connection(first)
+    pool.release_connection(second)
+    pool.close()
+    assert first.closed and second.closed and pool.open_connections == 0
+
+def test_broken_connection_is_closed_when_dropped(opened_connections):
+    pool = connection_pool.ConnectionPool(1, 30)
+    connection = pool.get_connection()
+    connection.broken = True
+    pool.release_connection(connection)
+    assert connection.closed
+    assert pool.open_connections == 0 and pool.idle_connections == []
@@ -0,0 +1,75 @@
+import constraints
+import db_manager
+
+CREATE_CASTS_QUERY = """CREATE TABLE casts (
+    credit_id VARCHAR(255) PRIMARY KEY,
+    id int,
+    imdb_id int UNIQUE,
+    name VARCHAR(255),
+    FOREIGN KEY (id) REFERENCES movie_metadata(id)
+)"""
+
+class ScriptedCursor:
+    # Returns the given results in order and records every statement
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(' '.join(query.split()))
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+def test_keys_are_split_from_the_create_table_query():
+    bare_query, table_constraints = db_manager.split_create_table_query(CREATE_CASTS_QUERY)
+    assert 'PRIMARY KEY' not in bare_query and 'UNIQUE' not in bare_query and 'FOREIGN KEY' not in bare_query
+    assert 'credit_id VARCHAR(255)' in bare_query and 'imdb_id int' in bare_query
+    assert table_constraints == {'primary_key': ['credit_id'], 'unique': [['imdb_id']], 'foreign_keys': [(['id'], 'movie_metadata', ['id'])]}
+
+def test_table_level_keys_are_split():
+    _, table_constraints = db_manager.split_create_table_query(
+        "CREATE TABLE movie_genres (id int, genres_id varchar(255), PRIMARY KEY (id, genres_id), FOREIGN KEY (genres_id) REFERENCES genres(genres_id))")
+    assert table_constraints['primary_key'] == ['id', 'genres_id']
+    assert table_constraints['foreign_keys'] == [(['genres_id'], 'genres', ['genres_id'])]
+
+def test_referenced_tables_are_validated_first():
+    deferred_constraints = {
+        'casts': {'foreign_keys': [(['id'], 'movie_metadata', ['id'])]},
+        'movie_genres': {'foreign_keys': [(['id'], 'movie_metadata', ['id']), (['genres_id'], 'genres', ['genres_id'])]},
+        'genres': {'foreign_keys': []},
+        'movie_metadata': {'foreign_keys': [(['id'], 'movie_metadata', ['id'])]}
+    }
+    ordered_tables = constraints.get_constraint_order(deferred_constraints)
+    assert sorted(ordered_tables) == sorted(deferred_constraints)
+    assert ordered_tables.index('movie_metadata') < ordered_tables.index('casts')
+    assert ordered_tables.index('genres') < ordered_tables.index('movie_genres')
+
+def test_circular_foreign_keys_keep_load_order():
+    deferred_constraints = {'a': {'foreign_keys': [(['b_id'], 'b', ['id'])]}, 'b': {'foreign_keys': [(['a_id'], 'a', ['id'])]}}
+    assert constraints.get_constraint_order(deferred_constraints) == ['a', 'b']
+
+def test_null_keys_are_deleted():
+    cursor = ScriptedCursor([(3,)])
+    assert constraints.delete_null_keys(cursor, 'casts', ['credit_id']) == 3
+    assert cursor.queries[-1] == 'DELETE FROM casts WHERE credit_id IS NULL'
+
+def test_duplicate_keys_keep_the_first_loaded_row():
+    cursor = ScriptedCursor([[('52fe4', 3), ('52fe5', 2)]])
+    assert constraints.delete_duplicate_keys(cursor, 'casts', ['credit_id'], 'PRIMARY KEY') == 3
+    assert 'later.load_row_id > earlier.load_row_id' in cursor.queries[2]
+    assert cursor.queries[-1] == 'ALTER TABLE casts DROP COLUMN load_row_id'
+
+def test_without_duplicates_nothing_is_changed():
+    cursor = ScriptedCursor([[]])
+    assert constraints.delete_duplicate_keys(cursor, 'casts', ['credit_id'], 'PRIMARY KEY') == 0
+    assert len(cursor.queries) == 1
+
+def test_orphans_are_counted_and_deleted():
+    cursor = ScriptedCursor([[(862,), (8844,)], (2,)])
+    assert constraints.delete_orphans(cursor, 'casts', ['id'], 'movie_metadata', ['id']) == 2
+    assert cursor.queries[-1] == ('DELETE child FROM casts child LEFT JOIN movie_metadata parent ON child.id = parent.id '
+                                  'WHERE parent.id IS NULL AND child.id IS NOT NULL')
@@ -0,0 +1,43 @@
+import io
+import pandas as pd
+import csv_shards
+
+def write_csv(tmp_path):
+    # Quoted values span lines and hold doubled quotes, as the cast and crew lists of credits.csv do
+    rows = [f'{index},"[{{""name"": ""a\nb""}}]",x{index}' for index in range(50)]
+    file = tmp_path / 'credits.csv'
+    file.write_bytes(('id,cast,crew\n' + '\n'.join(rows) + '\n').encode())
+    return file
+
+def test_find_row_end_skips_quoted_newlines():
+    data = b'1,"a\nb",c\n2,d,e\n'
+    assert csv_shards.find_row_end(data, 0, 0) == (data.index(b'2'), 2)
+    assert csv_shards.find_row_end(data, data.index(b'2'), 2) == (len(data), 2)
+
+def test_shards_split_on_row_boundaries(tmp_path):
+    file = write_csv(tmp_path)
+    header_names, shards = csv_shards.get_shards(file, 7)
+    assert header_names == ['id', 'cast', 'crew']
+    assert len(shards) > 1
+
+    data = file.read_bytes()
+    assert shards[0][0] == len(b'id,cast,crew\n')
+    assert shards[-1][1] == len(data)
+    frames = []
+    for (start, end), (next_start, _) in zip(shards, shards[1:] + [(len(data), None)]):
+        assert end == next_start
+        frames.append(pd.read_csv(io.BytesIO(data[start:end]), header=None, names=header_names))
+    df = csv_shards.concat_frames(frames)
+    pd.testing.assert_frame_equal(df, pd.read_csv(file))
+
+def test_more_shards_than_rows(tmp_path):
+    file = tmp_path / 'small.csv'
+    file.write_bytes(b'id,cast\n1,"x\ny"\n')
+    _, shards = csv_shards.get_shards(file, 16)
+    assert shards == [(8, len(file.read_bytes()))]
+
+def test_concat_frames_keeps_dtypes_of_empty_shards():
+    empty = pd.DataFrame()
+    df = pd.DataFrame({'id': [1, 2]})
+    assert csv_shards.concat_frames([empty, df, empty])['id'].dtype == df['id'].dtype
+    assert len(csv_shards.concat_frames([empty])) == 0
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from mysql.connector import Error
+import checkpoint
+import db_manager
+import delta
+
+CREATE_LINKS_QUERY = "CREATE TABLE links (movie_id int PRIMARY KEY, imdb_id int, tmdb_id int)"
+INSERT_LINKS_QUERY = "INSERT INTO links (movie_id, imdb_id, tmdb_id) VALUES (%s, %s, %s)"
+
+def start_run(path, enabled):
+    # A new run only keeps the manifests written to disk
+    for state in [delta.manifests, delta.loaded_hashes, delta.delta_stats, delta.seen_key_hashes, delta.new_tmdb_ids]:
+        state.clear()
+    delta.changed_tables.clear()
+    delta.configure_delta(enabled, path)
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    yield str(tmp_path)
+    start_run(str(tmp_path), False)
+
+def get_links_table(df):
+    return {'table_name': 'links', 'df': df, 'headers': ['movieId', 'imdbId', 'tmdbId'],
+            'insert_table_query': INSERT_LINKS_QUERY, 'create_table_query': CREATE_LINKS_QUERY}
+
+def load(table, skipped_positions=[]):
+    table = delta.filter_table(table)
+    delta.discard_rows(table['table_name'], skipped_positions)
+    delta.save_manifest(table['table_name'])
+    return table['df']
+
+class RejectingCursor:
+    # Fails a multi-row insert holding a rejected movie id, and the row by row retry of that row
+    def __init__(self, rejected_ids):
+        self.rejected_ids = rejected_ids
+
+    def executemany(self, query, batch):
+        if any(row[0] in self.rejected_ids for row in batch):
+            raise Error('Cannot add or update a child row: a foreign key constraint fails')
+
+    def execute(self, query, row):
+        if row[0] in self.rejected_ids:
+            raise Error('Cannot add or update a child row: a foreign key constraint fails')
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def test_same_values_hash_the_same_in_every_dtype():
+    float_df = pd.DataFrame({'id': [1.0, 2.0], 'name': ['a', 'b']})
+    int_df = pd.DataFrame({'id': [1, 2], 'name': ['a', 'b']})
+    # One NaN in the chunk, and replace(np.nan, None) turns the column into objects
+    object_df = pd.DataFrame({'id': [1.0, np.nan], 'name': ['a', 'b']}).replace(np.nan, None)
+    nullable_df = pd.DataFrame({'id': pd.array([1, None], dtype='Int64'), 'name': ['a', 'b']})
+    hashes = [delta.hash_rows(df, ['id', 'name'])[0] for df in [float_df, int_df, object_df, nullable_df]]
+    assert len(set(hashes)) == 1
+    assert delta.hash_rows(object_df, ['id', 'name'])[1] != delta.hash_rows(float_df, ['id', 'name'])[1]
+    # MySQL gets 1 and 0 for booleans
+    assert (delta.hash_rows(pd.DataFrame({'adult': [True, False]}), ['adult']) == delta.hash_rows(pd.DataFrame({'adult': [1, 0]}), ['adult'])).all()
+
+def test_missing_values_differ_from_text():
+    df = pd.DataFrame({'name': [None, 'None', 'nan', '']}, dtype=object)
+    assert len(set(delta.hash_rows(df, ['name']).tolist())) == 4
+
+def test_unchanged_rows_are_not_loaded_after_a_nan_row_is_added(manifest_path):
+    start_run(manifest_path, False)
+    load(get_links_table(pd.DataFrame({'movieId': [1, 2, 3], 'imdbId': [114709.0, 113497.0, 113228.0], 'tmdbId': [862.0, 8844.0, 15602.0]})))
+
+    start_run(manifest_path, True)
+    df = pd.DataFrame({'movieId': [1, 2, 3, 4], 'imdbId': [114709.0, 113497.0, 113228.0, 114885.0],
+                       'tmdbId': [862.0, 8844.0, 15602.0, np.nan]}).replace(np.nan, None)
+    assert load(get_links_table(df))['movieId'].tolist() == [4]
+    assert delta.delta_stats['links'] == {'new': 1, 'changed': 0, 'unchanged': 3, 'duplicate': 0}
+
+def test_changed_rows_are_loaded_with_any_chunking(manifest_path):
+    start_run(manifest_path, False)
+    df = pd.DataFrame({'movieId': [1, 2, 3, 4], 'imdbId': [10, 20, 30, 40], 'tmdbId': [100.0, 200.0, np.nan, 400.0]})
+    load(get_links_table(df))
+
+    start_run(manifest_path, True)
+    df.loc[1, 'imdbId'] = 21
+    first_chunk = load(get_links_table(df.head(2)))
+    second_chunk = load(get_links_table(df.tail(2).replace(np.nan, None)))
+    assert first_chunk['movieId'].tolist() == [2] and second_chunk.empty
+    assert delta.delta_stats['links']['changed'] == 1 and delta.changed_tables == {'links'}
+
+def test_insert_data_returns_the_rejected_rows(tmp_path, monkeypatch):
+    monkeypatch.setitem(db_manager.bulk_load_settings, 'batch_size', 2)
+    monkeypatch.setitem(db_manager.bulk_load_settings, 'mode', 'executemany')
+    checkpoint.journal.update({'chunk_size': None, 'tables': {}})
+    checkpoint.table_positions.clear()
+    checkpoint.configure_checkpoint(False, None, str(tmp_path / 'checkpoint.json'))
+    checkpoint.mark_table_started('links_rejected')
+    df = pd.DataFrame({'movieId': [1, 2, 3, 4, 5], 'imdbId': [10, 20, 30, 40, 50]})
+    skipped_positions = db_manager.insert_data(FakeConnection(), RejectingCursor({2, 5}), df, ['movieId', 'imdbId'], 'links_rejected', INSERT_LINKS_QUERY)
+    assert skipped_positions == [1, 4]
+    assert db_manager.load_stats['links_rejected']['rows'] == 3
+
+def test_rejected_rows_are_loaded_again_by_the_next_delta(manifest_path):
+    # Row 2 is rejected by MySQL (e.g. its parent row is missing), it is not recorded as loaded
+    start_run(manifest_path, False)
+    df = pd.DataFrame({'movieId': [1, 2, 3], 'imdbId': [10, 20, 30], 'tmdbId': [100.0, 200.0, 300.0]})
+    load(get_links_table(df), [1])
+
+    start_run(manifest_path, True)
+    # Only row 2 is passed to MySQL, it is rejected again
+    first_chunk = load(get_links_table(df.head(2)), [0])
+    assert first_chunk['movieId'].tolist() == [2]
+    second_chunk = load(get_links_table(df.tail(1)))
+    assert second_chunk.empty
+
+    # Loaded once its parent row exists, later runs skip it
+    start_run(manifest_path, True)
+    assert load(get_links_table(df))['movieId'].tolist() == [2]
+    start_run(manifest_path, True)
+    assert load(get_links_table(df)).empty
+
+def test_rows_repeating_a_key_keep_their_positions(manifest_path):
+    # A full load passes the rows repeating a key to MySQL, the skipped positions are rows of the whole chunk
+    start_run(manifest_path, False)
+    df = pd.DataFrame({'movieId': [1, 1, 2, 3], 'imdbId': [10, 11, 20, 30], 'tmdbId': [100.0, 110.0, 200.0, 300.0]})
+    assert len(load(get_links_table(df), [1, 3])) == 4
+
+    start_run(manifest_path, True)
+    assert load(get_links_table(df))['movieId'].tolist() == [3]
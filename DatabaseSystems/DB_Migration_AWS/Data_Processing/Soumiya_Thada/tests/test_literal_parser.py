@@ -0,0 +1,51 @@
+import ast
+import pytest
+import literal_parser
+
+# Values of the stringified json columns and the python reprs the fast path has to hand to literal_eval
+VALUES = [
+    "[{'id': 16, 'name': 'Animation'}, {'id': 35, 'name': 'Comedy'}]",
+    "{'id': 10194, 'name': 'Toy Story Collection', 'poster_path': None, 'backdrop_path': '/9FBwqcd9IRruEDUrTdcaafOMKUq.jpg'}",
+    "[{'character': 'Woody (voice)', 'credit_id': '52fe4284c3a36847f8024f95', 'gender': 2, 'order': 0}]",
+    "[{'name': \"Dave 'Gruber' Allen\", 'job': 'Actor'}]",
+    "[{'name': 'The \"Boss\"', 'other': \"it's\"}]",
+    "[{'name': 'O\\'Brien'}]",
+    "[{'adult': True, 'video': False, 'nothing': None}]",
+    "[{'name': 'None of them', 'title': 'True Lies'}]",
+    "[{'value': nan}]",
+    "(1, 2)",
+    "{1: 'one'}",
+    "[]",
+    "",
+    "[{'id': 1,",
+]
+
+def parse_with(parser, value):
+    try:
+        return repr(parser(value))
+    except (ValueError, SyntaxError) as e:
+        return type(e).__name__
+
+@pytest.mark.parametrize('value', VALUES)
+def test_same_result_as_literal_eval(value):
+    literal_parser.parse_cached.cache_clear()
+    assert parse_with(literal_parser.parse_literal, value) == parse_with(ast.literal_eval, value)
+    # The cached result is the same the second time
+    assert parse_with(literal_parser.parse_literal, value) == parse_with(ast.literal_eval, value)
+
+def test_non_strings_are_rejected_like_literal_eval():
+    with pytest.raises(ValueError):
+        literal_parser.parse_literal(float('nan'))
+
+def test_repeated_values_are_parsed_once():
+    literal_parser.parse_cached.cache_clear()
+    value = "[{'id': 18, 'name': 'Drama'}]"
+    assert literal_parser.parse_literal(value) is literal_parser.parse_literal(value)
+    assert literal_parser.parse_cached.cache_info().hits == 1
+
+def test_long_values_are_not_cached():
+    literal_parser.parse_cached.cache_clear()
+    value = repr([{'id': index, 'name': f'name {index}'} for index in range(100)])
+    assert len(value) > literal_parser.MAX_CACHED_LENGTH
+    assert literal_parser.parse_literal(value) == ast.literal_eval(value)
+    assert literal_parser.parse_cached.cache_info().currsize == 0
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+import data_processing
+import profiler
+
+@pytest.fixture(autouse=True)
+def empty_profiles():
+    profiler.profiles.clear()
+    yield
+    profiler.profiles.clear()
+
+@pytest.mark.parametrize('distinct_values', [10, 1000, 50000])
+def test_distinct_estimate_is_close(distinct_values):
+    # Every value three times, repeats must not change the estimate
+    column = pd.Series(np.tile(np.arange(distinct_values), 3))
+    estimate = profiler.estimate_distinct(profiler.get_hll_registers(column))
+    assert abs(estimate - distinct_values) <= max(2, 0.05 * distinct_values)
+
+def test_registers_merge_to_the_union():
+    first = pd.Series(np.arange(0, 30000))
+    second = pd.Series(np.arange(20000, 50000))
+    merged = np.maximum(profiler.get_hll_registers(first), profiler.get_hll_registers(second))
+    assert np.array_equal(merged, profiler.get_hll_registers(pd.concat([first, second])))
+
+def test_nulls_and_unhashable_values():
+    assert profiler.estimate_distinct(profiler.get_hll_registers(pd.Series([None, np.nan], dtype=object))) == 0
+    column = pd.Series([[1, 2], [1, 2], {'id': 3}, None], dtype=object)
+    assert profiler.estimate_distinct(profiler.get_hll_registers(column)) == 2
+
+def test_clean_df_drops_null_and_duplicate_keys_in_one_pass():
+    df = pd.DataFrame({'id': [1, 2, 2, None, 3, 4], 'imdb_id': ['a', 'b', 'c', 'd', 'a', None], 'title': ['x', 'y', 'z', 'w', 'v', 'u']})
+    cleaned_df = data_processing.clean_df(df, ['id', 'imdb_id'], profile_name='movies.csv')
+    # 2 repeats an id, 3 repeats an imdb_id, the null keys are dropped before deduplicating
+    assert cleaned_df['title'].tolist() == ['x', 'y']
+
+    profile = profiler.profiles['movies.csv']
+    assert profile['rows'] == 6
+    assert profile['null_counts'] == {'id': 1, 'imdb_id': 1, 'title': 0}
+    assert profile['rejected_counts'] == {'null key': 2, 'duplicate key': 2}
+    assert [sample['title'] for sample in profile['rejected_samples']['duplicate key']] == ['z', 'v']
+
+def test_clean_df_without_headers_uses_the_whole_row():
+    df = pd.DataFrame({'id': [1, 1, 1], 'name': ['a', 'a', 'b']})
+    assert data_processing.clean_df(df).to_dict('list') == {'id': [1, 1], 'name': ['a', 'b']}
+
+def test_profiles_of_the_parse_processes_are_merged():
+    profiler.profile_chunk('links.csv', pd.DataFrame({'id': [1, 2]}), pd.DataFrame({'id': [False, False]}), np.zeros(2, dtype=bool), np.zeros(2, dtype=bool))
+    other_profiles = {'links.csv': {'rows': 3, 'null_counts': {'id': 1}, 'registers': {'id': profiler.get_hll_registers(pd.Series([2, 3]))},
+                                    'rejected_counts': {'null key': 1}, 'rejected_samples': {'null key': [{'id': None}]}}}
+    profiler.merge_profiles(other_profiles)
+    profile = profiler.profiles['links.csv']
+    assert profile['rows'] == 5 and profile['null_counts'] == {'id': 1}
+    assert profiler.estimate_distinct(profile['registers']['id']) == 3
+    assert profile['rejected_counts'] == {'null key': 1}
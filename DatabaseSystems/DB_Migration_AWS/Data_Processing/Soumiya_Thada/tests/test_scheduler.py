@@ -0,0 +1,28 @@
+import scheduler
+
+CREATE_CAST_QUERY = """CREATE TABLE casts (credit_id VARCHAR(255) PRIMARY KEY, id int,
+    FOREIGN KEY (id) REFERENCES movie_metadata(id), FOREIGN KEY (credit_id) references casts (credit_id))"""
+
+def test_table_dependencies_are_the_referenced_tables():
+    assert scheduler.get_table_dependencies('casts', CREATE_CAST_QUERY) == {'movie_metadata'}
+    assert scheduler.get_table_dependencies('links', 'CREATE TABLE links (movieId int PRIMARY KEY)') == set()
+
+def test_child_waits_for_loaded_parent():
+    tables = {'movie_metadata': None, 'casts': None}
+    dependencies = {'movie_metadata': set(), 'casts': {'movie_metadata'}}
+    assert scheduler.get_ready_tables(tables, dependencies, set(), set(), parsing_done=True) == ['movie_metadata']
+    # Submitted but not loaded yet, the child still waits
+    assert scheduler.get_ready_tables(tables, dependencies, {'movie_metadata'}, set(), parsing_done=True) == []
+    assert scheduler.get_ready_tables(tables, dependencies, {'movie_metadata'}, {'movie_metadata'}, parsing_done=True) == ['casts']
+
+def test_child_waits_for_parent_still_parsing():
+    tables = {'casts': None}
+    dependencies = {'casts': {'movie_metadata'}}
+    assert scheduler.get_ready_tables(tables, dependencies, set(), set(), parsing_done=False) == []
+    # A referenced table no parse job produced does not block the load
+    assert scheduler.get_ready_tables(tables, dependencies, set(), set(), parsing_done=True) == ['casts']
+
+def test_circular_tables_are_never_ready():
+    tables = {'a': None, 'b': None}
+    dependencies = {'a': {'b'}, 'b': {'a'}}
+    assert scheduler.get_ready_tables(tables, dependencies, set(), set(), parsing_done=True) == []
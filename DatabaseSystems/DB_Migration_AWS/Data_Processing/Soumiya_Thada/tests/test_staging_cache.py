@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import staging_cache
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def source_file(tmp_path):
+    staging_cache.configure_cache(True, str(tmp_path / 'cache'))
+    staging_cache.file_digests.clear()
+    file = tmp_path / 'links.csv'
+    file.write_text('movieId,imdbId,tmdbId\n1,114709,862\n2,113497,\n')
+    yield str(file)
+    staging_cache.configure_cache(False)
+    staging_cache.file_digests.clear()
+
+def parse_links(parsed_chunks, chunks=2):
+    # Two chunks of the links table, with a missing tmdbId and text columns holding None
+    for chunk_index in range(chunks):
+        parsed_chunks.append(chunk_index)
+        df = pd.DataFrame({'movieId': np.array([1, 2], dtype='int64') + 2 * chunk_index, 'imdbId': [114709.0, np.nan],
+                           'title': pd.Series(['Toy Story', None], dtype=object), 'parse_only': [1, 2]})
+        yield [{'table_name': 'links', 'df': df, 'headers': ['movieId', 'imdbId', 'title'],
+                'create_table_query': 'CREATE TABLE links (movie_id int)', 'insert_table_query': 'INSERT INTO links (movie_id) VALUES (%s)'}]
+
+def stream(file, parsed_chunks, key_args=(None,), chunks=2):
+    return list(staging_cache.cached_stream('parse_links', [file], key_args, parse_links(parsed_chunks, chunks)))
+
+def test_cached_tables_are_read_back_unchanged(source_file):
+    parsed_chunks = []
+    parsed = stream(source_file, parsed_chunks)
+    cached = stream(source_file, parsed_chunks)
+    # The second run never parses the file
+    assert parsed_chunks == [0, 1]
+    assert len(cached) == 2
+    for parsed_tables, cached_tables in zip(parsed, cached):
+        parsed_table, cached_table = parsed_tables[0], cached_tables[0]
+        pd.testing.assert_frame_equal(cached_table['df'], parsed_table['df'][parsed_table['headers']])
+        assert cached_table['df']['title'].tolist()[1] is None
+        assert {key: cached_table[key] for key in ['table_name', 'headers', 'create_table_query', 'insert_table_query']} == \
+               {key: parsed_table[key] for key in ['table_name', 'headers', 'create_table_query', 'insert_table_query']}
+
+def test_changed_file_or_arguments_parse_again(source_file):
+    parsed_chunks = []
+    stream(source_file, parsed_chunks)
+    stream(source_file, parsed_chunks, key_args=(1000,))
+    assert parsed_chunks == [0, 1, 0, 1]
+
+    with open(source_file, 'a') as file:
+        file.write('3,113228,15602\n')
+    staging_cache.file_digests.clear()
+    stream(source_file, parsed_chunks)
+    assert parsed_chunks == [0, 1, 0, 1, 0, 1]
+
+def test_interrupted_stream_leaves_no_entry(source_file):
+    parsed_chunks = []
+    tables_stream = staging_cache.cached_stream('parse_links', [source_file], (None,), parse_links(parsed_chunks))
+    next(tables_stream)
+    tables_stream.close()
+    assert os.listdir(staging_cache.cache_settings['path']) == []
+    stream(source_file, parsed_chunks)
+    assert parsed_chunks == [0, 0, 1]
+
+def test_tables_parquet_cannot_store_are_not_cached(source_file):
+    def parse_lists(parsed_chunks):
+        parsed_chunks.append(0)
+        yield [{'table_name': 'genres', 'df': pd.DataFrame({'genres': [[1, 'a'], {'id': 2}]}), 'headers': ['genres'],
+                'create_table_query': '', 'insert_table_query': ''}]
+    parsed_chunks = []
+    for _ in range(2):
+        list(staging_cache.cached_stream('parse_lists', [source_file], (None,), parse_lists(parsed_chunks)))
+    assert parsed_chunks == [0, 0]
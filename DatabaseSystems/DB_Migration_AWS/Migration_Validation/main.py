@@ -1,10 +1,16 @@
 import argparse
+import os
+import time
+from datetime import datetime
 
 import pandas as pd
 import constants
 import mysql.connector
 from mysql.connector import Error
 import numpy as np
+import connection_pool
+import report_cache
+from reports import REPORTS
 
 print_executed = False
 def get_db_credentials():
@@ -15,6 +21,10 @@ def get_db_credentials():
     parser.add_argument('host', type=str, help='host address of databse')
     parser.add_argument('user', type=str, help='database user')
     parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--pool-size', type=int, default=2, help='maximum number of pooled MySQL connections')
+    parser.add_argument('--no-cache', action='store_true', help='run every report against the database instead of reusing cached results')
+    parser.add_argument('--strict-cache', action='store_true', help='key the cache on CHECKSUM TABLE (reads every row) instead of the table metadata')
+    parser.add_argument('--cache-dir', type=str, default=report_cache.cache_settings['path'], help='directory of the cached report results and timings')
 
     try:
         # Parse the command-line arguments
@@ -23,15 +33,13 @@ def get_db_credentials():
         print('Error: Required arguments not provided')
         quit()
     
-    return { 'host': args.host, 'user': args.user, 'password': args.password }
+    return { 'host': args.host, 'user': args.user, 'password': args.password, 'pool_size': args.pool_size,
+             'use_cache': not args.no_cache, 'strict_cache': args.strict_cache, 'cache_dir': args.cache_dir }
 
 def get_db_connection(host, user, password, database=None):
     global print_executed
     try:    
-        if (database == None):
-            connection = mysql.connector.connect(host=host, user=user, password=password)
-        else:
-            connection = mysql.connector.connect(host=host, user=user, password=password, database=database)       
+        connection = connection_pool.get_connection(host, user, password, database)
         if not print_executed:
             print(f"Sucessfully connected to AWS RDS as {user} user.")
             print("AWS RDS Connection Details:")
@@ -44,146 +52,115 @@ def get_db_connection(host, user, password, database=None):
             cursor.execute("SELECT VERSION();")
             db_version = cursor.fetchone()
             print("MySQL Server version:", db_version)
+            cursor.close()
     except Error as e:
         print(f"Error while connecting to AWS RDS as {user} user.", e)
         quit()
     
     return connection
 
-def execute_query_with_params(host, user, password, database, query, param_values):
+def execute_query(cursor, query, param_values):
     try:
-
-        cnx = get_db_connection(host,user,password,database)
-        cursor = cnx.cursor()
         cursor.execute(query, param_values)
         rows = cursor.fetchall()
         column_names = [i[0] for i in cursor.description]
-        df = pd.DataFrame(rows, columns=column_names)
-        cursor.close()
-        cnx.close()
-        return df
+        return pd.DataFrame(rows, columns=column_names)
 
     except mysql.connector.Error as err:
         print(f"Error: {err}")
         return None
 
-def exexute_and_print_query_results(host,user,password, query, param_values, header):
-    result_df = execute_query_with_params(host,user,password,constants.DATABASE_NAME, query, param_values)
-    
-    if result_df is not None:
-        print(header)
-        print(result_df)
-    else:
-        print("Query execution failed.")
-    
-def fetch_top_movie_by_revenue(host,user,password):
-    
-    query = """SELECT 
-                    original_title AS 'Movie Title',
-                    FORMAT(budget / 1000000, 2) AS 'Budget in Millions',
-                    FORMAT(revenue / 1000000, 2) AS 'Revenue in Millions',
-                    FORMAT((revenue - budget) / 1000000, 2) AS 'Profit in Millions'
-                FROM
-                    movie_metadata
-                ORDER BY revenue DESC
-                LIMIT 10;
-    """
-    
-    param_values = ()
-    header = "Top 10 Movies based on revenue generated"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-    
+def get_cached_table_names(reports):
+    return sorted(set([table_name for report in reports if report['tables'] != None for table_name in report['tables']]))
 
-def num_movies_genre(host,user,password):
-    query="""
-    SELECT 
-        genres.name AS 'Genres', COUNT(*) AS 'Movies Count'
-    FROM
-        movie_genres
-            JOIN
-        genres ON genres.genres_id = movie_genres.genres_id
-    GROUP BY movie_genres.genres_id;
-    """
-    
-    param_values = ()
-    header = "Number of Movies in Each Genre"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-
-def top_popular_movies_in_genres(host,user,password):
-    query="""
-    WITH RankedMovies AS (
-    SELECT
-        genres.name,
-        movie_metadata.title,
-        ROW_NUMBER() OVER(PARTITION BY movie_genres.genres_id ORDER BY movie_metadata.popularity DESC) AS genre_rank
-    FROM
-        movie_genres 
-    JOIN
-        movie_metadata  ON movie_metadata.tmdb_id = movie_genres.tmdb_id
-	JOIN 
-       genres on genres.genres_id = movie_genres.genres_id
-    )
-    SELECT
-	    genre_rank AS 'Popularity Rank',
-        name AS 'Genres',
-        title AS 'Movie name'
-    FROM
-        RankedMovies
-    WHERE
-        genre_rank <= 5;
-    """
-    param_values = ()
-    header = "Top 5 Popular Movies in Each Genre"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-    
-def top_keywords(host,user,password):
-    query="""
-    SELECT 
-        keywords.name AS 'Top 15 Keywords'
-    FROM
-        movie_keywords
-            JOIN
-        keywords ON keywords.keywords_id = movie_keywords.keywords_id
-    GROUP BY movie_keywords.keywords_id
-    ORDER BY COUNT(*) DESC
-    LIMIT 15;
-    """
-    param_values = ()
-    header = "Top 15 Keywords Used in Movies"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-
-def weighted_rating(host,user,password):
-    query="""
-    SELECT 
-        original_title AS 'Movie',
-        vote_average,
-        vote_count,
-        ((vote_average * vote_count) + ((SELECT 
-            AVG(vote_average)
-        FROM
-            movie_metadata) * 109)) / (vote_count + 109) AS weighted_rating
-    FROM
-        movie_metadata
-    ORDER BY weighted_rating DESC
-    LIMIT 5;
-    """
-    param_values = ()
-    header = "Top 5 Movies based on Weighted Votes"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-
-def list_stored_procedures(host,user,password):
-    query="SELECT routine_name FROM information_schema.routines WHERE routine_type = 'PROCEDURE' AND routine_schema = %s"
-        # Execute the query
-    param_values = ((constants.DATABASE_NAME,))
-    header = "List of Stored Procedures"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
-    
-def list_triggers(host,user,password):
-    query="SELECT trigger_name, event_object_table FROM information_schema.triggers WHERE trigger_schema = %s"
-        # Execute the query
-    param_values = ((constants.DATABASE_NAME,))
-    header = "List of Triggers"
-    exexute_and_print_query_results(host,user,password, query, param_values, header)
+def get_table_metadata(cursor, table_names):
+    # Creation time, last update time and size of every table, read from information_schema without touching
+    # the rows. MySQL 8 caches these statistics for a day by default, the session asks for the current values
+    try:
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except mysql.connector.Error:
+        # MySQL 5.7 has no statistics cache
+        pass
+    placeholders = ', '.join(['%s'] * len(table_names))
+    try:
+        cursor.execute(f"""SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME, TABLE_ROWS, DATA_LENGTH FROM information_schema.tables
+                           WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})""", tuple(table_names))
+        # A table missing from the result has no version and its reports are not cached
+        return {table_name: tuple(metadata) for table_name, *metadata in cursor.fetchall()}
+    except mysql.connector.Error as err:
+        print(f"Error while reading the table metadata, running every report: {err}")
+        return {}
+
+def get_table_checksums(cursor, table_names):
+    # One CHECKSUM TABLE statement for every table, reads every row of them
+    try:
+        cursor.execute(f"CHECKSUM TABLE {', '.join(table_names)}")
+        # Rows are (database.table, checksum), the checksum is NULL for a missing table
+        return {table.split('.')[-1]: checksum for table, checksum in cursor.fetchall()}
+    except mysql.connector.Error as err:
+        print(f"Error while computing the table checksums, running every report: {err}")
+        return {}
+
+def get_table_versions(cursor, reports):
+    # Version of every table read by the cached reports, a report is only reused while its tables keep their version
+    table_names = get_cached_table_names(reports)
+    if not table_names or not report_cache.cache_settings['enabled']:
+        return {}
+    if report_cache.cache_settings['strict']:
+        return get_table_checksums(cursor, table_names)
+    return get_table_metadata(cursor, table_names)
+
+def run_report(cursor, report, table_versions):
+    start_time = time.perf_counter()
+    cache_key = None
+    # Reports on information_schema, or on tables without a version, are never cached
+    if report['tables'] != None and all(table_versions.get(table_name) != None for table_name in report['tables']):
+        cache_key = report_cache.get_cache_key(report, table_versions)
+        result_df = report_cache.load_result(report, cache_key)
+        if result_df is not None:
+            return result_df, 'cache', time.perf_counter() - start_time
+
+    result_df = execute_query(cursor, report['query'], report['params'])
+    if result_df is not None and cache_key != None:
+        report_cache.save_result(report, cache_key, result_df)
+    return result_df, 'database', time.perf_counter() - start_time
+
+def run_reports(host, user, password, reports):
+    # All reports share a single pooled connection
+    timings = []
+    cnx = get_db_connection(host, user, password, constants.DATABASE_NAME)
+    try:
+        cursor = cnx.cursor()
+        start_time = time.perf_counter()
+        table_versions = get_table_versions(cursor, reports)
+        timings.append({'report': 'table_versions', 'source': 'database', 'seconds': time.perf_counter() - start_time})
+
+        for report in reports:
+            result_df, source, seconds = run_report(cursor, report, table_versions)
+            if result_df is not None:
+                print(report['header'])
+                print(result_df)
+            else:
+                print("Query execution failed.")
+            timings.append({'report': report['name'], 'source': source, 'seconds': seconds})
+        cursor.close()
+
+    finally:
+        # Return the connection to the pool
+        connection_pool.release_connection(cnx)
+
+    return pd.DataFrame(timings)
+
+def record_timings(timings_df):
+    print("Report timings:")
+    print(timings_df.to_string(index=False, formatters={'seconds': '{:.4f}'.format}))
+    print(f"Total: {timings_df['seconds'].sum():.4f} seconds")
+
+    # Keep the timings of every run to compare them across migrations
+    os.makedirs(report_cache.cache_settings['path'], exist_ok=True)
+    timings_file = os.path.join(report_cache.cache_settings['path'], 'report_timings.csv')
+    timings_df.insert(0, 'run_at', datetime.now().isoformat(timespec='seconds'))
+    timings_df.to_csv(timings_file, mode='a', index=False, header=not os.path.exists(timings_file))
     
 def main():
     
@@ -191,16 +168,14 @@ def main():
     host=db_credentilas['host']
     user=db_credentilas['user']
     password=db_credentilas['password']
+    connection_pool.configure_pool(db_credentilas['pool_size'])
+    report_cache.configure_cache(db_credentilas['use_cache'], db_credentilas['cache_dir'], db_credentilas['strict_cache'])
     
-    get_db_connection(host,user,password, constants.DATABASE_NAME)
+    timings_df = run_reports(host, user, password, REPORTS)
+    record_timings(timings_df)
     
-    fetch_top_movie_by_revenue(host,user,password)
-    num_movies_genre(host,user,password)
-    top_popular_movies_in_genres(host,user,password)
-    top_keywords(host,user,password)
-    weighted_rating(host,user,password)
-    list_stored_procedures(host,user,password)
-    list_triggers(host,user,password) 
+    connection_pool.print_pool_stats()
+    connection_pool.close_pools()
     
 if __name__=="__main__": 
-	main()
\ No newline at end of file
+	main()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import pickle
+
+# Cache settings, overridden from the command line arguments in main.py.
+# strict keys the cache on CHECKSUM TABLE instead of the information_schema metadata of the tables
+cache_settings = {'path': 'Migration_Validation/report_cache', 'enabled': True, 'strict': False}
+
+def configure_cache(enabled, path=None, strict=False):
+    cache_settings['enabled'] = enabled
+    cache_settings['strict'] = strict
+    if path != None:
+        cache_settings['path'] = path
+
+def get_cache_key(report, table_versions):
+    # The query, its parameters and the version (metadata or checksum) of every table it reads
+    versions = [(table_name, table_versions.get(table_name)) for table_name in sorted(report['tables'])]
+    key = repr((report['query'], tuple(report['params']), cache_settings['strict'], versions))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def get_cache_file(report):
+    # One file per report, a new result replaces the stale one
+    return os.path.join(cache_settings['path'], f"{report['name']}.pkl")
+
+def load_result(report, cache_key):
+    cache_file = get_cache_file(report)
+    if not cache_settings['enabled'] or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Ignoring unreadable cache file {cache_file}.", e)
+        return None
+    if cached['key'] != cache_key:
+        return None
+    return cached['result']
+
+def save_result(report, cache_key, result_df):
+    os.makedirs(cache_settings['path'], exist_ok=True)
+    cache_file = get_cache_file(report)
+    # Write to a temporary file first so an interrupted run never leaves a truncated cache file
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'wb') as file:
+        pickle.dump({'key': cache_key, 'result': result_df}, file)
+    os.replace(temp_file, cache_file)
@@ -0,0 +1,104 @@
+import constants
+
+# Validation reports run by main.py. 'tables' lists the tables a report reads, their versions are part
+# of the cache key so a cached result is only reused while those tables are unchanged.
+# Reports on information_schema have no tables to version and always run.
+REPORTS = [
+    {
+        'name': 'top_movie_by_revenue',
+        'header': "Top 10 Movies based on revenue generated",
+        'query': """SELECT
+                    original_title AS 'Movie Title',
+                    FORMAT(budget / 1000000, 2) AS 'Budget in Millions',
+                    FORMAT(revenue / 1000000, 2) AS 'Revenue in Millions',
+                    FORMAT((revenue - budget) / 1000000, 2) AS 'Profit in Millions'
+                FROM
+                    movie_metadata
+                ORDER BY revenue DESC
+                LIMIT 10;
+    """,
+        'params': (),
+        'tables': ['movie_metadata']
+    },
+    {
+        'name': 'num_movies_genre',
+        'header': "Number of Movies in Each Genre",
+        'query': """
+    SELECT
+        genres.name AS 'Genres', COUNT(*) AS 'Movies Count'
+    FROM
+        movie_genres
+            JOIN
+        genres ON genres.genres_id = movie_genres.genres_id
+    GROUP BY movie_genres.genres_id;
+    """,
+        'params': (),
+        'tables': ['movie_genres', 'genres']
+    },
+    {
+        'name': 'top_popular_movies_in_genres',
+        'header': "Top 5 Popular Movies in Each Genre",
+        # Ranked by the loader in summary_genre_top_popular instead of window-sorting movie_genres
+        'query': """
+    SELECT
+        genre_rank AS 'Popularity Rank',
+        genre_name AS 'Genres',
+        title AS 'Movie name'
+    FROM
+        summary_genre_top_popular
+    WHERE
+        genre_rank <= 5
+    ORDER BY genres_id, genre_rank;
+    """,
+        'params': (),
+        'tables': ['summary_genre_top_popular']
+    },
+    {
+        'name': 'top_keywords',
+        'header': "Top 15 Keywords Used in Movies",
+        'query': """
+    SELECT
+        name AS 'Top 15 Keywords'
+    FROM
+        summary_keyword_frequency
+    ORDER BY movie_count DESC
+    LIMIT 15;
+    """,
+        'params': (),
+        'tables': ['summary_keyword_frequency']
+    },
+    {
+        'name': 'weighted_rating',
+        'header': "Top 5 Movies based on Weighted Votes",
+        # The average vote of all movies comes from summary_vote_stats instead of a subquery
+        'query': """
+    SELECT
+        original_title AS 'Movie',
+        vote_average,
+        vote_count,
+        ((vote_average * vote_count) + (summary_vote_stats.vote_average_mean * 109)) / (vote_count + 109) AS weighted_rating
+    FROM
+        movie_metadata
+            CROSS JOIN
+        summary_vote_stats
+    ORDER BY weighted_rating DESC
+    LIMIT 5;
+    """,
+        'params': (),
+        'tables': ['movie_metadata', 'summary_vote_stats']
+    },
+    {
+        'name': 'list_stored_procedures',
+        'header': "List of Stored Procedures",
+        'query': "SELECT routine_name FROM information_schema.routines WHERE routine_type = 'PROCEDURE' AND routine_schema = %s",
+        'params': (constants.DATABASE_NAME,),
+        'tables': None
+    },
+    {
+        'name': 'list_triggers',
+        'header': "List of Triggers",
+        'query': "SELECT trigger_name, event_object_table FROM information_schema.triggers WHERE trigger_schema = %s",
+        'params': (constants.DATABASE_NAME,),
+        'tables': None
+    }
+]
@@ -0,0 +1,80 @@
+import datetime
+import pytest
+from mysql.connector import Error
+import main
+import report_cache
+
+REPORT = {'name': 'movies_count', 'header': 'Movies', 'query': 'SELECT COUNT(*) AS movies FROM movie_metadata', 'params': (), 'tables': ['movie_metadata']}
+
+class FakeCursor:
+    # information_schema and CHECKSUM TABLE answer from the table state, report queries count their runs
+    def __init__(self, tables, stats_expiry_error=False):
+        self.tables = tables
+        self.stats_expiry_error = stats_expiry_error
+        self.queries = []
+        self.result = None
+        self.description = None
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        if query.startswith('SET SESSION information_schema_stats_expiry'):
+            if self.stats_expiry_error:
+                raise Error('Unknown system variable')
+        elif 'information_schema.tables' in query:
+            self.result = [(table_name, *self.tables[table_name]['metadata']) for table_name in params if table_name in self.tables]
+        elif query.startswith('CHECKSUM TABLE'):
+            self.result = [(f'tmdb.{table_name}', self.tables[table_name]['checksum'] if table_name in self.tables else None)
+                           for table_name in query[len('CHECKSUM TABLE '):].split(', ')]
+        else:
+            self.result = [(len(self.queries),)]
+            self.description = [('movies',)]
+
+    def fetchall(self):
+        return self.result
+
+@pytest.fixture
+def movie_tables(tmp_path):
+    report_cache.configure_cache(True, str(tmp_path))
+    yield {'movie_metadata': {'metadata': [datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 2), 45000, 1 << 20], 'checksum': 1234}}
+    report_cache.configure_cache(True, 'Migration_Validation/report_cache')
+
+def run(cursor):
+    table_versions = main.get_table_versions(cursor, [REPORT])
+    return main.run_report(cursor, REPORT, table_versions)[1]
+
+def test_unchanged_tables_are_read_from_the_cache(movie_tables):
+    cursor = FakeCursor(movie_tables)
+    assert run(cursor) == 'database'
+    assert run(cursor) == 'cache'
+    # The default key never scans the table
+    assert not any(query.startswith('CHECKSUM TABLE') for query in cursor.queries)
+
+def test_changed_metadata_runs_the_report(movie_tables):
+    cursor = FakeCursor(movie_tables)
+    run(cursor)
+    movie_tables['movie_metadata']['metadata'][1] = datetime.datetime(2024, 3, 5)
+    assert run(cursor) == 'database'
+    movie_tables['movie_metadata']['metadata'][1] = None
+    assert run(cursor) == 'database'
+    assert run(cursor) == 'cache'
+
+def test_strict_mode_keys_on_the_checksum(movie_tables, tmp_path):
+    report_cache.configure_cache(True, str(tmp_path), strict=True)
+    cursor = FakeCursor(movie_tables)
+    assert run(cursor) == 'database'
+    movie_tables['movie_metadata']['metadata'][1] = datetime.datetime(2024, 3, 5)
+    assert run(cursor) == 'cache'
+    movie_tables['movie_metadata']['checksum'] = 5678
+    assert run(cursor) == 'database'
+    assert not any('information_schema.tables' in query for query in cursor.queries)
+
+def test_missing_tables_are_not_cached(tmp_path):
+    report_cache.configure_cache(True, str(tmp_path))
+    cursor = FakeCursor({})
+    assert run(cursor) == 'database'
+    assert run(cursor) == 'database'
+
+def test_servers_without_the_statistics_cache_are_supported(movie_tables):
+    cursor = FakeCursor(movie_tables, stats_expiry_error=True)
+    assert run(cursor) == 'database'
+    assert run(cursor) == 'cache'
@@ -1,4 +1,4 @@
-import ast
+import literal_parser
 import json
 import argparse
 import constants
@@ -11,6 +11,16 @@ def get_db_credentials():
 
     parser.add_argument('user', type=str, help='database user')
     parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--chunk-size', type=int, default=None, help='stream movies_metadata.csv in chunks of this many rows instead of reading it whole')
+    parser.add_argument('--staging-cache', action='store_true', help='keep the converted movie documents as Parquet files and reuse them while the csv files are unchanged')
+    parser.add_argument('--staging-cache-dir', type=str, default=constants.STAGING_CACHE_PATH, help='directory of the staging cache')
+    parser.add_argument('--ratings-cap', type=int, default=None, help='embed only the latest ratings of every movie, at most this many')
+    parser.add_argument('--ratings-stats', action='store_true', help='add the count, mean and histogram of the ratings to every movie document')
+    parser.add_argument('--create-indexes', action='store_true', help='create the indexes of the queries after the load and compare their explain() stats')
+    parser.add_argument('--index-config', type=str, default=None, help='json file with the indexes and queries to use instead of the ones in constants.py')
+    parser.add_argument('--batch-size', type=int, default=1000, help='number of documents per unordered insert_many')
+    parser.add_argument('--max-in-flight', type=int, default=2, help='number of insert_many batches sent at the same time')
+    parser.add_argument('--max-retries', type=int, default=5, help='times a failed batch is sent again, with exponential backoff')
 
     try:
         # Parse the command-line arguments
@@ -19,14 +29,38 @@ def get_db_credentials():
         print('Error: Required arguments not provided')
         quit()
     
-    return { 'user': args.user, 'password': args.password }
+    return { 'user': args.user, 'password': args.password, 'chunk_size': args.chunk_size,
+             'staging_cache': args.staging_cache, 'staging_cache_dir': args.staging_cache_dir,
+             'batch_size': args.batch_size, 'max_in_flight': args.max_in_flight, 'max_retries': args.max_retries,
+             'ratings_cap': args.ratings_cap, 'ratings_stats': args.ratings_stats,
+             'create_indexes': args.create_indexes, 'index_config': args.index_config }
 
 
-def get_dataset(file_name, nrows=None, low_memory=False):
+def get_dataset_file(file_name):
     file = f'{constants.DATA_SET_PATH}/{file_name}.{constants.DATA_SET_EXTENSION}'
     # For windows use \\ as filepath delimeter
     #file = f'{constants.DATA_SET_PATH}\\{file_name}.{constants.DATA_SET_EXTENSION}'
-    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory)
+    return file
+
+def get_dataset(file_name, nrows=None, low_memory=False, chunksize=None):
+    file = get_dataset_file(file_name)
+    dtype = constants.dataset_dtypes.get(file_name)
+    # With a chunksize read_csv returns an iterator of DataFrames instead of the whole file
+    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory, dtype=dtype, chunksize=chunksize)
+    return df
+
+def get_dataset_chunks(file_name, chunk_size=None):
+    # Without a chunk size the whole file is read as a single chunk
+    if chunk_size == None:
+        yield get_dataset(file_name)
+        return
+    for df in get_dataset(file_name, chunksize=chunk_size):
+        yield df
+
+def drop_seen_keys(df, key_column, seen_keys):
+    # Drop the rows whose key was already loaded from an earlier chunk of the same file
+    df = df[~df[key_column].isin(seen_keys)]
+    seen_keys.update(df[key_column].tolist())
     return df
 
 def remove_duplicates(df, headers=None):
@@ -71,7 +105,7 @@ def clean_df(df, headers=None):
 
 def convert_to_ejson(df, index, row, column_name):
     try:
-        json_object = ast.literal_eval(row[column_name])
+        json_object = literal_parser.parse_literal(row[column_name])
         ejson_string = json.dumps(json_object, separators=(',', ':'), default=str)
         df.at[index, column_name] = json.loads(ejson_string)
         
@@ -0,0 +1,86 @@
+import argparse
+import json
+import time
+import constants
+from pymongo import MongoClient
+
+# Creates the indexes of constants.INDEX_SPECS (or of a json config) on the migrated collection and
+# explains the benchmark queries before and after, to show which ones stop scanning the collection
+
+def load_index_config(config_file=None):
+    # The config is a json file with "indexes" and/or "queries" in the format of constants.INDEX_SPECS and
+    # constants.BENCHMARK_QUERIES, a missing key keeps the default
+    config = {}
+    if config_file != None:
+        with open(config_file, 'r') as file:
+            config = json.load(file)
+    return config.get('indexes', constants.INDEX_SPECS), config.get('queries', constants.BENCHMARK_QUERIES)
+
+def get_plan_stages(plan):
+    # Stage names of the winning plan, the input stages are nested under inputStage(s) or queryPlan
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for key in ['queryPlan', 'inputStage', 'inputStages']:
+            if key in plan:
+                stages += get_plan_stages(plan[key])
+    elif isinstance(plan, list):
+        for input_plan in plan:
+            stages += get_plan_stages(input_plan)
+    return stages
+
+def explain_query(collection, query):
+    explain = collection.find(query['filter']).explain()
+    execution_stats = explain.get('executionStats', {})
+    stages = get_plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+    return {
+        'plan': 'COLLSCAN' if 'COLLSCAN' in stages else ('IXSCAN' if 'IXSCAN' in stages else '>'.join(stages)),
+        'returned': execution_stats.get('nReturned'),
+        'keys_examined': execution_stats.get('totalKeysExamined'),
+        'docs_examined': execution_stats.get('totalDocsExamined'),
+        'milliseconds': execution_stats.get('executionTimeMillis')
+    }
+
+def explain_queries(collection, queries):
+    return {query['name']: explain_query(collection, query) for query in queries}
+
+def create_indexes(collection, index_specs):
+    existing_indexes = collection.index_information()
+    for index_spec in index_specs:
+        if index_spec['name'] in existing_indexes:
+            print(f"Index {index_spec['name']} already exists.")
+            continue
+        start_time = time.perf_counter()
+        # Options such as unique or sparse are passed through to create_index
+        options = {key: value for key, value in index_spec.items() if key not in ['name', 'keys']}
+        collection.create_index([tuple(key) for key in index_spec['keys']], name=index_spec['name'], **options)
+        print(f"Created index {index_spec['name']} in {time.perf_counter() - start_time:.2f}s.")
+
+def print_explain_stats(before, after):
+    print("Query plans before -> after the indexes:")
+    for query_name in before:
+        print(f"    {query_name}: {before[query_name]['plan']} -> {after[query_name]['plan']}, "
+              f"{before[query_name]['docs_examined']} -> {after[query_name]['docs_examined']} documents examined, "
+              f"{before[query_name]['keys_examined']} -> {after[query_name]['keys_examined']} keys examined, "
+              f"{before[query_name]['milliseconds']} -> {after[query_name]['milliseconds']} ms "
+              f"({after[query_name]['returned']} documents returned)")
+
+def build_indexes(collection, config_file=None):
+    index_specs, queries = load_index_config(config_file)
+    before = explain_queries(collection, queries)
+    create_indexes(collection, index_specs)
+    after = explain_queries(collection, queries)
+    print_explain_stats(before, after)
+    return before, after
+
+# Index an already loaded collection, e.g. python index_advisor.py username password --index-config indexes.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create the indexes of the migrated collection and explain the benchmark queries before and after')
+    parser.add_argument('user', type=str, help='database user')
+    parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--index-config', type=str, default=None, help='json file with the indexes and queries to use instead of the defaults')
+    args = parser.parse_args()
+
+    client = MongoClient(constants.CONNECTION_STRING.format(user=args.user, password=args.password))
+    build_indexes(client[constants.DATABASE_NAME][constants.COLLECTION_NAME], args.index_config)
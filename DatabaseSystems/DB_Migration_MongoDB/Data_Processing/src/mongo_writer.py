@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, WriteConcernError
+
+# Writer settings, overridden from the command line arguments in main.py.
+# Documents are sent in bounded unordered insert_many batches, at most max_in_flight of them at the same time
+writer_settings = {'batch_size': 1000, 'max_in_flight': 2, 'max_retries': 5, 'backoff': 0.5}
+
+# Write error code of a document whose _id is already in the collection
+DUPLICATE_KEY_ERROR = 11000
+# Write error codes that can succeed on a retry: network errors, timeouts, shutdowns, primary elections and
+# write conflicts. Any other code (121 document failed validation, 10334 document too large...) fails the same way again
+TRANSIENT_ERRORS = {6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+# Print the throughput every this many batches
+PROGRESS_BATCHES = 50
+
+def configure_writer(batch_size=1000, max_in_flight=2, max_retries=5, backoff=0.5):
+    writer_settings['batch_size'] = batch_size
+    writer_settings['max_in_flight'] = max(1, max_in_flight)
+    writer_settings['max_retries'] = max_retries
+    writer_settings['backoff'] = backoff
+
+def get_batches(documents, batch_size):
+    # Groups any iterable of documents into lists of at most batch_size documents
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def get_failed_documents(documents, error):
+    # With ordered=False MongoDB tries every document of the batch and reports the ones it could not insert.
+    # insert_many sets the _id of every document before sending it, so a document of a retried batch that was
+    # inserted by an earlier attempt fails with a duplicate key error and does not have to be sent again.
+    # Only the documents with a transient error are returned to be retried, the write errors of the others are returned as rejected
+    write_errors = error.details.get('writeErrors', [])
+    duplicates = sum(1 for write_error in write_errors if write_error.get('code') == DUPLICATE_KEY_ERROR)
+    failed_documents = [documents[write_error['index']] for write_error in write_errors if write_error.get('code') in TRANSIENT_ERRORS]
+    rejected = [write_error for write_error in write_errors if write_error.get('code') not in TRANSIENT_ERRORS | {DUPLICATE_KEY_ERROR}]
+    return error.details.get('nInserted', 0), duplicates, failed_documents, rejected
+
+def insert_batch(collection, documents):
+    # Runs on a writer thread, returns the inserted, duplicate, failed and retry counts of the batch
+    inserted = 0
+    duplicates = 0
+    failed = 0
+    retries = 0
+    while True:
+        try:
+            result = collection.insert_many(documents, ordered=False)
+            return inserted + len(result.inserted_ids), duplicates, failed, retries
+        except BulkWriteError as e:
+            batch_inserted, batch_duplicates, documents, rejected = get_failed_documents(documents, e)
+            inserted += batch_inserted
+            duplicates += batch_duplicates
+            if rejected:
+                # A rejected document fails the same way on every attempt, it is counted as failed straight away
+                print(f"{len(rejected)} documents rejected with error {rejected[0].get('code')}, not retried.", rejected[0].get('errmsg'))
+                failed += len(rejected)
+            if not documents:
+                return inserted, duplicates, failed, retries
+            error = e
+        except (ConnectionFailure, ExecutionTimeout, WriteConcernError) as e:
+            # Network errors, timeouts and primary elections. The whole batch is sent again,
+            # the documents that did get in come back as duplicates
+            error = e
+
+        if retries == writer_settings['max_retries']:
+            print(f"Giving up on {len(documents)} documents after {retries} retries.", error)
+            return inserted, duplicates, failed + len(documents), retries
+        # Exponential backoff, the cluster gets time to elect a primary or recover from the load
+        time.sleep(writer_settings['backoff'] * 2 ** retries)
+        retries += 1
+
+def print_progress(stats, start_time):
+    seconds = time.perf_counter() - start_time
+    print(f"Inserted {stats['inserted']} documents in {stats['batches']} batches in {seconds:.2f}s "
+          f"({stats['inserted'] / seconds if seconds > 0 else 0:.0f} documents/s).")
+
+def insert_documents(collection, documents):
+    # Inserts the documents of any iterable, only the batches in flight and the one being built are held in memory.
+    # Returns the counts of the run, failed batches are retried and do not stop the others
+    start_time = time.perf_counter()
+    stats = {'inserted': 0, 'duplicates': 0, 'failed': 0, 'retries': 0, 'batches': 0}
+
+    def collect(futures):
+        for future in futures:
+            inserted, duplicates, failed, retries = future.result()
+            stats['inserted'] += inserted
+            stats['duplicates'] += duplicates
+            stats['failed'] += failed
+            stats['retries'] += retries
+            stats['batches'] += 1
+            if stats['batches'] % PROGRESS_BATCHES == 0:
+                print_progress(stats, start_time)
+
+    with ThreadPoolExecutor(max_workers=writer_settings['max_in_flight']) as pool:
+        pending = set()
+        for batch in get_batches(documents, writer_settings['batch_size']):
+            # Wait for a batch to finish before building more documents than the writers can take
+            if len(pending) >= writer_settings['max_in_flight']:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(insert_batch, collection, batch))
+        collect(wait(pending).done)
+
+    print_progress(stats, start_time)
+    print(f"    {stats['duplicates']} documents already in the collection, {stats['failed']} failed, {stats['retries']} retries.")
+    return stats
@@ -0,0 +1,119 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+import data_processing
+
+# Ratings embedding settings, overridden from the command line arguments in main.py.
+# cap keeps only the latest ratings of a movie in its document, stats adds the count, mean and histogram of all of them
+ratings_settings = {'cap': None, 'stats': False}
+
+RATING_FIELDS = ['userId', 'rating', 'timestamp']
+
+def configure_ratings(cap=None, stats=False):
+    ratings_settings['cap'] = cap
+    ratings_settings['stats'] = stats
+
+def get_group_offsets(sorted_keys):
+    # Start of every run of equal keys in a sorted array, with the length of the array at the end
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if len(sorted_keys) > 0 else np.array([], dtype=np.int64)
+    return np.r_[starts, len(sorted_keys)]
+
+def get_capped_rows(movie_ids, timestamps, cap):
+    # Rows of the latest cap ratings of every movie, in the order of the file. Timestamps are yyyy-mm-dd text,
+    # so they sort by date, ties keep the order of the file
+    order = np.lexsort((timestamps, movie_ids))
+    offsets = get_group_offsets(movie_ids[order])
+    counts = np.diff(offsets)
+    position_from_end = np.repeat(offsets[1:], counts) - np.arange(len(order))
+    return np.sort(order[position_from_end <= cap])
+
+def get_rating_stats(sorted_movie_ids, sorted_ratings, offsets):
+    # Count, mean and histogram of every movie from the sorted arrays, missing ratings are left out of the mean
+    counts = np.diff(offsets)
+    rated = ~np.isnan(sorted_ratings)
+    starts = offsets[:-1]
+    rating_sums = np.add.reduceat(np.where(rated, sorted_ratings, 0), starts) if len(starts) > 0 else np.array([])
+    rated_counts = np.add.reduceat(rated.astype(np.int64), starts) if len(starts) > 0 else np.array([], dtype=np.int64)
+    means = [round(float(rating_sum / rated_count), 3) if rated_count > 0 else None for rating_sum, rated_count in zip(rating_sums, rated_counts)]
+
+    # Histogram, one {'rating', 'count'} document per rating value a movie got
+    movie_ids = sorted_movie_ids[rated]
+    ratings = sorted_ratings[rated]
+    order = np.lexsort((ratings, movie_ids))
+    movie_ids, ratings = movie_ids[order], ratings[order]
+    value_starts = np.flatnonzero(np.r_[True, (movie_ids[1:] != movie_ids[:-1]) | (ratings[1:] != ratings[:-1])]) if len(ratings) > 0 else np.array([], dtype=np.int64)
+    value_counts = np.diff(np.r_[value_starts, len(ratings)])
+    histograms = {}
+    for movie_id, rating, count in zip(movie_ids[value_starts].tolist(), ratings[value_starts].tolist(), value_counts.tolist()):
+        histograms.setdefault(movie_id, []).append({'rating': rating, 'count': count})
+
+    unique_movie_ids = sorted_movie_ids[starts].tolist()
+    return {'ratings_count': counts.tolist(), 'ratings_mean': means,
+            'ratings_histogram': [histograms.get(movie_id, []) for movie_id in unique_movie_ids]}
+
+def embed_ratings(df_ratings, cap=None, stats=False):
+    # One row per movie with the list of its {userId, rating, timestamp} documents, like
+    # groupby('movieId').apply(to_dict('records')) but with one sort and a split at the group offsets
+    movie_ids = df_ratings['movieId'].to_numpy(dtype=np.int64)
+    timestamps = df_ratings['timestamp'].astype(str).to_numpy()
+
+    rows = np.arange(len(df_ratings))
+    if cap != None:
+        rows = get_capped_rows(movie_ids, timestamps, cap)
+    # Stable sort, the ratings of a movie keep the order of the file
+    rows = rows[np.argsort(movie_ids[rows], kind='stable')]
+    sorted_movie_ids = movie_ids[rows]
+    offsets = get_group_offsets(sorted_movie_ids)
+
+    records = [dict(zip(RATING_FIELDS, values)) for values in zip(*(df_ratings[field].to_numpy()[rows].tolist() for field in RATING_FIELDS))]
+    grouped_ratings = pd.DataFrame({
+        'movieId': sorted_movie_ids[offsets[:-1]],
+        'ratings': [records[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    })
+
+    if stats:
+        # Stats are taken over all the ratings of a movie, also the ones left out by the cap
+        all_rows = np.argsort(movie_ids, kind='stable')
+        all_offsets = get_group_offsets(movie_ids[all_rows])
+        ratings = pd.to_numeric(df_ratings['rating'], errors='coerce').to_numpy(dtype=np.float64)
+        rating_stats = get_rating_stats(movie_ids[all_rows], ratings[all_rows], all_offsets)
+        grouped_stats = pd.DataFrame({'movieId': movie_ids[all_rows][all_offsets[:-1]], **rating_stats})
+        grouped_ratings = pd.merge(grouped_ratings, grouped_stats, on='movieId', how='left')
+
+    if cap != None:
+        capped_movies = int((np.diff(get_group_offsets(np.sort(movie_ids))) > cap).sum())
+        print(f"Embedded at most {cap} ratings per movie, {len(df_ratings) - len(rows)} ratings of {capped_movies} movies left out.")
+    return grouped_ratings
+
+def group_ratings(df_ratings):
+    # The groupby the loader used before
+    return df_ratings.groupby('movieId').apply(lambda x: x[RATING_FIELDS].to_dict('records')).reset_index(name='ratings')
+
+def benchmark(df_ratings):
+    start_time = time.perf_counter()
+    expected = group_ratings(df_ratings)
+    groupby_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    actual = embed_ratings(df_ratings)
+    offsets_seconds = time.perf_counter() - start_time
+
+    expected = dict(zip(expected['movieId'].tolist(), expected['ratings']))
+    actual = dict(zip(actual['movieId'].tolist(), actual['ratings']))
+    mismatches = sum(json.dumps(expected.get(movie_id), default=str) != json.dumps(actual.get(movie_id), default=str)
+                     for movie_id in set(expected) | set(actual))
+    print(f"Embedded the ratings of {len(actual)} movies ({mismatches} different from the groupby).")
+    print(f"    groupby + to_dict: {groupby_seconds:.3f}s")
+    print(f"    sort + offsets:    {offsets_seconds:.3f}s ({groupby_seconds / offsets_seconds:.1f}x)")
+
+# Benchmark on the ratings file, e.g. python ratings_embedder.py --file ratings_small
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the sort and offsets ratings embedding against the groupby')
+    parser.add_argument('--file', type=str, default='ratings_small', help='ratings file of the dataset, ratings_small or ratings')
+    args = parser.parse_args()
+
+    df_ratings = data_processing.get_dataset(args.file)
+    df_ratings['timestamp'] = pd.to_datetime(df_ratings['timestamp'], unit='s').dt.strftime('%Y-%m-%d')
+    benchmark(df_ratings)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+import constants
+
+# pyarrow is only needed for the staging cache, the loader runs without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Staging cache settings, overridden from the command line arguments in main.py.
+# The merged and converted movie documents of every chunk are written to Parquet, a later run on the same
+# csv files reads them back with memory mapping instead of merging and parsing the files again
+cache_settings = {'enabled': False, 'path': constants.STAGING_CACHE_PATH}
+
+# Part of every cache key, bump it when the document conversion changes so older entries are not reused
+CACHE_VERSION = 2
+ENTRY_FILE = 'entry.json'
+
+def configure_cache(enabled, path=constants.STAGING_CACHE_PATH):
+    if enabled and pa == None:
+        print("pyarrow is not installed, the staging cache is disabled.")
+        enabled = False
+    cache_settings['enabled'] = enabled
+    cache_settings['path'] = path
+
+def get_file_digest(file):
+    # Read in blocks so a large csv file is never held in memory
+    digest = hashlib.sha256()
+    with open(file, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_cache_key(stream_name, files, key_args):
+    # The key changes with the content of the source files and with the arguments of the stream
+    key = hashlib.sha256(repr((CACHE_VERSION, stream_name, key_args)).encode())
+    for file in files:
+        key.update(get_file_digest(file).encode())
+    return key.hexdigest()
+
+def get_json_columns(df):
+    # Columns holding embedded documents or arrays, Parquet gets them as JSON text
+    return [column_name for column_name in df.columns if df[column_name].dtype == object
+            and df[column_name].map(lambda value: isinstance(value, (list, dict))).any()]
+
+def read_frame(file, dtypes, json_columns):
+    df = pq.read_table(file, memory_map=True).to_pandas()
+    for column_name, dtype in dtypes.items():
+        if dtype == 'object':
+            # Missing values of object columns are None, as after replace(np.nan, None)
+            column = df[column_name].astype(object)
+            df[column_name] = column.where(column.notna(), None)
+        elif str(df[column_name].dtype) != dtype:
+            df[column_name] = df[column_name].astype(dtype)
+    for column_name in json_columns:
+        df[column_name] = df[column_name].map(lambda value: json.loads(value) if value != None else None)
+    return df
+
+def read_entry(entry_path):
+    with open(os.path.join(entry_path, ENTRY_FILE), 'r') as file:
+        entry = json.load(file)
+    for chunk in entry:
+        yield read_frame(os.path.join(entry_path, chunk['file']), chunk['dtypes'], chunk['json_columns'])
+
+def write_chunk(temp_path, chunk_index, df):
+    file_name = f'{chunk_index:05d}.parquet'
+    dtypes = {column_name: str(dtype) for column_name, dtype in df.dtypes.items()}
+    json_columns = get_json_columns(df)
+    arrow_df = df.copy()
+    for column_name in json_columns:
+        arrow_df[column_name] = arrow_df[column_name].map(lambda value: json.dumps(value, default=str) if value != None else None)
+    try:
+        arrow_table = pa.Table.from_pandas(arrow_df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        print("Not caching the movie documents, they have values Parquet cannot store.", e)
+        return None
+    pq.write_table(arrow_table, os.path.join(temp_path, file_name))
+    return {'file': file_name, 'dtypes': dtypes, 'json_columns': json_columns}
+
+def write_entry(entry_path, frames):
+    # The entry is written to a temporary directory and renamed once the last chunk is written,
+    # so a run stopped halfway never leaves an incomplete entry behind
+    temp_path = f'{entry_path}.{os.getpid()}.tmp'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    entry = []
+    try:
+        for chunk_index, df in enumerate(frames):
+            if entry != None:
+                chunk = write_chunk(temp_path, chunk_index, df)
+                entry = entry + [chunk] if chunk != None else None
+            yield df
+        if entry != None:
+            with open(os.path.join(temp_path, ENTRY_FILE), 'w') as file:
+                json.dump(entry, file)
+            try:
+                os.replace(temp_path, entry_path)
+            except OSError:
+                # Another run wrote the same entry first
+                pass
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+def cached_stream(stream_name, files, key_args, frames):
+    # Yields the DataFrame of every chunk of frames, from the cache entry of the source files when there is one
+    if not cache_settings['enabled']:
+        for df in frames:
+            yield df
+        return
+
+    entry_path = os.path.join(cache_settings['path'], get_cache_key(stream_name, files, key_args))
+    if os.path.exists(os.path.join(entry_path, ENTRY_FILE)):
+        print(f"Reading the movie documents from the staging cache {entry_path}.")
+        for df in read_entry(entry_path):
+            yield df
+        return
+    os.makedirs(cache_settings['path'], exist_ok=True)
+    for df in write_entry(entry_path, frames):
+        yield df
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+import staging_cache
+
+pytest.importorskip('pyarrow')
+
+def get_documents(first_id):
+    # Embedded documents and arrays next to plain columns, with missing values in each
+    return pd.DataFrame({
+        'id': np.array([first_id, first_id + 1], dtype='int64'),
+        'title': pd.Series(['Toy Story', None], dtype=object),
+        'budget': [30000000.0, np.nan],
+        'belongs_to_collection': pd.Series([{'id': 10194, 'name': 'Toy Story Collection'}, None], dtype=object),
+        'genres': pd.Series([[{'id': 16, 'name': 'Animation'}, {'id': 35, 'name': 'Comedy'}], []], dtype=object),
+        'ratings': pd.Series([[{'userId': 1, 'rating': 4.5}], None], dtype=object)
+    })
+
+def test_json_columns_round_trip(tmp_path):
+    df = get_documents(862)
+    chunk = staging_cache.write_chunk(str(tmp_path), 0, df)
+    assert sorted(chunk['json_columns']) == ['belongs_to_collection', 'genres', 'ratings']
+
+    read_df = staging_cache.read_frame(str(tmp_path / chunk['file']), chunk['dtypes'], chunk['json_columns'])
+    assert list(read_df.columns) == list(df.columns)
+    assert read_df.to_dict(orient='records')[0] == df.to_dict(orient='records')[0]
+    assert read_df.loc[1, 'title'] is None and read_df.loc[1, 'belongs_to_collection'] is None and read_df.loc[1, 'ratings'] is None
+    assert read_df.loc[1, 'genres'] == []
+    assert np.isnan(read_df.loc[1, 'budget'])
+    assert read_df['id'].dtype == df['id'].dtype
+
+@pytest.fixture
+def source_file(tmp_path):
+    staging_cache.configure_cache(True, str(tmp_path / 'cache'))
+    file = tmp_path / 'movies_metadata.csv'
+    file.write_text('id,title\n862,Toy Story\n')
+    yield file
+    staging_cache.configure_cache(False)
+
+def stream(file, built_chunks):
+    def build_documents():
+        for chunk_index in range(2):
+            built_chunks.append(chunk_index)
+            yield get_documents(2 * chunk_index)
+    return list(staging_cache.cached_stream('get_documents', [str(file)], (1000,), build_documents()))
+
+def test_cached_stream_reads_the_documents_back(source_file):
+    built_chunks = []
+    written = stream(source_file, built_chunks)
+    read = stream(source_file, built_chunks)
+    assert built_chunks == [0, 1]
+    for written_df, read_df in zip(written, read):
+        assert read_df.to_dict(orient='records')[0] == written_df.to_dict(orient='records')[0]
+        assert read_df.loc[1, 'genres'] == []
+
+    # A changed csv file has another key, its documents are built again
+    source_file.write_text('id,title\n862,Toy Story\n8844,Jumanji\n')
+    stream(source_file, built_chunks)
+    assert built_chunks == [0, 1, 0, 1]
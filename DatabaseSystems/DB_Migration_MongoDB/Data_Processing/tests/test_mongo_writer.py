@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip('pymongo')
+from pymongo.errors import AutoReconnect, BulkWriteError
+import mongo_writer
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+class ScriptedCollection:
+    # Every insert_many call takes the next outcome: None inserts the documents, a dict of _id to error code
+    # fails those documents, an exception instance is raised before anything is written
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.documents = {}
+        self.calls = []
+
+    def insert_many(self, documents, ordered=True):
+        assert ordered == False
+        self.calls.append([document['_id'] for document in documents])
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        write_errors = []
+        inserted = 0
+        for index, document in enumerate(documents):
+            if document['_id'] in self.documents:
+                write_errors.append({'index': index, 'code': mongo_writer.DUPLICATE_KEY_ERROR, 'errmsg': 'duplicate key'})
+            elif outcome and document['_id'] in outcome:
+                write_errors.append({'index': index, 'code': outcome[document['_id']], 'errmsg': 'write error'})
+            else:
+                self.documents[document['_id']] = document
+                inserted += 1
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors, 'nInserted': inserted})
+        return InsertManyResult([document['_id'] for document in documents])
+
+@pytest.fixture(autouse=True)
+def writer_settings():
+    mongo_writer.configure_writer(batch_size=3, max_in_flight=2, max_retries=2, backoff=0)
+    yield
+    mongo_writer.configure_writer()
+
+def get_documents(count):
+    return [{'_id': index, 'id': index} for index in range(count)]
+
+def test_partial_failure_retries_only_failed_documents():
+    collection = ScriptedCollection([{1: 91, 3: 189}])
+    assert mongo_writer.insert_batch(collection, get_documents(5)) == (5, 0, 0, 1)
+    assert collection.calls == [[0, 1, 2, 3, 4], [1, 3]]
+    assert sorted(collection.documents) == [0, 1, 2, 3, 4]
+
+def test_duplicates_on_retry_are_not_sent_again():
+    # The connection drops after the first two documents got in, the retry finds them as duplicate keys
+    collection = ScriptedCollection([AutoReconnect('connection closed')])
+    documents = get_documents(4)
+    collection.documents.update({document['_id']: document for document in documents[:2]})
+    assert mongo_writer.insert_batch(collection, documents) == (2, 2, 0, 1)
+    assert collection.calls == [[0, 1, 2, 3], [0, 1, 2, 3]]
+
+def test_gives_up_after_max_retries():
+    collection = ScriptedCollection([{2: 91}, {2: 91}, {2: 91}, {2: 91}])
+    assert mongo_writer.insert_batch(collection, get_documents(3)) == (2, 0, 1, 2)
+    assert collection.calls == [[0, 1, 2], [2], [2]]
+    assert 2 not in collection.documents
+
+def test_gives_up_on_network_errors():
+    collection = ScriptedCollection([AutoReconnect('no primary')] * 3)
+    assert mongo_writer.insert_batch(collection, get_documents(2)) == (0, 0, 2, 2)
+    assert len(collection.calls) == 3
+
+def test_permanent_errors_are_not_retried():
+    # 121 failed document validation and 10334 too large fail the same way on every attempt
+    collection = ScriptedCollection([{0: 121, 2: 10334, 3: 91}])
+    assert mongo_writer.insert_batch(collection, get_documents(4)) == (2, 0, 2, 1)
+    assert collection.calls == [[0, 1, 2, 3], [3]]
+
+def test_get_failed_documents_splits_write_errors():
+    documents = get_documents(4)
+    error = BulkWriteError({'nInserted': 1, 'writeErrors': [{'index': 0, 'code': 11000}, {'index': 1, 'code': 121},
+                                                             {'index': 2, 'code': 10107}]})
+    inserted, duplicates, failed_documents, rejected = mongo_writer.get_failed_documents(documents, error)
+    assert (inserted, duplicates, failed_documents) == (1, 1, [documents[2]])
+    assert [write_error['index'] for write_error in rejected] == [1]
+
+def test_insert_documents_counts_every_batch():
+    collection = ScriptedCollection([{1: 121}] * 4)
+    stats = mongo_writer.insert_documents(collection, iter(get_documents(10)))
+    assert (stats['inserted'], stats['failed'], stats['batches']) == (9, 1, 4)
+    assert len(collection.calls) == 4
@@ -7,6 +7,8 @@ def main():
 
     validate.test_mongodb_connection(user, password)
     validate.test_migration_valdiation(user, password)
+    validate.configure_validation(db_credentilas['workers'], db_credentilas['sample_size'], db_credentilas['seed'], db_credentilas['chunk_size'])
+    validate.validate_documents(user, password)
     
 # call main function
 if __name__=="__main__": 
@@ -0,0 +1,106 @@
+import copy
+import pytest
+
+pytest.importorskip('pymongo')
+import validate
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        # MongoDB orders null before numbers and numbers before strings
+        def sort_key(document):
+            value = document.get(key)
+            if value == None:
+                return (0, 0)
+            if isinstance(value, str):
+                return (2, value)
+            return (1, value)
+        self.documents = sorted(self.documents, key=sort_key, reverse=direction == -1)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+class StubCollection:
+    # find() with the id range and $in queries of the validator, range bounds only match numbers as in MongoDB.
+    # The only $not query of the validator is the one for ids that are not numbers
+    def __init__(self, documents):
+        self.documents = [copy.deepcopy(document) for document in documents]
+
+    def matches(self, document, query):
+        if '$or' in query:
+            return any(self.matches(document, alternative) for alternative in query['$or'])
+        if 'id' not in query:
+            return True
+        value = document.get('id')
+        condition = query['id']
+        if '$in' in condition:
+            return value in condition['$in']
+        if '$not' in condition:
+            return type(value) not in (int, float)
+        if type(value) != int:
+            return False
+        return ('$gte' not in condition or value >= condition['$gte']) and ('$lt' not in condition or value < condition['$lt'])
+
+    def find(self, query, projection):
+        return Cursor([{field: value for field, value in document.items() if projection.get(field)}
+                       for document in self.documents if self.matches(document, query)])
+
+    def count_documents(self, query):
+        return len(self.documents)
+
+def get_movie(movie_id):
+    return {'id': movie_id, 'adult': 0, 'title': f'Movie {movie_id}', 'budget': '1000', 'runtime': 90.0,
+            'genres': [{'id': 18, 'name': 'Drama'}]}
+
+def get_source(movie_ids):
+    source_hashes = {movie_id: validate.get_document_hash(get_movie(movie_id)) for movie_id in movie_ids}
+    return sorted(source_hashes), source_hashes
+
+@pytest.fixture
+def collection():
+    # Movies 1 to 20 of the source. 5 is corrupted, 7 and 20 are missing, 3 is inserted twice,
+    # 25 and a text id are not in the source
+    documents = [get_movie(movie_id) for movie_id in range(1, 21) if movie_id not in (7, 20)]
+    documents[4]['title'] = 'Corrupted'
+    documents.append(get_movie(3))
+    documents.append(get_movie(25))
+    documents.append(dict(get_movie(0), id='tt0114709'))
+    return StubCollection(documents)
+
+def test_validate_whole_range(collection):
+    source_ids, source_hashes = get_source(range(1, 21))
+    result = validate.validate_id_range(collection, source_ids, source_hashes, None, None)
+    assert result['checked'] == 18
+    assert result['matched'] == 17
+    assert result['mismatched'] == [5]
+    assert result['missing'] == [7, 20]
+    assert result['duplicates'] == 1
+    assert sorted(result['extra'], key=str) == [25, 'tt0114709']
+
+@pytest.mark.parametrize('workers', [1, 2, 3, 8])
+def test_split_ranges_give_the_same_result(collection, workers):
+    source_ids, source_hashes = get_source(range(1, 21))
+    results = [validate.validate_id_range(collection, validate.get_range_ids(source_ids, low_id, high_id), source_hashes, low_id, high_id)
+               for low_id, high_id in validate.get_id_ranges(source_ids, workers)]
+    result = validate.merge_results(results)
+    assert (result['checked'], result['matched'], result['duplicates']) == (18, 17, 1)
+    assert sorted(result['mismatched']) == [5]
+    assert sorted(result['missing']) == [7, 20]
+    assert sorted(result['extra'], key=str) == [25, 'tt0114709']
+
+def test_validate_sample(collection):
+    source_ids, source_hashes = get_source(range(1, 21))
+    result = validate.validate_sample(collection, [3, 5, 7, 9], source_hashes)
+    assert (result['checked'], result['matched'], result['duplicates']) == (3, 2, 1)
+    assert result['mismatched'] == [5]
+    assert result['missing'] == [7]
+
+def test_nan_and_null_hash_the_same():
+    assert validate.get_document_hash(dict(get_movie(1), tagline=float('nan'))) == validate.get_document_hash(dict(get_movie(1), tagline=None))
+    assert validate.get_document_hash(get_movie(1)) != validate.get_document_hash(get_movie(2))
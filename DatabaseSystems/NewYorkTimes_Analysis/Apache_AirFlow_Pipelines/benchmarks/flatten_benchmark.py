@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import sys
+import time
+import pandas as pd
+from pandas import json_normalize
+
+# Compares flatten_articles of the dag with the per article loops it replaced, outside dags/ so Airflow does not
+# parse it. Run from Apache_AirFlow_Pipelines, the dag modules import each other by name as in the dags folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+import process_data
+
+def flatten_with_loops(articles):
+    # The preprocessing used before, one keywords frame per article and the bylines flattened in Python
+    df = pd.DataFrame(articles)
+    df.drop('multimedia', axis=1, inplace=True)
+    articles_df = df[['abstract', 'web_url','snippet','lead_paragraph','source','pub_date','document_type','section_name', 'news_desk', 'type_of_material','_id','word_count','uri']].copy()
+    articles_df['pub_date'] = pd.to_datetime(articles_df['pub_date']).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    headline_df = df[['headline','_id']]
+    final_headline_df = json_normalize(headline_df['headline'])
+    headline_df1 = pd.concat([headline_df['_id'], final_headline_df], axis=1)
+    
+    dfs_with_id = []
+    for index, row in df[['keywords','_id']].iterrows():
+        keywords = row['keywords']
+        if keywords: 
+            keywords_df = pd.DataFrame(keywords)  
+        else:
+            keywords_df = pd.DataFrame(columns=['name', 'value', 'rank', 'major'])
+        keywords_df['_id'] = row['_id']
+        dfs_with_id.append(keywords_df)
+    final_keywords_df = pd.concat(dfs_with_id, ignore_index=True)
+    
+    normalized_byline_list = []
+    for item in articles:
+        byline_data = item['byline']
+        article_id = item['_id']
+
+        for person in byline_data.get("person", []):
+            normalized_data = {
+                "firstname": person.get("firstname", ""),
+                "middlename": person.get("middlename", ""),
+                "lastname": person.get("lastname", ""),
+                "qualifier": person.get("qualifier", None),
+                "title": person.get("title", None),
+                "role": person.get("role", ""),
+                "organization": person.get("organization", ""),
+                "rank": person.get("rank", 0),
+                "original": byline_data.get("original", ""),
+                "organization_byline": byline_data.get("organization", ""),
+                "_id": article_id 
+            }
+            normalized_byline_list.append(normalized_data)
+    byline_df = pd.DataFrame(normalized_byline_list)
+    return articles_df, byline_df, final_keywords_df, headline_df1
+
+def get_rows(df, columns):
+    # Rows of the frame as tuples of text, missing values are empty, to compare the two versions
+    return sorted(tuple('' if pd.isna(value) else str(value) for value in row) for row in df.reindex(columns=columns).itertuples(index=False))
+
+def benchmark(file):
+    # file is the json of one archive API response, e.g. saved with
+    # curl 'https://api.nytimes.com/svc/archive/v1/2024/1.json?api-key=...' -o 2024-1.json
+    with open(file, 'r') as source:
+        articles = json.load(source)['response']['docs']
+    
+    start_time = time.perf_counter()
+    expected = flatten_with_loops(articles)
+    loops_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    actual = process_data.flatten_articles(articles)
+    normalize_seconds = time.perf_counter() - start_time
+    
+    print(f"Flattened {len(articles)} articles into {len(actual[1])} byline, {len(actual[2])} keyword and {len(actual[3])} headline rows.")
+    for table_name, expected_df, actual_df in zip(['articles', 'byline', 'keywords', 'headline'], expected, actual):
+        columns = [column_name for column_name in actual_df.columns if column_name in expected_df.columns]
+        print(f"    {table_name}: {'same' if get_rows(expected_df, columns) == get_rows(actual_df, columns) else 'different'} rows as the loops")
+    print(f"    loops:          {loops_seconds:.3f}s")
+    print(f"    json_normalize: {normalize_seconds:.3f}s ({loops_seconds / normalize_seconds:.1f}x)")
+
+# Benchmark on a saved month of the archive API, e.g. python benchmarks/flatten_benchmark.py --file 2024-1.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the json_normalize flattening against the per article loops')
+    parser.add_argument('--file', type=str, required=True, help='json response of the archive API for one month')
+    args = parser.parse_args()
+    benchmark(args.file)
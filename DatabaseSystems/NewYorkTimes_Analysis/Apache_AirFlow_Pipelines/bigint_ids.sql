@@ -0,0 +1,13 @@
+-- One-time migration of NYT_DB.NYT_SCHEMA for the nyt_ids ids (dags/nyt_ids.py), run it once before the next real_time_api_pipeline run.
+-- Keyword, section and highlight ids are 63 bit hashes. INT and BIGINT are NUMBER(38,0) in Snowflake and already hold them,
+-- columns created with a smaller precision (NUMBER(10,0)...) are widened. Snowflake only allows raising the precision,
+-- so the statements change nothing on a column that is NUMBER(38,0) already.
+-- Then run rekey_ids.py, it moves the rows loaded before to the new ids
+USE SCHEMA NYT_DB.NYT_SCHEMA;
+
+ALTER TABLE keywords ALTER COLUMN keyword_id SET DATA TYPE NUMBER(38,0);
+ALTER TABLE article_keyword ALTER COLUMN keyword_id SET DATA TYPE NUMBER(38,0);
+ALTER TABLE section ALTER COLUMN section_id SET DATA TYPE NUMBER(38,0);
+ALTER TABLE highlights ALTER COLUMN highlight_id SET DATA TYPE NUMBER(38,0);
+ALTER TABLE fact_nyt ALTER COLUMN section_id SET DATA TYPE NUMBER(38,0);
+ALTER TABLE fact_nyt ALTER COLUMN highlight_id SET DATA TYPE NUMBER(38,0);
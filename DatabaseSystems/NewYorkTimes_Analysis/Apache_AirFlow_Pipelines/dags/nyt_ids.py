@@ -0,0 +1,52 @@
+import functools
+import hashlib
+import re
+import unicodedata
+import uuid
+
+# Shared id scheme of the NYT pipelines (archived author loader, Snowflake Airflow dags and daily MySQL dag),
+# the same file is copied next to each of them and has to stay identical (DatabaseSystems/tests/test_shared_copies.py).
+# Every id is a hash of the normalized natural key of the row, so any pipeline mints the same id for the
+# same author, keyword, section or highlight without reading the dimension tables first, and parallel loads
+# never hand out the same id twice
+NYT_NAMESPACE = uuid.UUID('28290ec2-72aa-51c2-af73-f20db4bc0368')
+
+# Separates the fields of a natural key, normalize_text turns it into a space like any other whitespace
+KEY_SEPARATOR = '\x1f'
+
+def normalize_text(value):
+    # None and NaN are the empty text, unicode forms, case and runs of whitespace do not change the key
+    if value == None or (isinstance(value, float) and value != value):
+        return ''
+    return normalize_cached(str(value))
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalize_cached(value):
+    # Names and keywords repeat across articles, each distinct text is normalized once
+    text = unicodedata.normalize('NFKC', value)
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+def get_natural_key(kind, *values):
+    return KEY_SEPARATOR.join([kind] + [normalize_text(value) for value in values])
+
+def get_bigint_id(natural_key):
+    # 63 bit integer, fits a signed BIGINT / NUMBER(19) column
+    digest = hashlib.blake2b(natural_key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 1
+
+def get_author_key(firstname, middlename, lastname):
+    return get_natural_key('author', firstname, middlename, lastname)
+
+def get_author_id(firstname, middlename, lastname):
+    # Author ids are VARCHAR uuids, uuid5 keeps that format
+    return str(uuid.uuid5(NYT_NAMESPACE, get_author_key(firstname, middlename, lastname)))
+
+def get_keyword_id(keyword_name, keyword_value):
+    return get_bigint_id(get_natural_key('keyword', keyword_name, keyword_value))
+
+def get_section_id(section_name, news_desk, subsection_name=None):
+    return get_bigint_id(get_natural_key('section', section_name, subsection_name, news_desk))
+
+def get_highlight_id(article_id):
+    # Every article has one headline, its highlight id comes from the article _id
+    return get_bigint_id(get_natural_key('highlight', article_id))
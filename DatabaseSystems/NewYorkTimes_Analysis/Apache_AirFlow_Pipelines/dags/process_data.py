@@ -2,10 +2,9 @@ import requests
 import pandas as pd
 from pandas import json_normalize
 import snowflake.connector
-from urllib.parse import quote_plus
+from snowflake.connector.pandas_tools import write_pandas
 from datetime import datetime
-from sqlalchemy import create_engine
-import uuid
+import nyt_ids
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
@@ -42,265 +41,225 @@ def fetch_nytimes_data():
         print(response.text)  
 
 
+# Columns and Arrow dtypes of the flattened tables, the loaders get the same columns every month
+ARTICLE_DTYPES = {
+    'abstract': 'string[pyarrow]', 'web_url': 'string[pyarrow]', 'snippet': 'string[pyarrow]', 'lead_paragraph': 'string[pyarrow]',
+    'source': 'string[pyarrow]', 'pub_date': 'string[pyarrow]', 'document_type': 'string[pyarrow]', 'section_name': 'string[pyarrow]',
+    'news_desk': 'string[pyarrow]', 'type_of_material': 'string[pyarrow]', '_id': 'string[pyarrow]', 'word_count': 'int64[pyarrow]',
+    'uri': 'string[pyarrow]'
+}
+HEADLINE_DTYPES = {
+    '_id': 'string[pyarrow]', 'main': 'string[pyarrow]', 'kicker': 'string[pyarrow]', 'content_kicker': 'string[pyarrow]',
+    'print_headline': 'string[pyarrow]', 'name': 'string[pyarrow]', 'seo': 'string[pyarrow]', 'sub': 'string[pyarrow]'
+}
+KEYWORD_DTYPES = {'name': 'string[pyarrow]', 'value': 'string[pyarrow]', 'rank': 'int64[pyarrow]', 'major': 'string[pyarrow]', '_id': 'string[pyarrow]'}
+BYLINE_DTYPES = {
+    'firstname': 'string[pyarrow]', 'middlename': 'string[pyarrow]', 'lastname': 'string[pyarrow]', 'qualifier': 'string[pyarrow]',
+    'title': 'string[pyarrow]', 'role': 'string[pyarrow]', 'organization': 'string[pyarrow]', 'rank': 'int64[pyarrow]',
+    'original': 'string[pyarrow]', 'organization_byline': 'string[pyarrow]', '_id': 'string[pyarrow]'
+}
+
+def get_typed_frame(df, dtypes):
+    # Missing columns come back empty, missing values are Arrow nulls
+    df = df.reindex(columns=list(dtypes))
+    for column_name, dtype in dtypes.items():
+        if dtype == 'int64[pyarrow]':
+            df[column_name] = pd.to_numeric(df[column_name], errors='coerce')
+    return df.astype(dtypes)
+
+def flatten_articles(articles):
+    # One json_normalize over the docs of the month for each nested path, no frame per article.
+    # The article columns are read straight from the docs, normalizing them would copy the multimedia lists of every doc
+    df = pd.DataFrame(articles, columns=list(ARTICLE_DTYPES) + ['headline'])
+    articles_df = get_typed_frame(df, ARTICLE_DTYPES)
+    articles_df['pub_date'] = pd.to_datetime(df['pub_date']).dt.strftime('%Y-%m-%dT%H:%M:%SZ').astype('string[pyarrow]')
+
+    headline_df = json_normalize([headline if headline else {} for headline in df['headline']])
+    headline_df['_id'] = df['_id'].to_numpy()
+    headline_df = get_typed_frame(headline_df, HEADLINE_DTYPES)
+
+    # record_path needs the list in every doc, articles without keywords or people have no rows there anyway
+    keywords_df = json_normalize([article for article in articles if article.get('keywords')], record_path='keywords', meta=['_id'])
+    keywords_df = get_typed_frame(keywords_df, KEYWORD_DTYPES)
+
+    byline_df = json_normalize([article for article in articles if (article.get('byline') or {}).get('person')],
+                               record_path=['byline', 'person'], meta=['_id', ['byline', 'original'], ['byline', 'organization']], errors='ignore')
+    byline_df = byline_df.rename(columns={'byline.original': 'original', 'byline.organization': 'organization_byline'})
+    byline_df = get_typed_frame(byline_df, BYLINE_DTYPES)
+    return articles_df, byline_df, keywords_df, headline_df
+
 def preprocessing():
     articles = fetch_nytimes_data()
-    #Preprocessing articles
-    df = pd.DataFrame(articles)
-    df_normalized = pd.json_normalize(articles)
-    df.drop('multimedia', axis=1, inplace=True)
-    articles_df = df[['abstract', 'web_url','snippet','lead_paragraph','source','pub_date','document_type','section_name', 'news_desk', 'type_of_material','_id','word_count','uri']]
-    articles_df['pub_date'] = pd.to_datetime(articles_df['pub_date']).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
-    #Preprocessing headline table
-    headline_df = df[['headline','_id']]
-    final_headline_df = json_normalize(headline_df['headline'])
-    headline_df1 = pd.concat([headline_df['_id'], final_headline_df], axis=1)
-    
-    #Preprocessing keywords
-    keywords_df = df[['keywords','_id']]
-    keywords_df = df[['keywords','_id']]
-    dfs_with_id = []
-    for index, row in keywords_df.iterrows():
-        keywords = row['keywords']
-        if keywords: 
-            keywords_df = pd.DataFrame(keywords)  
-        else:
-            keywords_df = pd.DataFrame(columns=['name', 'value', 'rank', 'major'])
-        keywords_df['_id'] = row['_id']
-        dfs_with_id.append(keywords_df)
-    final_keywords_df = pd.concat(dfs_with_id, ignore_index=True)
-    
-    #Preprocessing Byline
-    normalized_byline_list = []
-    for item in articles:
-        byline_data = item['byline']
-        article_id = item['_id']
-
-        for person in byline_data.get("person", []):
-            normalized_data = {
-                "firstname": person.get("firstname", ""),
-                "middlename": person.get("middlename", ""),
-                "lastname": person.get("lastname", ""),
-                "qualifier": person.get("qualifier", None),
-                "title": person.get("title", None),
-                "role": person.get("role", ""),
-                "organization": person.get("organization", ""),
-                "rank": person.get("rank", 0),
-                "original": byline_data.get("original", ""),
-                "organization_byline": byline_data.get("organization", ""),
-                "_id": article_id 
-            }
-            normalized_byline_list.append(normalized_data)
-    byline_df = pd.DataFrame(normalized_byline_list)
-    return articles_df, byline_df, final_keywords_df, headline_df1
-                
+    return flatten_articles(articles)
+
+class SnowflakeSession:
+    # One connection and cursor shared by every step of a load run, opened and closed by the with block
+    def __init__(self, connection_params):
+        self.connection_params = connection_params
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        self.conn = snowflake.connector.connect(**self.connection_params)
+        self.cursor = self.conn.cursor()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.cursor != None:
+            self.cursor.close()
+        if self.conn != None:
+            self.conn.close()
+        return False
+
+    def execute(self, query, params=None):
+        self.cursor.execute(query, params)
+        return self.cursor
+
+def get_new_article_ids(session, stage_table):
+    # Anti-join of the staged month against the article table, runs in Snowflake so the ids of
+    # the older articles never leave it
+    cursor = session.execute(f"""
+        SELECT s._id FROM {stage_table} s
+        WHERE NOT EXISTS (SELECT 1 FROM article a WHERE a._id = s._id)
+    """)
+    return {row[0] for row in cursor.fetchall()}
 
 def insert_data(articles_df, author_df, keywords_df, highlights_df):
     
     print("Inside insert_data")
     try:
-        conn = snowflake.connector.connect(**snowflake_connection_params)
-        encoded_password = quote_plus(snowflake_connection_params['password'])
-
-        snowflake_connection_string = f'snowflake://{snowflake_connection_params["user"]}:{encoded_password}@{snowflake_connection_params["account"]}/{snowflake_connection_params["database"]}/{snowflake_connection_params["schema"]}?warehouse={snowflake_connection_params["warehouse"]}'
-        engine = create_engine(snowflake_connection_string)
-
-        # Execute SQL query to count existing articles and fetch existing _id from ARTICLE table
-        cursor = conn.cursor()
-        cursor.execute("SELECT count(*) FROM article")
-        result = cursor.fetchone()
-        num_rows = result[0]
-        print(num_rows)
-        
-        cursor.execute("SELECT _id FROM article")
-        existing_ids = [row[0] for row in cursor]
-        # Print existing _id values
-        print(existing_ids[1])
-        
-        
-        existing_ids_series = pd.Series(existing_ids)
-        new_articles_df = articles_df[~articles_df['_id'].isin(existing_ids_series)]
-        
-        new_articles_df.drop(columns=['section_name', 'news_desk'], inplace = True)
-        
-        if not new_articles_df.empty:
-            new_articles_df.to_sql(name='article', con=engine, if_exists='append', index=False)
-            print(f"{len(new_articles_df)} new articles inserted.")
-        else:
-            print("No new data")
-            return
+        with SnowflakeSession(snowflake_connection_params) as session:
+            article_df = articles_df.drop(columns=['section_name', 'news_desk']).drop_duplicates(subset=['_id'], keep='first')
+            stage_table = stage_dataframe(session, article_df, 'article')
+            new_ids = get_new_article_ids(session, stage_table)
+            if not new_ids:
+                print("No new data")
+                return
             
-        insert_new_authors_to_snowflake(conn, engine, author_df)
-        insert_new_keywords_to_snowflake(conn, engine, keywords_df)
-        insert_new_section_highlights_fact_to_snowflake(conn, engine, articles_df, highlights_df)
+
+            # The other tables take the rows of the whole month, MERGE skips the ones already loaded. The articles are
+            # merged last, a run failing before that finds the same new articles again and completes the other tables
+            insert_new_authors_to_snowflake(session, author_df)
+            insert_new_keywords_to_snowflake(session, keywords_df)
+            insert_new_section_highlights_fact_to_snowflake(session, articles_df, highlights_df)
+
+            merge_staged_table(session, 'article', stage_table, list(article_df.columns))
+            print(f"{len(new_ids)} new articles inserted.")
             
     except snowflake.connector.errors.DatabaseError as e:
         print(f"Snowflake database error: {e}")
-
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
             
     
-def insert_new_authors_to_snowflake(conn, engine, authors_df):
+# Key columns every table is merged on, a staged row is inserted when no row of the table has its key.
+# The dimension ids come from nyt_ids, so the keys of a month are known before anything is read from Snowflake
+MERGE_KEYS = {
+    'article': ['_id'],
+    'author': ['authorid'],
+    'article_author': ['articleid', 'authorid'],
+    'keywords': ['keyword_id'],
+    'article_keyword': ['article_id', 'keyword_id'],
+    'section': ['section_id'],
+    'highlights': ['highlight_id'],
+    'fact_nyt': ['article_id']
+}
+
+def stage_dataframe(session, df, table_name):
+    # The batch goes to a temporary table of the session, write_pandas uploads it as Parquet with PUT and COPY
+    stage_table = f'{table_name}_stage'
+    write_pandas(session.conn, df.reset_index(drop=True), stage_table, auto_create_table=True, table_type='temporary', overwrite=True, quote_identifiers=False)
+    return stage_table
+
+def get_merge_query(table_name, stage_table, key_columns, columns):
+    on_clause = ' AND '.join(f't.{column} = s.{column}' for column in key_columns)
+    return f"""
+        MERGE INTO {table_name} t
+        USING {stage_table} s
+        ON {on_clause}
+        WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f's.{column}' for column in columns)})
+    """
+
+def merge_staged_table(session, table_name, stage_table, columns):
+    inserted_rows = session.execute(get_merge_query(table_name, stage_table, MERGE_KEYS[table_name], columns)).fetchone()[0]
+    return inserted_rows
+
+def merge_table(session, table_name, df):
+    # One staged upload and one MERGE for the whole batch of the table. Rows repeating a key are dropped first,
+    # MERGE would insert every one of them
+    df = df.drop_duplicates(subset=MERGE_KEYS[table_name], keep='first')
+    if df.empty:
+        print(f"No rows to merge into {table_name}")
+        return 0
+    stage_table = stage_dataframe(session, df, table_name)
+    inserted_rows = merge_staged_table(session, table_name, stage_table, list(df.columns))
+    print(f"Merged {len(df)} rows into {table_name}, {inserted_rows} new.")
+    return inserted_rows
+
+def get_values(column):
+    # Arrow columns hold pd.NA for missing values, the nyt_ids functions take None
+    return [None if pd.isna(value) else value for value in column]
+
+def insert_new_authors_to_snowflake(session, authors_df):
     
     print("Inside Authors")
 
     df = authors_df
-
-    author_df = pd.DataFrame(columns=['authorid', 'firstname', 'lastname', 'middlename'])
-    article_author_df = pd.DataFrame(columns=['authorid', 'articleid', 'ranking'])
-
-    query = "SELECT authorid, firstname, middlename, lastname FROM author"
-    cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-
-    author_dict = {}
-    for result in results:
-        authorid = result[0]
-        firstname = result[1]
-        middlename = result[2]
-        lastname = result[3]
-        author_dict[(firstname,middlename, lastname)] = authorid
-
-    # Check if the author already exists in the Snowflake table
-    for index, row in df.iterrows():
-        if (row['firstname'], row['middlename'], row['lastname']) in author_dict:
-            author_id = author_dict[(row['firstname'], row['middlename'], row['lastname'])]
-        else:
-            author_id = str(uuid.uuid4())
-            author_df = author_df._append({'authorid': author_id, 'firstname': row['firstname'], 'lastname': row['lastname'], 'middlename': row['middlename']}, ignore_index=True)
-            author_dict[(row['firstname'], row['middlename'], row['lastname'])] = authorid
-        
-        # Append the author_id to article_author_df
-        article_author_df = article_author_df._append({'authorid': author_id, 'articleid': row['_id'], 'ranking': row['rank']}, ignore_index=True)
-            
-
-    # Now, you can insert both DataFrames into Snowflake
-    author_df.to_sql(name='author', con=engine, if_exists='append', index=False)
-    article_author_df.to_sql(name='article_author', con=engine, if_exists='append', index=False)
+    if df.empty:
+        print("No authors")
+        return
+
+    # The first spelling of a name is kept for the author
+    author_ids = [nyt_ids.get_author_id(firstname, middlename, lastname) for firstname, middlename, lastname in
+                  zip(get_values(df['firstname']), get_values(df['middlename']), get_values(df['lastname']))]
+    author_df = pd.DataFrame({'authorid': author_ids, 'firstname': df['firstname'].array,
+                              'lastname': df['lastname'].array, 'middlename': df['middlename'].array})
+    article_author_df = pd.DataFrame({'authorid': author_ids, 'articleid': df['_id'].array, 'ranking': df['rank'].array})
+
+    merge_table(session, 'author', author_df)
+    merge_table(session, 'article_author', article_author_df)
     
     print("Successfull")
 
 
     
-def insert_new_keywords_to_snowflake(conn, engine, keywords_df):
+def insert_new_keywords_to_snowflake(session, keywords_df):
     
     print("Inside Keywords")
     df = keywords_df
+    if df.empty:
+        print("No keywords")
+        return
 
-    keywords_df = pd.DataFrame(columns=['keyword_id', 'keyword_value', 'keyword_name', 'major'])
-    article_keywords_df = pd.DataFrame(columns=['article_id', 'keyword_id'])
-
-    # Connect to Snowflake
-    conn = snowflake.connector.connect(**snowflake_connection_params)
-
-    query = "SELECT keyword_id, keyword_value, keyword_name FROM keywords"
-    cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-
-    query_id = "SELECT keyword_id from keywords order by keyword_id desc"
-    cursor = conn.cursor()
-    cursor.execute(query_id)
-    result  = cursor.fetchone()
-    id = result[0]
-    print(id)
-
-    keyword_dict = {}
-    for result in results:
-        keyword_id = result[0]
-        keyword_value = result[1]
-        keyword_name = result[2]
-        keyword_dict[(keyword_value,keyword_name)] = keyword_id
-
-    # Check if the author already exists in the Snowflake table
-    for index, row in df.iterrows():
-        if (row['value'], row['name']) in keyword_dict:
-            keyword_id = keyword_dict[(row['value'], row['name'])]
-        else:
-            id = id + 1
-            keyword_id = id
-            keywords_df = keywords_df._append({'keyword_id': keyword_id, 'keyword_value': row['value'], 'keyword_name': row['name'], 'major': row['major']}, ignore_index=True)
-            keyword_dict[(row['value'], row['name'])] = keyword_id
-        
-        # Append the author_id to article_author_df
-        article_keywords_df = article_keywords_df._append({'keyword_id': keyword_id, 'article_id': row['_id']}, ignore_index=True)
-            
+    keyword_ids = [nyt_ids.get_keyword_id(name, value) for name, value in zip(get_values(df['name']), get_values(df['value']))]
+    keyword_df = pd.DataFrame({'keyword_id': keyword_ids, 'keyword_value': df['value'].array,
+                               'keyword_name': df['name'].array, 'major': df['major'].array})
+    article_keyword_df = pd.DataFrame({'article_id': df['_id'].array, 'keyword_id': keyword_ids})
 
-    # Now, you can insert both DataFrames into Snowflake
-    keywords_df.to_sql(name='keywords', con=engine, if_exists='append', index=False)
-    article_keywords_df.to_sql(name='article_keyword', con=engine, if_exists='append', index=False)
+    merge_table(session, 'keywords', keyword_df)
+    merge_table(session, 'article_keyword', article_keyword_df)
 
     print("Successfull")
     
 
-def insert_new_section_highlights_fact_to_snowflake(conn, engine, article_df, highlights_df):
+def insert_new_section_highlights_fact_to_snowflake(session, article_df, highlights_df):
     
     print("Inside section_highlights_fact")
-    
-    section_df = pd.DataFrame(columns=['section_id', 'section_name', 'news_desk'])
-    fact_nyt_df = pd.DataFrame(columns=['article_id', 'section_id', 'highlight_id'])
-    #highlights_df = pd.DataFrame(columns=['highlight_id', 'main', 'sub', 'name', 'kicker', 'print_headline', 'seo', 'content_kicker'])
-
-    # Connect to Snowflake
-    conn = snowflake.connector.connect(**snowflake_connection_params)
-
-    query = "SELECT section_id, section_name, news_desk FROM section"
-    cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-
-    query_id = "SELECT section_id from section order by section_id desc"
-    cursor = conn.cursor()
-    cursor.execute(query_id)
-    result  = cursor.fetchone()
-    id = result[0]
-    print(id)
-
-    query_id_1 = "SELECT highlight_id from highlights order by highlight_id desc"
-    cursor = conn.cursor()
-    cursor.execute(query_id_1)
-    result  = cursor.fetchone()
-    h_id = result[0]
-    print(h_id)
-
-    article_highlights_dict = {}
-    for index, row in highlights_df.iterrows():
-        h_id = h_id + 1
-        article_highlights_dict[row['_id']] = h_id
-        highlights_df.at[index, 'highlight_id'] = h_id
-
-    highlights_df.drop(columns=['_id'], inplace=True)
+
+    # Every headline gets the highlight id of its article
+    highlights_df = highlights_df.copy()
+    highlights_df['highlight_id'] = highlights_df['_id'].map(nyt_ids.get_highlight_id)
+    article_highlights_dict = dict(zip(highlights_df['_id'], highlights_df['highlight_id']))
+    highlights_df = highlights_df.drop(columns=['_id'])
     print(highlights_df.head(5))
-        
-    section_dict = {}
-    for result in results:
-        section_id = result[0]
-        section_name = result[1]
-        news_desk = result[2]
-        section_dict[(section_name,news_desk)] = section_id
-
-    # Check if the author already exists in the Snowflake table
-    for index, row in article_df.iterrows():
-        if (row['section_name'], row['news_desk']) in section_dict:
-            section_id = section_dict[(row['section_name'], row['news_desk'])]
-        else:
-            id = id + 1
-            section_id = id
-            section_df = section_df._append({'section_id': section_id, 'section_name': row['section_name'], 'news_desk': row['news_desk']}, ignore_index=True)
-            section_dict[(row['section_name'], row['news_desk'])] = section_id
-        
-        # Append the author_id to article_author_df
-        fact_nyt_df = fact_nyt_df._append({'section_id': section_id, 'article_id': row['_id'], 'highlight_id': article_highlights_dict[row['_id']]}, ignore_index=True)
-        
+
+    section_ids = [nyt_ids.get_section_id(section_name, news_desk) for section_name, news_desk in zip(get_values(article_df['section_name']), get_values(article_df['news_desk']))]
+    section_df = pd.DataFrame({'section_id': section_ids, 'section_name': article_df['section_name'].array, 'news_desk': article_df['news_desk'].array})
+    fact_nyt_df = pd.DataFrame({'article_id': article_df['_id'].array, 'section_id': section_ids,
+                                'highlight_id': article_df['_id'].map(article_highlights_dict).array})
     print(fact_nyt_df.head(5))
 
-    # Now, you can insert both DataFrames into Snowflake
-    section_df.to_sql(name='section', con=engine, if_exists='append', index=False)
-    highlights_df.to_sql(name='highlights', con=engine, if_exists='append', index=False)
-    fact_nyt_df.to_sql(name='fact_nyt', con=engine, if_exists='append', index=False)
+    # Dimensions first, the fact rows reference them
+    merge_table(session, 'section', section_df)
+    merge_table(session, 'highlights', highlights_df)
+    merge_table(session, 'fact_nyt', fact_nyt_df)
 
-    print("Successfull")
\ No newline at end of file
+    print("Successfull")
@@ -0,0 +1,93 @@
+import os
+import sys
+import pandas as pd
+
+# One-time rekey of NYT_DB.NYT_SCHEMA to the nyt_ids ids, run it from Apache_AirFlow_Pipelines after bigint_ids.sql and
+# before the next real_time_api_pipeline run: python rekey_ids.py
+# Rows loaded before nyt_ids have uuid4 author ids and max + 1 keyword, section and highlight ids. The dag merges on the
+# new ids only and would add every author, keyword and section of a month again. Running it a second time changes nothing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dags'))
+import nyt_ids
+import process_data
+
+# Natural key of every id as stored in Snowflake and the columns holding the id, the dimension table first.
+# The section table has no subsection, the dag hashes section_name and news_desk only
+REKEYS = {
+    'author': ("SELECT authorid, firstname, middlename, lastname FROM author", nyt_ids.get_author_id,
+               [('author', 'authorid'), ('article_author', 'authorid')]),
+    'keyword': ("SELECT keyword_id, keyword_name, keyword_value FROM keywords", nyt_ids.get_keyword_id,
+                [('keywords', 'keyword_id'), ('article_keyword', 'keyword_id')]),
+    'section': ("SELECT section_id, section_name, news_desk FROM section", nyt_ids.get_section_id,
+                [('section', 'section_id'), ('fact_nyt', 'section_id')]),
+    # The highlights table has no article id, the fact row of the article links them
+    'highlight': ("SELECT highlight_id, article_id FROM fact_nyt WHERE highlight_id IS NOT NULL", nyt_ids.get_highlight_id,
+                  [('highlights', 'highlight_id')])
+}
+
+def get_new_ids(rows, get_id):
+    # Old id to new id of the rows whose id changes, the first row of an old id found more than once decides
+    new_ids = {}
+    for old_id, *natural_key in rows:
+        if old_id not in new_ids:
+            new_ids[old_id] = get_id(*natural_key)
+    return {old_id: new_id for old_id, new_id in new_ids.items() if old_id != new_id}
+
+def get_fact_highlight_ids(session):
+    # The fact row of every article gets the highlight id of the article, whatever it had before
+    cursor = session.execute("SELECT article_id, highlight_id FROM fact_nyt")
+    new_ids = {}
+    for article_id, highlight_id in cursor.fetchall():
+        new_id = nyt_ids.get_highlight_id(article_id)
+        if highlight_id != new_id:
+            new_ids[article_id] = new_id
+    return new_ids
+
+def update_column(session, table_name, column, rekey_table, match_column=None):
+    match_column = match_column or column
+    session.execute(f"""
+        UPDATE {table_name} SET {column} = {rekey_table}.new_id
+        FROM {rekey_table}
+        WHERE {table_name}.{match_column} = {rekey_table}.old_id
+    """)
+
+def deduplicate_table(session, table_name):
+    # Old rows of one natural key now share their id, one row is kept for every key of MERGE_KEYS
+    keys = ', '.join(process_data.MERGE_KEYS[table_name])
+    session.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE {table_name}_rekeyed AS
+        SELECT * FROM {table_name} QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY {keys}) = 1
+    """)
+    session.execute("BEGIN")
+    session.execute(f"DELETE FROM {table_name}")
+    session.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_rekeyed")
+    session.execute("COMMIT")
+
+def rekey_ids(session):
+    # Every mapping is read before anything changes, the highlight ids come from the fact table that is rekeyed too
+    rekeys = {}
+    for kind, (query, get_id, columns) in REKEYS.items():
+        rekeys[kind] = get_new_ids(session.execute(query).fetchall(), get_id)
+    fact_highlight_ids = get_fact_highlight_ids(session)
+
+    rekeyed_tables = set()
+    for kind, new_ids in rekeys.items():
+        print(f"{len(new_ids)} {kind} ids to rekey")
+        if not new_ids:
+            continue
+        rekey_table = process_data.stage_dataframe(session, pd.DataFrame({'old_id': list(new_ids), 'new_id': list(new_ids.values())}), f'{kind}_rekey')
+        for table_name, column in REKEYS[kind][2]:
+            update_column(session, table_name, column, rekey_table)
+            rekeyed_tables.add(table_name)
+
+    print(f"{len(fact_highlight_ids)} fact highlight ids to rekey")
+    if fact_highlight_ids:
+        rekey_table = process_data.stage_dataframe(session, pd.DataFrame({'old_id': list(fact_highlight_ids), 'new_id': list(fact_highlight_ids.values())}), 'fact_highlight_rekey')
+        update_column(session, 'fact_nyt', 'highlight_id', rekey_table, match_column='article_id')
+
+    for table_name in sorted(rekeyed_tables):
+        deduplicate_table(session, table_name)
+        print(f"Rekeyed {table_name}")
+
+if __name__ == '__main__':
+    with process_data.SnowflakeSession(process_data.snowflake_connection_params) as session:
+        rekey_ids(session)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The dag modules import each other by name, as in the Airflow dags folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'dags'))
+# and the one-time scripts next to the dags folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
@@ -0,0 +1,157 @@
+import pytest
+
+# insert_data runs against DuckDB standing in for Snowflake, it has the same MERGE ... WHEN NOT MATCHED THEN INSERT
+duckdb = pytest.importorskip('duckdb')
+pytest.importorskip('requests')
+pytest.importorskip('snowflake.connector')
+import process_data
+
+TABLES = {
+    'article': 'abstract VARCHAR, web_url VARCHAR, snippet VARCHAR, lead_paragraph VARCHAR, source VARCHAR, pub_date VARCHAR, '
+               'document_type VARCHAR, type_of_material VARCHAR, _id VARCHAR, word_count BIGINT, uri VARCHAR',
+    'author': 'authorid VARCHAR, firstname VARCHAR, lastname VARCHAR, middlename VARCHAR',
+    'article_author': 'authorid VARCHAR, articleid VARCHAR, ranking BIGINT',
+    'keywords': 'keyword_id BIGINT, keyword_value VARCHAR, keyword_name VARCHAR, major VARCHAR',
+    'article_keyword': 'article_id VARCHAR, keyword_id BIGINT',
+    'section': 'section_id BIGINT, section_name VARCHAR, news_desk VARCHAR',
+    'highlights': 'main VARCHAR, kicker VARCHAR, content_kicker VARCHAR, print_headline VARCHAR, name VARCHAR, seo VARCHAR, sub VARCHAR, highlight_id BIGINT',
+    'fact_nyt': 'article_id VARCHAR, section_id BIGINT, highlight_id BIGINT'
+}
+
+class DuckDBConnection:
+    # Stands in for the Snowflake connection, the staged tables and the session cursor use the same database
+    def __init__(self, database):
+        self.database = database
+        self.closed = False
+
+    def cursor(self):
+        return self.database.cursor()
+
+    def close(self):
+        self.closed = True
+
+def write_pandas(conn, df, table_name, auto_create_table=False, table_type='', overwrite=False, quote_identifiers=True):
+    # Temporary tables of DuckDB are only seen by their own connection, the staged batch is a regular table here
+    assert auto_create_table and table_type == 'temporary' and overwrite
+    conn.database.register('staged_df', df)
+    conn.database.execute(f'CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM staged_df')
+    conn.database.unregister('staged_df')
+    return True, 1, len(df), []
+
+@pytest.fixture
+def connections():
+    return []
+
+@pytest.fixture
+def database(monkeypatch, connections):
+    database = duckdb.connect()
+    for table_name, columns in TABLES.items():
+        database.execute(f'CREATE TABLE {table_name} ({columns})')
+
+    def connect(**connection_params):
+        connections.append(DuckDBConnection(database))
+        return connections[-1]
+
+    monkeypatch.setattr(process_data.snowflake.connector, 'connect', connect)
+    monkeypatch.setattr(process_data, 'write_pandas', write_pandas)
+    yield database
+    database.close()
+
+def get_article(article_id, section_name, people, keywords):
+    return {'_id': article_id, 'abstract': f'Abstract {article_id}', 'web_url': f'https://www.nytimes.com/{article_id}', 'snippet': '',
+            'lead_paragraph': '', 'source': 'The New York Times', 'pub_date': '2024-01-02T05:00:00+0000', 'document_type': 'article',
+            'section_name': section_name, 'news_desk': 'Foreign', 'type_of_material': 'News', 'word_count': 900, 'uri': f'nyt://{article_id}',
+            'headline': {'main': f'Headline {article_id}', 'kicker': None, 'print_headline': f'Print {article_id}'},
+            'keywords': [{'name': name, 'value': value, 'rank': rank, 'major': 'N'} for rank, (name, value) in enumerate(keywords, 1)],
+            'byline': {'original': 'By someone', 'person': [dict(person, rank=rank) for rank, person in enumerate(people, 1)]}}
+
+def get_month():
+    # The same author and keyword written differently in two articles
+    return process_data.flatten_articles([
+        get_article('a1', 'World', [{'firstname': 'Jane', 'middlename': None, 'lastname': 'Doe'}], [('subject', 'Elections'), ('glocations', 'Paris')]),
+        get_article('a2', 'World', [{'firstname': 'jane ', 'middlename': None, 'lastname': 'DOE'}, {'firstname': 'Sam', 'lastname': 'Lee'}],
+                    [('subject', 'elections')]),
+        get_article('a3', 'U.S.', [], [])
+    ])
+
+def get_counts(database):
+    return {table_name: database.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0] for table_name in TABLES}
+
+EXPECTED_COUNTS = {'article': 3, 'author': 2, 'article_author': 3, 'keywords': 2, 'article_keyword': 3, 'section': 2, 'highlights': 3, 'fact_nyt': 3}
+
+def test_rerunning_a_month_adds_nothing(database, connections, capsys):
+    process_data.insert_data(*get_month())
+    assert get_counts(database) == EXPECTED_COUNTS
+
+    process_data.insert_data(*get_month())
+    assert get_counts(database) == EXPECTED_COUNTS
+    assert 'No new data' in capsys.readouterr().out
+    # One connection per run, closed at the end of it
+    assert len(connections) == 2
+    assert all(connection.closed for connection in connections)
+
+def test_new_articles_of_a_loaded_month(database):
+    articles_df, author_df, keywords_df, highlights_df = get_month()
+    process_data.insert_data(articles_df[articles_df['_id'] != 'a3'], author_df, keywords_df, highlights_df[highlights_df['_id'] != 'a3'])
+    assert get_counts(database)['article'] == 2
+
+    process_data.insert_data(*get_month())
+    assert get_counts(database) == EXPECTED_COUNTS
+
+def test_author_and_keyword_keys_are_normalized(database):
+    process_data.insert_data(*get_month())
+    authors = database.execute('SELECT articleid, authorid FROM article_author ORDER BY articleid, ranking').fetchall()
+    assert authors[0][1] == authors[1][1]
+    assert authors[2][1] != authors[0][1]
+    assert database.execute('SELECT firstname, lastname FROM author WHERE authorid = ?', [authors[0][1]]).fetchall() == [('Jane', 'Doe')]
+
+    keywords = database.execute("SELECT article_id, keyword_id FROM article_keyword WHERE keyword_id IN "
+                                "(SELECT keyword_id FROM keywords WHERE keyword_name = 'subject') ORDER BY article_id").fetchall()
+    assert [article_id for article_id, _ in keywords] == ['a1', 'a2']
+    assert keywords[0][1] == keywords[1][1]
+
+def test_failed_run_is_completed_by_the_next_one(database, monkeypatch):
+    merge_table = process_data.merge_table
+
+    def fail_on_facts(session, table_name, df):
+        if table_name == 'fact_nyt':
+            raise process_data.snowflake.connector.errors.DatabaseError('warehouse suspended')
+        return merge_table(session, table_name, df)
+
+    monkeypatch.setattr(process_data, 'merge_table', fail_on_facts)
+    process_data.insert_data(*get_month())
+    counts = get_counts(database)
+    assert counts['article'] == 0 and counts['fact_nyt'] == 0
+
+    monkeypatch.setattr(process_data, 'merge_table', merge_table)
+    process_data.insert_data(*get_month())
+    assert get_counts(database) == EXPECTED_COUNTS
+
+def load_legacy_rows(database):
+    # a1 and a2 as loaded before nyt_ids: uuid4 author ids, max + 1 ids and one author and keyword row per spelling
+    database.execute("INSERT INTO article (_id) VALUES ('a1'), ('a2')")
+    database.execute("INSERT INTO author VALUES ('u1', 'Jane', 'Doe', NULL), ('u2', 'jane ', 'DOE', NULL), ('u3', 'Sam', 'Lee', NULL)")
+    database.execute("INSERT INTO article_author VALUES ('u1', 'a1', 1), ('u2', 'a2', 1), ('u3', 'a2', 2)")
+    database.execute("INSERT INTO keywords VALUES (1, 'Elections', 'subject', 'N'), (2, 'Paris', 'glocations', 'N'), (3, 'elections', 'subject', 'N')")
+    database.execute("INSERT INTO article_keyword VALUES ('a1', 1), ('a1', 2), ('a2', 3)")
+    database.execute("INSERT INTO section VALUES (1, 'World', 'Foreign')")
+    database.execute("INSERT INTO highlights (main, highlight_id) VALUES ('Headline a1', 1), ('Headline a2', 2)")
+    database.execute("INSERT INTO fact_nyt VALUES ('a1', 1, 1), ('a2', 1, 2)")
+
+def test_rekeyed_legacy_rows_are_not_loaded_again(database):
+    import rekey_ids
+    load_legacy_rows(database)
+    with process_data.SnowflakeSession(process_data.snowflake_connection_params) as session:
+        rekey_ids.rekey_ids(session)
+    assert get_counts(database) == dict(EXPECTED_COUNTS, article=2, section=1, highlights=2, fact_nyt=2)
+    rows = {table_name: sorted(database.execute(f'SELECT * FROM {table_name}').fetchall(), key=str) for table_name in TABLES}
+
+    with process_data.SnowflakeSession(process_data.snowflake_connection_params) as session:
+        rekey_ids.rekey_ids(session)
+    assert {table_name: sorted(database.execute(f'SELECT * FROM {table_name}').fetchall(), key=str) for table_name in TABLES} == rows
+
+    # Only a3 and its section, highlight and fact row are new
+    process_data.insert_data(*get_month())
+    assert get_counts(database) == EXPECTED_COUNTS
+    facts = database.execute('SELECT article_id, highlight_id FROM fact_nyt ORDER BY article_id').fetchall()
+    assert facts == [(article_id, process_data.nyt_ids.get_highlight_id(article_id)) for article_id in ['a1', 'a2', 'a3']]
@@ -95,7 +95,7 @@ if connection.is_connected():
     cursor.execute(drop_table_query)
     print("Dropped table")
 
-    cursor.execute("CREATE TABLE keywords_nyt (keyword_id INT AUTO_INCREMENT PRIMARY KEY,keyword_name VARCHAR(300),keyword_value  VARCHAR(300),keyword_rank INT, major  VARCHAR(100),article_id VARCHAR(300) );")
+    cursor.execute("CREATE TABLE keywords_nyt (keyword_id BIGINT AUTO_INCREMENT PRIMARY KEY,keyword_name VARCHAR(300),keyword_value  VARCHAR(300),keyword_rank INT, major  VARCHAR(100),article_id VARCHAR(300) );")
     print("Created table")
 
     # Remove duplicates
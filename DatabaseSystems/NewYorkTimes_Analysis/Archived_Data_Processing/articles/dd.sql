@@ -55,7 +55,7 @@ ALTER TABLE article DROP COLUMN pub_date;
 ALTER TABLE article CHANGE COLUMN pub_date_temp pub_date DATE;
 
 -- Create Keywords
-CREATE TABLE article_keyword (article_id varchar(255), keyword_id INT, PRIMARY KEY (article_id, keyword_id), FOREIGN KEY (article_id) REFERENCES article(_id), FOREIGN KEY(keyword_id) REFERENCES keywords(keyword_id));
+CREATE TABLE article_keyword (article_id varchar(255), keyword_id BIGINT, PRIMARY KEY (article_id, keyword_id), FOREIGN KEY (article_id) REFERENCES article(_id), FOREIGN KEY(keyword_id) REFERENCES keywords(keyword_id));
 
 – mysql --local-infile=1 --execute="LOAD DATA LOCAL INFILE '~/Downloads/keywords.csv' INTO TABLE keywords FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' IGNORE 1 LINES (keyword_id,keyword_name,keyword_value,keyword_rank,major,article_id); SHOW WARNINGS" -u root -p nyt1
 
@@ -1,7 +1,13 @@
 DATA_SET_PATH = 'Archived_Data_Processing/author/res'
 DATA_SET_EXTENSION = 'csv'
+STAGING_CACHE_PATH = 'Archived_Data_Processing/author/staging_cache'
+# Part of every staging cache key, bump it when the parsing changes so older entries are not reused
+STAGING_CACHE_VERSION = 2
 NYT = 'nyt'
 
+# Column types read_csv uses instead of inferring them, the archive columns are all read as text
+dataset_dtypes = {NYT: str}
+
 article_headers = ['_id']
 
 DATABASE_NAME = 'nyt'
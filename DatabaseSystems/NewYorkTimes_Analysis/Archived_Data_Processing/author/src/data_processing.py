@@ -1,16 +1,47 @@
+import argparse
+import time
 import uuid
 import pandas as pd
 import constants
 import db_manager
-import ast
+import literal_parser
+import nyt_ids
+import staging_cache
 import numpy as np
     
 
-def get_dataset(file_name, nrows=None, low_memory=False):
+# Streaming settings, overridden from the command line arguments in main.py
+chunk_settings = {'chunk_size': None}
+
+def configure_chunking(chunk_size):
+    chunk_settings['chunk_size'] = chunk_size
+
+def get_dataset_file(file_name):
     file = f'{constants.DATA_SET_PATH}/{file_name}.{constants.DATA_SET_EXTENSION}'
     # For windows use \\ as filepath delimeter
     #file = f'{constants.DATA_SET_PATH}\\{file_name}.{constants.DATA_SET_EXTENSION}'
-    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory)
+    return file
+
+def get_dataset(file_name, nrows=None, low_memory=False, chunksize=None):
+    file = get_dataset_file(file_name)
+    dtype = constants.dataset_dtypes.get(file_name)
+    # With a chunksize read_csv returns an iterator of DataFrames instead of the whole file
+    df = pd.read_csv(filepath_or_buffer=file, nrows=nrows, low_memory=low_memory, dtype=dtype, chunksize=chunksize)
+    return df
+
+def get_dataset_chunks(file_name):
+    # Without a chunk size the whole file is read as a single chunk
+    chunk_size = chunk_settings['chunk_size']
+    if chunk_size == None:
+        yield get_dataset(file_name=file_name)
+        return
+    for df in get_dataset(file_name=file_name, chunksize=chunk_size):
+        yield df
+
+def drop_seen_keys(df, key_column, seen_keys):
+    # Drop the rows whose key was already loaded from an earlier chunk of the same file
+    df = df[~df[key_column].isin(seen_keys)]
+    seen_keys.update(df[key_column].tolist())
     return df
 
 def remove_duplicates(df, headers=None):
@@ -48,17 +79,36 @@ def clean_df(df, headers=None):
 
 
 
-def load_articles(host, user,password):
-    df_articles = get_dataset(file_name=constants.NYT)#, nrows=5)
+def stream_author_tables():
+    # Authors are shared by articles of different chunks, they keep the id they got in the first one
+    known_authors = {}
+    seen_ids = set()
+    for df_articles in get_dataset_chunks(file_name=constants.NYT):
   
-    df_articles = clean_df(df_articles, headers=constants.article_headers)
-    
-    df_articles = df_articles.replace(np.nan, None)
-    
-    #prepare_article_table(df_articles, host, user, password, constants.DATABASE_NAME)
+        df_articles = clean_df(df_articles, headers=constants.article_headers)
+        df_articles = drop_seen_keys(df_articles, '_id', seen_ids)
+        
+        df_articles = df_articles.replace(np.nan, None)
+        
+        #prepare_article_table(df_articles, host, user, password, constants.DATABASE_NAME)
+
+        yield get_parent_and_connecting_tables(df_articles, known_authors)
+
+def load_articles(host, user,password):
+    # The author tables come from the staging cache when nyt.csv is unchanged since the run that wrote it
+    files = [get_dataset_file(constants.NYT)]
+    table_chunks = staging_cache.cached_stream('stream_author_tables', files, chunk_settings['chunk_size'], stream_author_tables())
+    create_tables = True
+    for tables in table_chunks:
+        load_tables(tables, host, user, password, constants.DATABASE_NAME, create_tables)
+        create_tables = False
 
-    prepare_parent_and_connecting_tables(df_articles, host, user, password, constants.DATABASE_NAME)
- 
+def load_tables(tables, host, user, password, database, create_tables=True):
+    for table in tables:
+        if create_tables:
+            db_manager.create_insert_table(table['df'], host, user, password, database, table['table_name'], table['create_table_query'], table['headers'], table['insert_table_query'])
+        else:
+            db_manager.append_table(table['df'], host, user, password, database, table['table_name'], table['headers'], table['insert_table_query'])
 
     
 
@@ -87,9 +137,18 @@ def prepare_article_table(df, host, user, password, database):
         
         
         
-def prepare_parent_and_connecting_tables(df, host, user, password, database):
+def get_table(table_name, df, create_table_query, headers, insert_table_query):
+    return {
+        'table_name': table_name,
+        'df': df,
+        'create_table_query': create_table_query,
+        'headers': headers,
+        'insert_table_query': insert_table_query
+    }
+
+def get_parent_and_connecting_tables(df, known_authors):
 
-    parent_table_data, connecting_table_data = prepare_parent_and_connecting_data(df, 'byline')
+    parent_table_data, connecting_table_data = prepare_parent_and_connecting_data(df, 'byline', known_authors)
 
     
     table_name = constants.AUTHOR_TABLE
@@ -110,7 +169,7 @@ def prepare_parent_and_connecting_tables(df, host, user, password, database):
             VALUES (%s, %s, %s, %s)
         """
 
-    db_manager.create_insert_table(parent_table_data, host, user, password, database, table_name, create_table_query, headers, insert_table_query)
+    parent_table = get_table(table_name, parent_table_data, create_table_query, headers, insert_table_query)
     
     
     table_name = constants.ARTICLE_AUTHOR_TABLE
@@ -133,66 +192,124 @@ def prepare_parent_and_connecting_tables(df, host, user, password, database):
             VALUES (%s, %s, %s)
         """
 
-    db_manager.create_insert_table(connecting_table_data, host, user, password, database, table_name, create_table_query, headers, insert_table_query)
+    connecting_table = get_table(table_name, connecting_table_data, create_table_query, headers, insert_table_query)
+    
+    return [parent_table, connecting_table]
     
 
 
 
 
 
-def prepare_parent_and_connecting_data(df, column_name):
+def get_json_array(value, column_name):
+    try:
+        # Load JSON data from the specified column
+        json_object = literal_parser.parse_literal(value)
+        if type(json_object) == dict:
+            return [json_object]
+        elif type(json_object) == list:
+            return json_object
+        else:
+            print(f'Unsupported json object found: {type(json_object)} in column {column_name}')
+    except Exception as e:
+        pass
+    return []
 
-    df_authors = pd.DataFrame(columns=['firstname', 'middlename','lastname', 'authorid'])
-    
-    df_article_authors = pd.DataFrame(columns=['articleid', 'authorid','rank'])
+def prepare_parent_and_connecting_data(df, column_name, known_authors):
 
-    unique_authors = set()
+    # known_authors is the author registry, it maps the normalized (firstname, middlename, lastname) key to the
+    # author id with a dict lookup. The id is the nyt_ids hash of that key, the same the Airflow and daily pipelines
+    # mint for the author. The rows are collected in column lists and the DataFrames are built once at the end,
+    # df_authors only gets the authors that are not in known_authors yet
+    author_columns = {'firstname': [], 'middlename': [], 'lastname': [], 'authorid': []}
+    article_author_columns = {'articleid': [], 'authorid': [], 'rank': []}
+    
+    # Iterate over the article id and the column of each row
+    for article_id, value in zip(df['_id'].tolist(), df[column_name].tolist()):
+        json_array = get_json_array(value, column_name)
+        if(len(json_array)) == 0:
+            continue
+        
+        for entry in json_array[0]['person']:
+            firstname = entry['firstname']
+            middlename = entry['middlename']
+            lastname = entry['lastname']
+            if not (firstname and lastname):
+                continue
+            
+            author_key = nyt_ids.get_author_key(firstname, middlename, lastname)
+            author_id = known_authors.get(author_key)
+            if author_id == None:
+                author_id = nyt_ids.get_author_id(firstname, middlename, lastname)
+                known_authors[author_key] = author_id
+                author_columns['firstname'].append(firstname)
+                author_columns['middlename'].append(middlename)
+                author_columns['lastname'].append(lastname)
+                author_columns['authorid'].append(author_id)
+            article_author_columns['articleid'].append(article_id)
+            article_author_columns['authorid'].append(author_id)
+            article_author_columns['rank'].append(entry['rank'])
     
-    # Iterate over each row in the DataFrame
+    return pd.DataFrame(author_columns), pd.DataFrame(article_author_columns)
+
+def prepare_with_appends(df, column_name, known_authors):
+    # The row by row version the loader used before, one DataFrame append per article author.
+    # pd.concat does what DataFrame._append did, newer pandas no longer have it
+    df_authors = pd.DataFrame(columns=['firstname', 'middlename','lastname', 'authorid'])
+    df_article_authors = pd.DataFrame(columns=['articleid', 'authorid','rank'])
     for _, row in df.iterrows():
-        json_array = []
-        person_array = []
-        try:
-            # Load JSON data from the specified column
-            json_object = ast.literal_eval(row[column_name])
-            if type(json_object) == dict:
-                json_array = [json_object]
-            elif type(json_object) == list:
-                json_array = json_object
-            else:
-                print(f'Unsupported json object found: {type(json_object)} in column {column_name}')
-        except SyntaxError as e:
-            pass
-        except ValueError as e:
-            pass
-        except Exception as e:
-            pass
+        json_array = get_json_array(row[column_name], column_name)
         if(len(json_array)) > 0:
-            person_array = json_array[0]['person']
-        
-            if(len(person_array)) == 0:
-                pass
-            else:
-                for entry in person_array:
-                    firstname = entry['firstname']
-                    middlename = entry['middlename']
-                    lastname = entry['lastname']
-                    author_id = str(uuid.uuid4())  
-        
-                    if (firstname, middlename, lastname) not in unique_authors:
-                        if firstname and lastname:
-                            df_authors = df_authors._append({'firstname': firstname, 'middlename':middlename, 'lastname': lastname, 'authorid': author_id}, ignore_index=True)
-                            unique_authors.add((firstname, middlename, lastname))
-                            df_article_authors = df_article_authors._append({'articleid': row['_id'], 'authorid':author_id, 'rank':  entry['rank']}, ignore_index=True)
-                    else:
-                        if firstname and lastname:
-                            author_id = df_authors.loc[
-                            (df_authors['firstname'] == firstname) &
-                            (df_authors['lastname'] == lastname) , 'authorid'].values[0]
-                            df_article_authors = df_article_authors._append({'articleid': row['_id'], 'authorid':author_id, 'rank':  entry['rank']}, ignore_index=True)
-
-    #print(df_authors)   
-    
-    #print(df_article_authors)
-    
-    return df_authors, df_article_authors
\ No newline at end of file
+            for entry in json_array[0]['person']:
+                firstname = entry['firstname']
+                middlename = entry['middlename']
+                lastname = entry['lastname']
+                author_id = str(uuid.uuid4())
+                if (firstname, middlename, lastname) not in known_authors:
+                    if firstname and lastname:
+                        df_authors = pd.concat([df_authors, pd.DataFrame([{'firstname': firstname, 'middlename':middlename, 'lastname': lastname, 'authorid': author_id}])], ignore_index=True)
+                        known_authors[(firstname, middlename, lastname)] = author_id
+                        df_article_authors = pd.concat([df_article_authors, pd.DataFrame([{'articleid': row['_id'], 'authorid':author_id, 'rank':  entry['rank']}])], ignore_index=True)
+                elif firstname and lastname:
+                    author_id = known_authors[(firstname, middlename, lastname)]
+                    df_article_authors = pd.concat([df_article_authors, pd.DataFrame([{'articleid': row['_id'], 'authorid':author_id, 'rank':  entry['rank']}])], ignore_index=True)
+    return df_authors, df_article_authors
+
+def get_article_author_names(df_authors, df_article_authors):
+    # Article authors by name, the row appends give random author ids
+    names = dict(zip(df_authors['authorid'], zip(df_authors['firstname'], df_authors['middlename'], df_authors['lastname'])))
+    return [(article_id, names[author_id], rank) for article_id, author_id, rank in
+            zip(df_article_authors['articleid'], df_article_authors['authorid'], df_article_authors['rank'])]
+
+def benchmark(nrows):
+    # Parses the bylines of the whole of nyt.csv (a year of archive) with the author registry, and of its
+    # first nrows articles with both versions to compare them
+    df = get_dataset(file_name=constants.NYT)
+    df = clean_df(df, headers=constants.article_headers).replace(np.nan, None)
+    
+    start_time = time.perf_counter()
+    df_authors, df_article_authors = prepare_parent_and_connecting_data(df, 'byline', {})
+    registry_seconds = time.perf_counter() - start_time
+    print(f"Parsed {len(df)} articles into {len(df_authors)} authors and {len(df_article_authors)} article authors "
+          f"in {registry_seconds:.2f}s ({len(df) / registry_seconds:.0f} articles/s).")
+    
+    df = df.head(nrows)
+    start_time = time.perf_counter()
+    expected = prepare_with_appends(df, 'byline', {})
+    appends_seconds = time.perf_counter() - start_time
+    literal_parser.parse_cached.cache_clear()
+    start_time = time.perf_counter()
+    actual = prepare_parent_and_connecting_data(df, 'byline', {})
+    registry_seconds = time.perf_counter() - start_time
+    
+    same_tables = get_article_author_names(*expected) == get_article_author_names(*actual) and len(expected[0]) == len(actual[0])
+    print(f"First {len(df)} articles: {'same' if same_tables else 'different'} tables as the row appends.")
+    print(f"    row appends:     {appends_seconds:.3f}s")
+    print(f"    author registry: {registry_seconds:.3f}s ({appends_seconds / registry_seconds:.1f}x)")
+
+# Benchmark on nyt.csv, e.g. python data_processing.py --nrows 2000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the author registry against the row by row appends')
+    parser.add_argument('--nrows', type=int, default=2000, help='number of articles parsed with both versions, the appends slow down with every row')
+    args = parser.parse_args()
+    benchmark(args.nrows)
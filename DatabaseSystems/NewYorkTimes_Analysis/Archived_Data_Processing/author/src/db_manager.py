@@ -2,6 +2,8 @@ import argparse
 import mysql.connector
 from mysql.connector import Error
 import numpy as np
+import constants
+import connection_pool
 
 def get_db_credentials():
     # Create an ArgumentParser object
@@ -11,6 +13,10 @@ def get_db_credentials():
     parser.add_argument('host', type=str, help='host address of databse')
     parser.add_argument('user', type=str, help='database user')
     parser.add_argument('password', type=str, help='database password')
+    parser.add_argument('--pool-size', type=int, default=2, help='maximum number of pooled MySQL connections')
+    parser.add_argument('--chunk-size', type=int, default=None, help='stream nyt.csv in chunks of this many rows instead of reading it whole')
+    parser.add_argument('--staging-cache', action='store_true', help='keep the parsed author tables as Parquet files and reuse them while nyt.csv is unchanged')
+    parser.add_argument('--staging-cache-dir', type=str, default=constants.STAGING_CACHE_PATH, help='directory of the staging cache')
 
     try:
         # Parse the command-line arguments
@@ -19,20 +25,22 @@ def get_db_credentials():
         print('Error: Required arguments not provided')
         quit()
     
-    return { 'host': args.host, 'user': args.user, 'password': args.password }
+    return { 'host': args.host, 'user': args.user, 'password': args.password, 'pool_size': args.pool_size, 'chunk_size': args.chunk_size,
+             'staging_cache': args.staging_cache, 'staging_cache_dir': args.staging_cache_dir }
 
 def get_db_connection(host, user, password, database=None):
     try:    
-        if (database == None):
-            connection = mysql.connector.connect(host=host, user=user, password=password)
-        else:
-            connection = mysql.connector.connect(host=host, user=user, password=password, database=database)
+        connection = connection_pool.get_connection(host, user, password, database)
         print(f"Sucessfully connected to MySQL as {user} user.")
     except Error as e:
         print(f"Error while connecting to MySQL as {user} user.", e)
         quit()
     return connection
 
+def release_db_connection(connection):
+    # Return the connection to the pool instead of closing it
+    connection_pool.release_connection(connection)
+
 def insert_data(cursor, df, headers, table_name, insert_table_query):
      # Insert data into table
     for _, row in df.iterrows():
@@ -74,8 +82,7 @@ def create_database(host, user, password, database):
         print("Error while creating database in MySQL.", e)
 
     finally:
-        if connection.is_connected():
-            connection.close()
+        release_db_connection(connection)
            
 def create_insert_table(df, host, user, password, database, table_name, create_table_query, headers, insert_table_query):
     try:
@@ -105,8 +112,29 @@ def create_insert_table(df, host, user, password, database, table_name, create_t
         quit()
         
     finally:
+        release_db_connection(connection)
+
+def append_table(df, host, user, password, database, table_name, headers, insert_table_query):
+    try:
+        # Connect to MySQL server
+        connection = get_db_connection(host, user, password, database)
+        
         if connection.is_connected():
-            connection.close()
+            cursor = connection.cursor()
+
+            # Insert into the table created for an earlier chunk
+            insert_data(cursor, df, headers, table_name, insert_table_query)
+            
+            # Commit changes and close cursor
+            connection.commit()
+            cursor.close()
+
+    except Error as e:
+        print(f"Error while appending to {table_name} in {database}.", e)
+        quit()
+        
+    finally:
+        release_db_connection(connection)
 
 def rename_table(host, user, password, database, old_table_name, new_table_name):
     try:
@@ -118,10 +146,8 @@ def rename_table(host, user, password, database, old_table_name, new_table_name)
             print(f"Renamed table {old_table_name} to {new_table_name}.")
             connection.commit()
             cursor.close()
-            connection.close()
     except Error as e:
         print("Error while renaming table in MySQL.", e)
 
     finally:
-        if connection.is_connected():
-            connection.close()
\ No newline at end of file
+        release_db_connection(connection)
\ No newline at end of file
@@ -0,0 +1,140 @@
+import argparse
+import ast
+import json
+import re
+import time
+from functools import lru_cache
+import pandas as pd
+
+# Shared by the TMDB, MongoDB and NYT loaders, every project has a copy of this file and
+# DatabaseSystems/tests/test_shared_copies.py fails when the copies differ
+
+# Only short values are cached, they are the ones repeated across rows (genres, languages, countries...)
+# while long values like the cast lists are unique per movie and would only fill the cache
+CACHE_SIZE = 16384
+MAX_CACHED_LENGTH = 1024
+
+# Quoted strings and the text between them, the fast path only runs on values without backslashes
+# so a quote always ends the string it opened
+TOKEN_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|[^'\"]+|['\"]")
+NAME_PATTERN = re.compile(r'\b[A-Za-z_]\w*')
+PYTHON_CONSTANTS = {'None': 'null', 'True': 'true', 'False': 'false'}
+
+def quote_strings(value):
+    # Single quoted strings become double quoted, returns None for a string holding both kinds of quotes
+    if '"' not in value:
+        return value.replace("'", '"')
+    json_tokens = []
+    for token in TOKEN_PATTERN.findall(value):
+        if token[0] == "'" and len(token) > 1:
+            if '"' in token:
+                return None
+            token = '"' + token[1:-1] + '"'
+        json_tokens.append(token)
+    return ''.join(json_tokens)
+
+def to_json(value):
+    # Rewrite a python repr string as JSON, returns None when the fast path does not apply
+    if '\\' in value:
+        return None
+    json_value = quote_strings(value)
+    if json_value == None:
+        return None
+    
+    # Splitting on the quotes puts the text outside of the strings at the even positions
+    parts = json_value.split('"')
+    names = set(NAME_PATTERN.findall(' '.join(parts[0::2])))
+    if not names:
+        return json_value
+    # Any other name (nan, inf, null, true...) means something JSON would read differently
+    if not names <= PYTHON_CONSTANTS.keys():
+        return None
+    parts[0::2] = [part.replace('None', 'null').replace('True', 'true').replace('False', 'false') for part in parts[0::2]]
+    return '"'.join(parts)
+
+def parse_uncached(value):
+    json_value = to_json(value)
+    if json_value != None:
+        try:
+            return json.loads(json_value)
+        except ValueError:
+            # Tuples, sets, non string keys... are only understood by literal_eval
+            pass
+    return ast.literal_eval(value)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_cached(value):
+    # Errors are cached as well, the same malformed value is not parsed twice
+    try:
+        return parse_uncached(value), None
+    except (ValueError, SyntaxError, RecursionError) as e:
+        return None, e
+
+def parse_literal(value):
+    # Drop-in replacement of ast.literal_eval for the stringified json columns.
+    # Cached results are shared between callers and must not be modified
+    if not isinstance(value, str):
+        raise ValueError(f'malformed node or string: {value!r}')
+    if len(value) > MAX_CACHED_LENGTH:
+        return parse_uncached(value)
+    json_object, error = parse_cached(value)
+    if error != None:
+        # A new exception is raised every time so the cached one does not collect tracebacks
+        raise type(error)(*error.args)
+    return json_object
+
+def print_cache_stats():
+    cache_info = parse_cached.cache_info()
+    lookups = cache_info.hits + cache_info.misses
+    hit_rate = 100 * cache_info.hits / lookups if lookups > 0 else 0
+    print(f"Literal parser cache: {cache_info.hits} hits, {cache_info.misses} misses ({hit_rate:.1f}% hit rate), "
+          f"{cache_info.currsize}/{cache_info.maxsize} entries.")
+
+def time_parser(parser, values):
+    start_time = time.perf_counter()
+    for value in values:
+        try:
+            parser(value)
+        except (ValueError, SyntaxError):
+            pass
+    return time.perf_counter() - start_time
+
+def benchmark(values):
+    # Compare ast.literal_eval with the JSON fast path, with and without the cache
+    values = [value for value in values if isinstance(value, str)]
+    parse_cached.cache_clear()
+
+    mismatches = 0
+    for value in values:
+        try:
+            expected = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            expected = None
+        try:
+            actual = parse_uncached(value)
+        except (ValueError, SyntaxError):
+            actual = None
+        if repr(expected) != repr(actual):
+            mismatches += 1
+
+    literal_eval_seconds = time_parser(ast.literal_eval, values)
+    fast_path_seconds = time_parser(parse_uncached, values)
+    cached_seconds = time_parser(parse_literal, values)
+    unique_values = len(set(values))
+
+    print(f"Parsed {len(values)} values ({unique_values} unique, {mismatches} results different from literal_eval).")
+    print(f"    ast.literal_eval:  {literal_eval_seconds:.3f}s")
+    print(f"    JSON fast path:    {fast_path_seconds:.3f}s ({literal_eval_seconds / fast_path_seconds:.1f}x)")
+    print(f"    fast path + cache: {cached_seconds:.3f}s ({literal_eval_seconds / cached_seconds:.1f}x)")
+    print_cache_stats()
+
+# Benchmark a column of a csv file, e.g. python literal_parser.py ../res/Movies_Metadata.csv genres
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the literal parser against ast.literal_eval')
+    parser.add_argument('file', type=str, help='csv file')
+    parser.add_argument('column', type=str, help='column with stringified json values')
+    parser.add_argument('--nrows', type=int, default=None, help='number of rows to read')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.file, usecols=[args.column], nrows=args.nrows, dtype=str)
+    benchmark(df[args.column].tolist())
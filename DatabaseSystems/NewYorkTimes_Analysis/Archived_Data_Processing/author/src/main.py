@@ -1,6 +1,8 @@
 import constants
 import db_manager
+import connection_pool
 import data_processing
+import staging_cache
 
 # main function
 def main():
@@ -9,11 +11,17 @@ def main():
     host=db_credentilas['host']
     user=db_credentilas['user']
     password=db_credentilas['password']
+    connection_pool.configure_pool(db_credentilas['pool_size'])
+    data_processing.configure_chunking(db_credentilas['chunk_size'])
+    staging_cache.configure_cache(db_credentilas['staging_cache'], db_credentilas['staging_cache_dir'])
 
     db_manager.create_database(host, user,password, constants.DATABASE_NAME)
     
     #LOAD CSV DATASET
     data_processing.load_articles(host, user, password)
+    
+    connection_pool.print_pool_stats()
+    connection_pool.close_pools()
 
     
 # call main function
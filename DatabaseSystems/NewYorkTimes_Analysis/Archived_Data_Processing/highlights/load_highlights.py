@@ -60,7 +60,7 @@ if connection.is_connected():
     cursor.execute(drop_table_query)
     print("Dropped table")
 
-    cursor.execute("CREATE TABLE highlights ( highlight_id INT AUTO_INCREMENT PRIMARY KEY, main TEXT, kicker VARCHAR(255), content_kicker VARCHAR(255),   print_headline TEXT,  name VARCHAR(255),   seo VARCHAR(255), sub VARCHAR(255), article_id VARCHAR(255), FOREIGN KEY (article_id) REFERENCES article(_id));")
+    cursor.execute("CREATE TABLE highlights ( highlight_id BIGINT AUTO_INCREMENT PRIMARY KEY, main TEXT, kicker VARCHAR(255), content_kicker VARCHAR(255),   print_headline TEXT,  name VARCHAR(255),   seo VARCHAR(255), sub VARCHAR(255), article_id VARCHAR(255), FOREIGN KEY (article_id) REFERENCES article(_id));")
     print("Created table")
 
     cursor = connection.cursor()
@@ -0,0 +1,17 @@
+-- One-time migration of the nyt MySQL database for the nyt_ids ids (dags/nyt_ids.py), run it once before the next archive_api_dag run:
+-- mysql -u root -p nyt < daily_articles/bigint_ids.sql
+-- Keyword, section and highlight ids are 63 bit hashes, the INT columns they are written to become BIGINT.
+-- section.section_id and article.section_id are BIGINT already (Archived_Data_Processing/articles/dd.sql).
+-- Then run daily_articles/rekey_ids.py, it moves the rows loaded before to the new ids
+
+-- Both sides of a foreign key need the same type, the keyword_id foreign key of article_keyword
+-- (the second one of its CREATE TABLE in dd.sql) is dropped while the columns change
+ALTER TABLE article_keyword DROP FOREIGN KEY article_keyword_ibfk_2;
+ALTER TABLE keywords MODIFY keyword_id BIGINT NOT NULL;
+ALTER TABLE article_keyword MODIFY keyword_id BIGINT NOT NULL;
+ALTER TABLE article_keyword ADD CONSTRAINT fk_keyword_id FOREIGN KEY (keyword_id) REFERENCES keywords(keyword_id);
+
+-- The dag writes the highlight id itself, AUTO_INCREMENT stays for Archived_Data_Processing/highlights/load_highlights.py
+ALTER TABLE highlights MODIFY highlight_id BIGINT NOT NULL AUTO_INCREMENT;
+
+ALTER TABLE fact_nyt MODIFY section_id BIGINT, MODIFY highlight_id BIGINT;
@@ -8,6 +8,7 @@ import numpy as np
 from pandas import json_normalize
 from airflow.hooks.mysql_hook import MySqlHook
 from airflow.providers.mysql.operators.mysql import MySqlOperator
+import nyt_ids
 #from airflow.operators.mysql_operator import MySqlOperator
 
 default_args = {
@@ -42,19 +43,13 @@ def preprocess():
     connection = mysql_hook.get_conn()
 
     cursor = connection.cursor()
-    cursor.execute("SELECT COUNT(*) FROM fact_nyt")
-    new_row_key = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM author")
-    new_author_key = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM keywords")
-    new_keyword_key = cursor.fetchone()[0]
 
     df.replace({np.nan: None}, inplace=True)
 
+    # Ids come from nyt_ids, the hash of the natural key of the row, instead of COUNT(*) + 1 counters.
+    # Runs in parallel can not mint the same id for different rows and the id of an existing row is known before the lookup
     for index, row in df.iterrows():
-        new_row_key = new_row_key + 1
+        highlight_key = nyt_ids.get_highlight_id(row['_id'])
 
         article_info = {
             'abstract': row['abstract'],
@@ -120,18 +115,16 @@ def preprocess():
             print("Proceeding...")
 
         print(section_info)
-        check_sql = "select * from section where section_name = %s and subsection_name = %s and news_desk = %s"
-        check_values = (section_info['section_name'], section_info['subsection_name'], section_info['news_desk'])
-        cursor.execute(check_sql, check_values)
+        section_id_to_insert = nyt_ids.get_section_id(section_info['section_name'], section_info['news_desk'], section_info['subsection_name'])
+        check_sql = "select section_id from section where section_id = %s"
+        cursor.execute(check_sql, (section_id_to_insert,))
         section_exists = cursor.fetchone()
-        section_id_to_insert = new_row_key
         if section_exists:
             print("Section already exists.")
-            section_id_to_insert = section_exists[0]
 
 
         fact_sql = "INSERT INTO fact_nyt (article_id, section_id, highlight_id) VALUES (%s, %s, %s)"
-        fact_values = (article_info['_id'], section_id_to_insert, new_row_key)
+        fact_values = (article_info['_id'], section_id_to_insert, highlight_key)
         cursor.execute(fact_sql, fact_values)
         connection.commit()
         print("Commit fact")
@@ -158,7 +151,7 @@ def preprocess():
 
         print(headline_info)
         headline_sql = "INSERT INTO highlights (highlight_id, main, kicker, content_kicker, print_headline, name, seo, sub, timestamp) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
-        headline_values = (new_row_key, headline_info['main'], headline_info['kicker'], headline_info['content_kicker'],
+        headline_values = (highlight_key, headline_info['main'], headline_info['kicker'], headline_info['content_kicker'],
                            headline_info['print_headline'], headline_info['name'], headline_info['seo'],
                            headline_info['sub'], datetime.now())
         headline_values = tuple(str(value) if value is not None else '' for value in headline_values)
@@ -167,13 +160,12 @@ def preprocess():
         print("Commit highlights")
 
         for keyword_entry in keyword_info:
-            check_sql = "select * from keywords where keyword_name = %s and keyword_value = %s and keyword_rank = %s and major = %s"
-            check_values = (keyword_entry['keyword_name'], keyword_entry['keyword_value'], keyword_entry['keyword_rank'], keyword_entry['major'])
-            cursor.execute(check_sql, check_values)
+            keyword_key_for_row = nyt_ids.get_keyword_id(keyword_entry['keyword_name'], keyword_entry['keyword_value'])
+            check_sql = "select keyword_id from keywords where keyword_id = %s"
+            cursor.execute(check_sql, (keyword_key_for_row,))
             keyword_exists = cursor.fetchone()
             print(keyword_exists)
             if keyword_exists:
-                keyword_key_for_row = keyword_exists[0]
                 sql = "INSERT INTO article_keyword (article_id, keyword_id, timestamp) VALUES (%s, %s, %s)"
                 values = (article_info['_id'], keyword_key_for_row, datetime.now())
                 cursor.execute(sql, values)
@@ -181,8 +173,6 @@ def preprocess():
                 print("Old keyword commit")
             else:
                 print("New keyword commit")
-                new_keyword_key = new_keyword_key + 1;
-                keyword_key_for_row = new_keyword_key
                 sql = "insert into keywords (keyword_id, keyword_name, keyword_value, keyword_rank, major, timestamp) VALUES (%s, %s, %s, %s, %s, %s)"
                 values = (
                     keyword_key_for_row, keyword_entry['keyword_name'], keyword_entry['keyword_value'], keyword_entry['keyword_rank'], keyword_entry['major'],
@@ -196,12 +186,11 @@ def preprocess():
                 connection.commit()
 
         for author_entry in author_info:
-            check_sql = "select * from author where firstname = %s and middlename = %s and lastname = %s"
-            check_values = (author_entry['firstname'], author_entry['middlename'], author_entry['lastname'])
-            cursor.execute(check_sql, check_values)
+            author_key_for_row = nyt_ids.get_author_id(author_entry['firstname'], author_entry['middlename'], author_entry['lastname'])
+            check_sql = "select authorid from author where authorid = %s"
+            cursor.execute(check_sql, (author_key_for_row,))
             author_exists = cursor.fetchone()
             if author_exists:
-                author_key_for_row = author_exists[0]
                 sql = "INSERT INTO article_author (articleid, authorid, ranking, timestamp) VALUES (%s, %s, %s, %s)"
                 values = (article_info['_id'], author_key_for_row, author_entry['rank'], datetime.now())
                 cursor.execute(sql, values)
@@ -209,8 +198,6 @@ def preprocess():
                 print("Old author commit")
             else:
                 print("New author commit")
-                new_author_key = new_author_key + 1;
-                author_key_for_row = new_author_key
                 sql = "insert into author (authorid, firstname, middlename, lastname, timestamp) VALUES (%s, %s, %s, %s, %s)"
                 values = (
                     author_key_for_row, author_entry['firstname'], author_entry['middlename'], author_entry['lastname'], datetime.now()
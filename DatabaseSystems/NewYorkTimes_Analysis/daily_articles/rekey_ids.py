@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+import mysql.connector
+
+# One-time rekey of the nyt MySQL database to the nyt_ids ids, run it after bigint_ids.sql and before the next
+# archive_api_dag run: python daily_articles/rekey_ids.py --user root --password ...
+# Rows loaded before nyt_ids have uuid4 author ids and COUNT(*) + 1 keyword, section and highlight ids. The dag looks rows
+# up by the new ids only and would insert every author, keyword and section it meets again. Running it a second time changes nothing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dags'))
+import nyt_ids
+
+# Natural key of every id, the MySQL type of the id and the columns holding it, the dimension table first
+REKEYS = {
+    'author': ("SELECT authorid, firstname, middlename, lastname FROM author", nyt_ids.get_author_id, 'VARCHAR(255)',
+               [('author', 'authorid'), ('article_author', 'authorid')]),
+    'keyword': ("SELECT keyword_id, keyword_name, keyword_value FROM keywords", nyt_ids.get_keyword_id, 'BIGINT',
+                [('keywords', 'keyword_id'), ('article_keyword', 'keyword_id')]),
+    'section': ("SELECT section_id, section_name, news_desk, subsection_name FROM section", nyt_ids.get_section_id, 'BIGINT',
+                [('section', 'section_id'), ('fact_nyt', 'section_id'), ('article', 'section_id')]),
+    # Highlights of Archived_Data_Processing/highlights have their article id, the ones of the dag are linked by fact_nyt.
+    # Highlights without an article keep their id
+    'highlight': ("SELECT h.highlight_id, COALESCE(h.article_id, f.article_id) AS article_id FROM highlights h "
+                  "LEFT JOIN fact_nyt f ON f.highlight_id = h.highlight_id WHERE COALESCE(h.article_id, f.article_id) IS NOT NULL",
+                  nyt_ids.get_highlight_id, 'BIGINT', [('highlights', 'highlight_id')])
+}
+
+def get_new_ids(rows, get_id):
+    # Old id to new id of every row, the first row of an old id found more than once decides
+    new_ids = {}
+    for old_id, *natural_key in rows:
+        if old_id not in new_ids:
+            new_ids[old_id] = get_id(*natural_key)
+    return new_ids
+
+def get_rekey_rows(new_ids):
+    # The dimension keeps one row for every new id, the first old id mapping to it, or the row holding it already.
+    # The other rows are deleted, their bridge rows move to the kept one
+    kept_ids = set(new_ids) - {old_id for old_id, new_id in new_ids.items() if old_id != new_id}
+    rekey_rows = []
+    for old_id, new_id in new_ids.items():
+        if old_id == new_id:
+            continue
+        rekey_rows.append((old_id, new_id, new_id in kept_ids))
+        kept_ids.add(new_id)
+    return rekey_rows
+
+def get_fact_highlight_ids(cursor):
+    # The fact row of every article gets the highlight id of the article, whatever it had before
+    cursor.execute("SELECT article_id, highlight_id FROM fact_nyt")
+    return [(article_id, nyt_ids.get_highlight_id(article_id)) for article_id, highlight_id in cursor.fetchall()
+            if highlight_id != nyt_ids.get_highlight_id(article_id)]
+
+def create_rekey_table(cursor, rekey_table, id_type, rows):
+    cursor.execute(f"CREATE TEMPORARY TABLE {rekey_table} (old_id {id_type} PRIMARY KEY, new_id {id_type}, dropped BOOLEAN)")
+    cursor.executemany(f"INSERT INTO {rekey_table} (old_id, new_id, dropped) VALUES (%s, %s, %s)", rows)
+
+def rekey_dimension(cursor, table_name, column, rekey_table):
+    cursor.execute(f"DELETE t FROM {table_name} t JOIN {rekey_table} r ON t.{column} = r.old_id WHERE r.dropped")
+    cursor.execute(f"UPDATE {table_name} t JOIN {rekey_table} r ON t.{column} = r.old_id SET t.{column} = r.new_id")
+
+def rekey_column(cursor, table_name, column, rekey_table):
+    # A row whose new key exists already is skipped by IGNORE and deleted, it repeats that row
+    cursor.execute(f"UPDATE IGNORE {table_name} t JOIN {rekey_table} r ON t.{column} = r.old_id SET t.{column} = r.new_id")
+    cursor.execute(f"DELETE t FROM {table_name} t JOIN {rekey_table} r ON t.{column} = r.old_id")
+
+def rekey_ids(connection):
+    cursor = connection.cursor()
+    # Every mapping is read before anything changes, the highlight ids come from the fact table that is rekeyed too
+    rekeys = {}
+    for kind, (query, get_id, id_type, columns) in REKEYS.items():
+        cursor.execute(query)
+        rekeys[kind] = get_rekey_rows(get_new_ids(cursor.fetchall(), get_id))
+    fact_highlight_ids = get_fact_highlight_ids(cursor)
+
+    # The ids change on both sides of the foreign keys, they are checked again once every table is done
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        for kind, rekey_rows in rekeys.items():
+            print(f"{len(rekey_rows)} {kind} ids to rekey")
+            if not rekey_rows:
+                continue
+            query, get_id, id_type, columns = REKEYS[kind]
+            create_rekey_table(cursor, f'{kind}_rekey', id_type, rekey_rows)
+            (dimension_table, dimension_column), *bridge_columns = columns
+            rekey_dimension(cursor, dimension_table, dimension_column, f'{kind}_rekey')
+            for table_name, column in bridge_columns:
+                rekey_column(cursor, table_name, column, f'{kind}_rekey')
+
+        print(f"{len(fact_highlight_ids)} fact highlight ids to rekey")
+        if fact_highlight_ids:
+            create_rekey_table(cursor, 'fact_highlight_rekey', 'VARCHAR(255)', [(article_id, new_id, False) for article_id, new_id in fact_highlight_ids])
+            cursor.execute("UPDATE fact_nyt f JOIN fact_highlight_rekey r ON f.article_id = r.old_id SET f.highlight_id = r.new_id")
+        connection.commit()
+    except mysql.connector.Error as e:
+        connection.rollback()
+        print(f"Rekey failed, nothing changed: {e}")
+        raise
+    finally:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        cursor.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rekey the nyt MySQL database to the nyt_ids ids')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='nyt')
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(host=args.host, user=args.user, password=args.password, database=args.database)
+    try:
+        rekey_ids(connection)
+    finally:
+        connection.close()
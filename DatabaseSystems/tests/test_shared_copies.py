@@ -0,0 +1,43 @@
+import os
+import pytest
+
+# Modules copied into several projects, every project runs from its own directory and imports them by name.
+# The copies have to stay identical, change one and copy it over the others
+DATABASE_SYSTEMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SHARED_COPIES = {
+    'literal_parser.py': [
+        'DB_Migration_AWS/Data_Processing/AparnaSuresh/src',
+        'DB_Migration_AWS/Data_Processing/Soumiya_Thada/src',
+        'DB_Migration_MongoDB/Data_Processing/src',
+        'NewYorkTimes_Analysis/Archived_Data_Processing/author/src'
+    ],
+    'connection_pool.py': [
+        'DB_Migration_AWS/Data_Processing/Soumiya_Thada/src',
+        'DB_Migration_AWS/Migration_Validation',
+        'NewYorkTimes_Analysis/Archived_Data_Processing/author/src'
+    ],
+    'csv_shards.py': [
+        'DB_Migration_AWS/Data_Processing/AparnaSuresh/src',
+        'DB_Migration_AWS/Data_Processing/Soumiya_Thada/src'
+    ],
+    'staging_cache.py': [
+        'DB_Migration_AWS/Data_Processing/Soumiya_Thada/src',
+        'NewYorkTimes_Analysis/Archived_Data_Processing/author/src'
+    ],
+    'nyt_ids.py': [
+        'NewYorkTimes_Analysis/Apache_AirFlow_Pipelines/dags',
+        'NewYorkTimes_Analysis/Archived_Data_Processing/author/src',
+        'NewYorkTimes_Analysis/daily_articles/dags'
+    ]
+}
+
+def read_copy(directory, file_name):
+    with open(os.path.join(DATABASE_SYSTEMS_PATH, directory, file_name), 'rb') as file:
+        return file.read()
+
+@pytest.mark.parametrize('file_name', list(SHARED_COPIES))
+def test_copies_are_identical(file_name):
+    directories = SHARED_COPIES[file_name]
+    first_copy = read_copy(directories[0], file_name)
+    different_copies = [directory for directory in directories[1:] if read_copy(directory, file_name) != first_copy]
+    assert not different_copies, f"{file_name} in {different_copies} differs from {directories[0]}/{file_name}"